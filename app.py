@@ -1,30 +1,41 @@
 import os
 import shutil
-import torch
 import time
 import pyperclip
 import streamlit as st
-from src.utils import process_uploaded_files, generate_response 
+from src.utils import generate_response 
+from src.agent.history import ConversationHistory
+from src.agent.metrics import start_metrics_server
+from src.config import METRICS_PORT
+from src.ingestion.jobs import get_job_store, start_ingestion_worker, submit_ingestion_job
 from src.logger import get_logger
 from src.theme.custom import set_custom_theme
 
-torch.classes.__path__ = [] # Little hack to remove torch.classes.__path__ runtime error [REF: Issue #1] 
 logger = get_logger(__name__)
 
 def clear_chat():
 	logger.info("Clearing chat session state.")
 	st.session_state.messages = []
+	st.session_state.history = ConversationHistory()
 	st.session_state.processing_complete = False
 	st.session_state.uploader_key = 0
 
 def remove_vectorstore_folders(project_path="./"):
 	"""
-	Removes all folders in the specified project directory whose names start with 'vectorstore_'.
+	Removes all vectorstore collections, plus legacy folders in the specified project directory whose names start with 'vectorstore_'.
 	Displays a toast message in Streamlit for each removed folder.
 	"""
-	folders_removed = False
+	from src.database.vector_db import clear_vector_database
+	from src.agent.answer_cache import ANSWER_CACHE
+
 	st.toast('Finding vectorstores...')
 	time.sleep(.5)
+	folders_removed = clear_vector_database()
+	ANSWER_CACHE.clear()
+	if folders_removed:
+		st.toast('Vectorstore collections removed ✅', icon='🗑️')
+
+	# Legacy per-day folders created before the collection registry
 	for item in os.listdir(project_path):
 		item_path = os.path.join(project_path, item)
 		if os.path.isdir(item_path) and item.startswith("vectorstore_"):
@@ -40,9 +51,54 @@ def remove_vectorstore_folders(project_path="./"):
 	if not folders_removed:
 		st.toast("No vectorstore folders found to remove.", icon="ℹ️")
 
+def show_ingestion_jobs():
+	"""
+	Renders the status of this session's background ingestion jobs, refreshed from the job table
+	every couple of seconds while the rest of the page (including the chat) stays usable
+	"""
+	store = get_job_store()
+	for job_id in st.session_state.ingestion_jobs:
+		job = store.get(job_id)
+		if job is None:
+			continue
+		finished = sum(file["status"] in ("indexed", "skipped", "failed") for file in job["files"])
+		if job["status"] == "done":
+			label, state = "Files uploaded successfully!", "complete"
+		elif job["status"] == "failed":
+			label, state = "File processing failed", "error"
+		else:
+			label, state = f"Processing files... ({finished}/{len(job['files'])})", "running"
+		with st.status(label, state=state, expanded=False):
+			for file in job["files"]:
+				pages = f"{file['pages_done']}/{file['total_pages']} pages" if file["pages_done"] and file["total_pages"] else ""
+				st.write(f"**{file['name']}**: {file['status']} {file['error'] or pages}".strip())
+			if job["stats"]:
+				st.write(f"{job['stats']['new']} new, {job['stats']['replaced']} replaced, {job['stats'].get('removed', 0)} removed, {job['stats']['skipped']} already stored chunks")
+			if job["error"]:
+				st.write(job["error"])
+
+# st.fragment reruns only this function on its timer; older Streamlit releases call it experimental_fragment
+_fragment = getattr(st, "fragment", None) or st.experimental_fragment
+show_ingestion_jobs = _fragment(run_every=2)(show_ingestion_jobs)
+
+def show_run_summary(run_summary):
+	"""
+	Renders the per-node timing and LLM usage of a RAG run below the assistant message
+	"""
+	with st.expander(f"⏱️ Run details ({run_summary['wall_time']:.1f}s)"):
+		st.caption(
+			f"{run_summary['llm_calls']} LLM calls · {run_summary['prompt_tokens']} prompt / "
+			f"{run_summary['completion_tokens']} completion tokens · {run_summary['llm_queue_time']:.1f}s queued / "
+			f"{run_summary['llm_model_time']:.1f}s in model · {run_summary['retrieved_chunks']} retrieved chunks"
+		)
+		st.dataframe(run_summary["steps"], use_container_width=True, hide_index=True)
+
 def main():
 	st.set_page_config(page_title="StudyBuddy", layout="wide", page_icon="src/assets/icon_logo.png",) 
 	st.logo(image="src/assets/logo.png", icon_image="src/assets/icon_logo.png", link="https://shorturl.at/KXt0L")
+	if METRICS_PORT:
+		start_metrics_server(METRICS_PORT)
+	start_ingestion_worker()
 
 	# Initialize session states
 	if "processing_complete" not in st.session_state:
@@ -51,6 +107,8 @@ def main():
 		st.session_state.uploader_key = 0
 	if "messages" not in st.session_state:
 		st.session_state.messages = []
+	if "history" not in st.session_state:
+		st.session_state.history = ConversationHistory()
 	if "max_search_queries" not in st.session_state:
 		st.session_state.max_search_queries = 5  
 	if "chunk_size" not in st.session_state:
@@ -61,6 +119,9 @@ def main():
 		st.session_state.files_ready = False  
 	if "enable_rag" not in st.session_state:
 		st.session_state.enable_rag = False
+	if "ingestion_jobs" not in st.session_state:
+		# Also shows jobs resumed from a previous run of the app
+		st.session_state.ingestion_jobs = get_job_store().unfinished_job_ids()
 	if "think_block" not in st.session_state:
 		st.session_state.think_blocks = []
 
@@ -145,16 +206,21 @@ def main():
 				process_clicked = st.button("Upload files", use_container_width=True)
 
 			if process_clicked:
-				with process_button_placeholder:
-					with st.status("Processing files...", expanded=False) as status:
-						logger.info("Starting file processing.")
-						if process_uploaded_files(uploaded_files, st.session_state.chunk_size, st.session_state.chunk_overlap):
-							st.session_state.processing_complete = True
-							st.session_state.files_ready = False  # Reset files ready flag
-							st.session_state.uploader_key += 1  # Reset uploader to allow new uploads
-							logger.info("Files processed successfully.")
-
-						status.update(label="Files uploaded successfully!", state="complete", expanded=False)
+				# Files are spooled and ingested by the background worker; questions can be asked meanwhile
+				logger.info("Submitting ingestion job.")
+				try:
+					job_id = submit_ingestion_job(uploaded_files, st.session_state.chunk_size, st.session_state.chunk_overlap)
+				except ValueError as e:
+					st.sidebar.error(str(e))
+				else:
+					st.session_state.ingestion_jobs.append(job_id)
+					st.session_state.processing_complete = True
+					st.session_state.files_ready = False  # Reset files ready flag
+					st.session_state.uploader_key += 1  # Reset uploader to allow new uploads
+					st.rerun()
+
+		if st.session_state.ingestion_jobs:
+			show_ingestion_jobs()
 		
 	# Display chat messages
 	for index, message in enumerate(st.session_state.messages):
@@ -171,6 +237,8 @@ def main():
 			with btn_col:
 				if message["role"] == "assistant":
 					st.button("📋", key=f"copy_{index}", on_click=pyperclip.copy, args=(message["content"],))
+			if message.get("run_summary"):
+				show_run_summary(message["run_summary"])
 
 	
 	# Chat input and response handling
@@ -180,21 +248,19 @@ def main():
 		with st.chat_message("user"):
 			st.write(user_input)
 
-		# Generate and display assistant response
-		assistant_response = generate_response(user_input, st)
-
-		# Store assistant message
-		st.session_state.messages.append({
-			"role": "assistant", 
-			"content": assistant_response["final_answer"], 
-			"reasoning": assistant_response["reasoning"]
-		})
-
+		# Generate and stream assistant response
 		with st.chat_message("assistant"):
-			with st.expander("🧠 See agent's reasoning"):
-				st.markdown(assistant_response["reasoning"])
-		
-			st.write(assistant_response["final_answer"])
+			assistant_response = generate_response(user_input, st)
+
+			# Store assistant message
+			st.session_state.messages.append({
+				"role": "assistant", 
+				"content": assistant_response["final_answer"], 
+				"reasoning": assistant_response["reasoning"],
+				"run_summary": assistant_response["run_summary"],
+			})
+			if assistant_response["run_summary"]:
+				show_run_summary(assistant_response["run_summary"])
 
 			# Copy button below the AI message
 			if st.button("📋", key=f"copy_{len(st.session_state.messages)}"):
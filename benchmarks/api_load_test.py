@@ -0,0 +1,102 @@
+"""
+Load test for the async HTTP API (src/server/api.py).
+
+Without --url it starts the API in-process on the fixture collection with the stub chat model,
+hashing embeddings and the local search backend, so it runs fully offline. STUB_LLM_LATENCY
+emulates model time per call; the answer cache is off so every request runs the graph.
+
+	STUB_LLM_LATENCY=0.2 python -m benchmarks.api_load_test --requests 200 --concurrency 50
+	python -m benchmarks.api_load_test --url http://127.0.0.1:8000 --requests 20 --concurrency 4
+"""
+import os
+
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("EMBEDDING_BACKEND", "hashing")
+os.environ.setdefault("EMBEDDING_CACHE_CAPACITY", "0")
+os.environ.setdefault("ANSWER_CACHE_TTL_SECONDS", "0")
+
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+from benchmarks.fixture_store import QUESTIONS_PATH, build_fixture_collection, load_json
+
+def percentile(values: list, fraction: float):
+	values = sorted(values)
+	return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))] if values else None
+
+async def chat(client: AsyncHTTPClient, url: str, question: str, rag: bool) -> dict:
+	started = time.perf_counter()
+	first_token = None
+
+	def on_chunk(data: bytes):
+		nonlocal first_token
+		if first_token is None and (b'"answer"' in data or b'"final"' in data):
+			first_token = time.perf_counter() - started
+
+	try:
+		await client.fetch(f"{url}/chat", method="POST", body=json.dumps({"message": question, "rag": rag}), streaming_callback=on_chunk, request_timeout=600)
+		return {"status": 200, "latency": time.perf_counter() - started, "ttft": first_token}
+	except HTTPClientError as e:
+		return {"status": e.code, "latency": time.perf_counter() - started, "ttft": None}
+
+async def run_load(url: str, questions: list, requests: int, concurrency: int, rag: bool) -> dict:
+	AsyncHTTPClient.configure(None, max_clients=concurrency)
+	client = AsyncHTTPClient()
+	semaphore = asyncio.Semaphore(concurrency)
+
+	async def one(index: int):
+		async with semaphore:
+			return await chat(client, url, questions[index % len(questions)]["question"], rag)
+
+	started = time.perf_counter()
+	results = await asyncio.gather(*(one(index) for index in range(requests)))
+	wall_time = time.perf_counter() - started
+
+	ok = [result for result in results if result["status"] == 200]
+	ttfts = [result["ttft"] for result in ok if result["ttft"] is not None]
+	return {
+		"requests": requests,
+		"concurrency": concurrency,
+		"succeeded": len(ok),
+		"rejected_503": sum(result["status"] == 503 for result in results),
+		"failed": sum(result["status"] not in (200, 503) for result in results),
+		"wall_time": wall_time,
+		"throughput": len(ok) / wall_time,
+		"latency_p50": percentile([result["latency"] for result in ok], 0.5),
+		"latency_p95": percentile([result["latency"] for result in ok], 0.95),
+		"ttft_mean": statistics.mean(ttfts) if ttfts else None,
+	}
+
+async def run_in_process(args) -> dict:
+	from src.server.api import make_app
+
+	build_fixture_collection()
+	app = make_app()
+	server = app.listen(args.port, address="127.0.0.1")
+	try:
+		return await run_load(f"http://127.0.0.1:{args.port}", load_json(args.questions), args.requests, args.concurrency, not args.direct)
+	finally:
+		server.stop()
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--url", default=None, help="Running API to test; starts one in-process when omitted")
+	parser.add_argument("--port", type=int, default=8765, help="Port for the in-process API")
+	parser.add_argument("--questions", default=QUESTIONS_PATH)
+	parser.add_argument("--requests", type=int, default=100)
+	parser.add_argument("--concurrency", type=int, default=20)
+	parser.add_argument("--direct", action="store_true", help="Send direct LLM chats instead of RAG runs")
+	args = parser.parse_args(argv)
+
+	if args.url:
+		report = asyncio.run(run_load(args.url.rstrip("/"), load_json(args.questions), args.requests, args.concurrency, not args.direct))
+	else:
+		report = asyncio.run(run_in_process(args))
+	print(json.dumps(report, indent=2))
+	return report
+
+if __name__ == "__main__":
+	main()
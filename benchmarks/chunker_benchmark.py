@@ -0,0 +1,100 @@
+"""
+Compares the single-pass chunker with the two-stage SemanticChunker + tiktoken splitter.
+
+For each chunker the report gives the split time, the time to embed the resulting chunks
+(zero with --sentence-mean, where the single-pass chunker's vectors are reused), pages/sec
+over both, and chunk token statistics. Pass real PDFs with --files; without them a synthetic
+document of --pages pages is built from the fixture study corpus. The embedding cache is
+disabled so both chunkers pay for every embedding.
+
+	python -m benchmarks.chunker_benchmark --files lecture1.pdf lecture2.pdf --output chunker.json
+	EMBEDDING_BACKEND=hashing python -m benchmarks.chunker_benchmark --pages 500 --sentence-mean
+"""
+import os
+import json
+import time
+import random
+import argparse
+import statistics
+
+os.environ.setdefault("SEARCH_BACKEND", "local")
+os.environ["EMBEDDING_CACHE_CAPACITY"] = "0"
+
+from benchmarks.fixture_store import CORPUS_PATH, load_json
+
+def load_documents(files: list, pages: int) -> list:
+	from langchain_core.documents import Document
+	from src.ingestion.loaders import load_file
+
+	if files:
+		documents = []
+		for path in files:
+			with open(path, "rb") as f:
+				documents.extend(load_file(os.path.basename(path), f.read()))
+		return documents
+
+	passages = [passage["content"] for passage in load_json(CORPUS_PATH)]
+	generator = random.Random(0)
+	return [Document(page_content="\n".join(generator.sample(passages, len(passages))), metadata={"source": "synthetic.pdf", "page": page}) for page in range(pages)]
+
+def run_chunker(chunker: str, documents: list, chunk_size: int, chunk_overlap: int) -> dict:
+	from src.tokenizer import load_encoding
+	from src.database.store_registry import VECTOR_STORE_REGISTRY
+	from src.database.vector_db import split_documents
+
+	started = time.perf_counter()
+	chunks, vectors = split_documents(documents, chunk_size, chunk_overlap, chunker=chunker)
+	split_time = time.perf_counter() - started
+
+	started = time.perf_counter()
+	if vectors is None:
+		VECTOR_STORE_REGISTRY.get_embeddings().embed_documents([chunk.page_content for chunk in chunks])
+	embed_time = time.perf_counter() - started
+
+	tokens = [len(ids) for ids in load_encoding("gpt2").encode_ordinary_batch([chunk.page_content for chunk in chunks])] or [0]
+	return {
+		"chunker": chunker,
+		"split_time": split_time,
+		"embed_time": embed_time,
+		"pages_per_second": len(documents) / (split_time + embed_time),
+		"chunks": len(chunks),
+		"reused_vectors": vectors is not None,
+		"tokens_mean": statistics.mean(tokens),
+		"tokens_max": max(tokens),
+	}
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--files", nargs="*", default=[], help="PDF (or other supported) files to chunk")
+	parser.add_argument("--pages", type=int, default=200, help="Pages of the synthetic document when no files are given")
+	parser.add_argument("--chunk-size", type=int, default=1000)
+	parser.add_argument("--chunk-overlap", type=int, default=200)
+	parser.add_argument("--sentence-mean", action="store_true", help="Reuse sentence vectors as chunk vectors (CHUNK_VECTORS=sentence_mean)")
+	parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+	args = parser.parse_args(argv)
+	if args.sentence_mean:
+		os.environ["CHUNK_VECTORS"] = "sentence_mean"
+
+	from src.database.store_registry import VECTOR_STORE_REGISTRY
+	from src.tokenizer import load_encoding
+
+	documents = load_documents(args.files, args.pages)
+	VECTOR_STORE_REGISTRY.get_embeddings().embed_query("warm-up")  # Load the model before timing
+	results = [run_chunker(chunker, documents, args.chunk_size, args.chunk_overlap) for chunker in ("two_stage", "single_pass")]
+
+	report = {
+		"documents": len(documents),
+		"characters": sum(len(document.page_content) for document in documents),
+		"embedding_backend": os.environ.get("EMBEDDING_BACKEND", "huggingface"),
+		"tokenizer": load_encoding("gpt2").name,
+		"chunkers": results,
+		"speedup": results[1]["pages_per_second"] / results[0]["pages_per_second"],
+	}
+	print(json.dumps(report, indent=2))
+	if args.output:
+		with open(args.output, "w", encoding="utf-8") as f:
+			json.dump(report, f, indent=2)
+	return report
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,94 @@
+"""
+Compares embedding backends on CPU: throughput, query latency and retrieval quality.
+
+Each backend embeds the fixture study corpus (repeated --copies times so batching has work to do)
+without the embedding cache. The report gives docs/sec and query latency, recall@k on the fixture
+questions, and how closely each backend matches the first one: mean cosine similarity of
+the vectors for the same text, and the overlap of their top-k passages.
+
+	python -m benchmarks.embedding_benchmark --backends huggingface onnx onnx_int8 --output embeddings.json
+	EMBEDDING_THREADS=4 EMBEDDING_BATCH_SIZE=64 python -m benchmarks.embedding_benchmark
+"""
+import json
+import time
+import argparse
+import statistics
+import numpy as np
+from benchmarks.fixture_store import CORPUS_PATH, QUESTIONS_PATH, load_json
+
+def _normalized(vectors: list) -> np.ndarray:
+	matrix = np.asarray(vectors, dtype=np.float32)
+	norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+	return matrix / np.where(norms == 0, 1, norms)
+
+def run_backend(name: str, passages: list, questions: list, copies: int, k: int) -> dict:
+	from src.database.embedding_backends import create_embeddings
+
+	embeddings = create_embeddings(name)
+	started = time.perf_counter()
+	embeddings.embed_query("warm-up")  # Charge model loading separately from throughput
+	load_time = time.perf_counter() - started
+
+	texts = [passage["content"] for passage in passages]
+	started = time.perf_counter()
+	embeddings.embed_documents(texts * copies)
+	embed_time = time.perf_counter() - started
+
+	passage_vectors = _normalized(embeddings.embed_documents(texts))
+	latencies, query_vectors = [], []
+	for case in questions:
+		started = time.perf_counter()
+		query_vectors.append(embeddings.embed_query(case["question"]))
+		latencies.append(time.perf_counter() - started)
+	query_vectors = _normalized(query_vectors)
+
+	ranked = np.argsort(-(query_vectors @ passage_vectors.T), axis=1)[:, :k]
+	top_ids = [[passages[index]["id"] for index in row] for row in ranked]
+	recalls = [len(set(ids) & set(case["relevant"])) / len(case["relevant"]) for ids, case in zip(top_ids, questions)]
+
+	return {
+		"backend": name,
+		"identity": embeddings.identity,
+		"load_time": load_time,
+		"docs_per_second": len(texts) * copies / embed_time,
+		"query_latency_mean": statistics.mean(latencies),
+		f"recall@{k}": statistics.mean(recalls),
+		"_passage_vectors": passage_vectors,
+		"_top_ids": top_ids,
+	}
+
+def agreement(result: dict, reference: dict) -> dict:
+	"""
+	How closely result reproduces the reference backend's vectors and rankings
+	"""
+	overlap = statistics.mean(len(set(ids) & set(reference_ids)) / len(reference_ids) for ids, reference_ids in zip(result["_top_ids"], reference["_top_ids"]))
+	same_shape = result["_passage_vectors"].shape == reference["_passage_vectors"].shape
+	cosine = float(np.mean(np.sum(result["_passage_vectors"] * reference["_passage_vectors"], axis=1))) if same_shape else None
+	return {"reference": reference["backend"], "mean_cosine": cosine, "top_k_overlap": overlap}
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--backends", nargs="+", default=["huggingface", "onnx", "onnx_int8"], help="The first backend is the reference for agreement")
+	parser.add_argument("--copies", type=int, default=20, help="Times the corpus is embedded for the throughput measurement")
+	parser.add_argument("--k", type=int, default=4)
+	parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+	args = parser.parse_args(argv)
+
+	passages, questions = load_json(CORPUS_PATH), load_json(QUESTIONS_PATH)
+	results = [run_backend(name, passages, questions, args.copies, args.k) for name in args.backends]
+	for result in results:
+		result["agreement"] = agreement(result, results[0])
+
+	report = {
+		"passages": len(passages),
+		"questions": len(questions),
+		"backends": [{key: value for key, value in result.items() if not key.startswith("_")} for result in results],
+	}
+	print(json.dumps(report, indent=2))
+	if args.output:
+		with open(args.output, "w", encoding="utf-8") as f:
+			json.dump(report, f, indent=2)
+	return report
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,46 @@
+"""
+Helpers shared by the benchmarks to index the fixture study corpus into an isolated collection.
+
+Import this module before anything from src, since it points VECTOR_DB_ROOT and the search
+backend at throwaway, offline locations.
+"""
+import os
+import json
+import tempfile
+from collections import defaultdict
+
+os.environ.setdefault("VECTOR_DB_ROOT", tempfile.mkdtemp(prefix="studybuddy_bench_"))
+os.environ.setdefault("SEARCH_BACKEND", "local")
+os.environ.setdefault("SEARCH_CACHE_TTL_SECONDS", "0")
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+CORPUS_PATH = os.path.join(FIXTURES_DIR, "study_corpus.json")
+QUESTIONS_PATH = os.path.join(FIXTURES_DIR, "rag_questions.json")
+
+def load_json(path: str):
+	with open(path, "r", encoding="utf-8") as f:
+		return json.load(f)
+
+def build_fixture_collection(corpus_path: str = CORPUS_PATH) -> int:
+	"""
+	Indexes each corpus passage as one chunk, tagged with metadata["passage_id"] for recall scoring
+
+	Returns:
+		int: Number of indexed passages
+	"""
+	from langchain_core.documents import Document
+	from src.database.store_registry import VECTOR_STORE_REGISTRY
+	from src.database.vector_db import active_collection_path, content_hash, index_chunks
+
+	by_source = defaultdict(list)
+	for passage in load_json(corpus_path):
+		by_source[passage["source"]].append(Document(page_content=passage["content"], metadata={"passage_id": passage["id"]}))
+
+	vectorstore = VECTOR_STORE_REGISTRY.get_vectorstore(active_collection_path())
+	for source, chunks in by_source.items():
+		index_chunks(vectorstore, chunks, source, content_hash("".join(chunk.page_content for chunk in chunks)))
+	return sum(len(chunks) for chunks in by_source.values())
+
+def recall_at_k(documents: list, relevant: list) -> float:
+	retrieved = {document.metadata.get("passage_id") for document in documents}
+	return len(retrieved.intersection(relevant)) / len(relevant) if relevant else 0.0
@@ -0,0 +1,72 @@
+"""
+Compares the two-call and combined generation graders on a fixed evaluation set.
+
+Reports per-mode latency and accuracy against the labels, plus how often the two modes
+reach the same useful/not useful decision. Requires a running Ollama with the grader model.
+
+	python -m benchmarks.grader_benchmark --output grader_benchmark.json
+"""
+import os
+import json
+import time
+import argparse
+import statistics
+
+os.environ.setdefault("SEARCH_BACKEND", "local")  # The graders never search; avoid requiring a Tavily key
+
+from src.agent.edges.grader_edge import GENERATION_GRADERS
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "grader_eval.json")
+
+def _percentile(values: list, percentile: float) -> float:
+	ordered = sorted(values)
+	return ordered[min(len(ordered) - 1, int(round(percentile * (len(ordered) - 1))))]
+
+def run_mode(mode: str, cases: list) -> dict:
+	grader = GENERATION_GRADERS[mode]
+	latencies, decisions, correct = [], [], 0
+	for case in cases:
+		started = time.perf_counter()
+		grounded, useful = grader(case["question"], case["context"], case["generation"])
+		latencies.append(time.perf_counter() - started)
+
+		decision = bool(grounded and useful)
+		decisions.append(decision)
+		correct += decision == (case["grounded"] and case["useful"])
+
+	return {
+		"mode": mode,
+		"latency_mean": statistics.mean(latencies),
+		"latency_p50": _percentile(latencies, 0.5),
+		"latency_p95": _percentile(latencies, 0.95),
+		"latency_total": sum(latencies),
+		"accuracy": correct / len(cases),
+		"decisions": decisions,
+	}
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--fixture", default=FIXTURE_PATH)
+	parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+	args = parser.parse_args(argv)
+
+	with open(args.fixture, "r", encoding="utf-8") as f:
+		cases = json.load(f)
+
+	results = {mode: run_mode(mode, cases) for mode in ("two_call", "combined")}
+	agreement = sum(a == b for a, b in zip(results["two_call"]["decisions"], results["combined"]["decisions"])) / len(cases)
+	report = {
+		"cases": len(cases),
+		"modes": {mode: {key: value for key, value in result.items() if key != "decisions"} for mode, result in results.items()},
+		"decision_agreement": agreement,
+		"speedup": results["two_call"]["latency_total"] / results["combined"]["latency_total"],
+	}
+
+	print(json.dumps(report, indent=2))
+	if args.output:
+		with open(args.output, "w", encoding="utf-8") as f:
+			json.dump(report, f, indent=2)
+	return report
+
+if __name__ == "__main__":
+	main()
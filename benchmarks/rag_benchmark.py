@@ -0,0 +1,145 @@
+"""
+Offline end-to-end benchmark of the RAG_AGENT workflow.
+
+Runs the fixture questions against the fixture study corpus with the stub chat model, hashing
+embeddings and the local search backend, so it needs no GPU, Ollama or network access.
+Token counts use tiktoken's gpt2 encoding, whose BPE files tiktoken downloads on first use; on an
+offline machine, copy a populated TIKTOKEN_CACHE_DIR over or the counts fall back to the regex
+tokenizer in src/tokenizer.py. The report's "tokenizer" field says which one was used.
+Reports per-node and per-edge latency (recorded by RunTrace), LLM call counts, prompt/completion
+tokens, retrieval recall and end-to-end throughput as JSON; pass --baseline with an earlier report
+to print the deltas.
+
+	python -m benchmarks.rag_benchmark --output bench_output.json
+	python -m benchmarks.rag_benchmark --baseline bench_output.json
+"""
+import os
+
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("EMBEDDING_BACKEND", "hashing")
+os.environ.setdefault("EMBEDDING_CACHE_CAPACITY", "0")
+
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.fixture_store import QUESTIONS_PATH, build_fixture_collection, load_json, recall_at_k
+
+def run_question(agent, case: dict, max_search_queries: int) -> dict:
+	from src.agent.instrumentation import RunTrace
+
+	trace, recall = RunTrace(case["question"]), None
+	inputs = {"question": case["question"], "max_search_queries": max_search_queries}
+	for update in agent.stream(inputs, stream_mode="updates", config=trace.config()):
+		if update.get("retrieve"):
+			recall = recall_at_k(update["retrieve"]["documents"], case["relevant"])
+	summary = trace.finish()
+
+	node_latency, visits, llm = defaultdict(float), Counter(), defaultdict(lambda: {"llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "llm_queue_time": 0.0, "llm_model_time": 0.0})
+	for step in summary["steps"]:
+		name = step["name"] if step["kind"] == "node" else f"edge:{step['name']}"
+		node_latency[name] += step["wall_time"]
+		visits[name] += 1
+		for key in llm[name]:
+			llm[name][key] += step[key]
+
+	return {
+		"question": case["question"],
+		"latency": summary["wall_time"],
+		"recall": recall,
+		"node_latency": dict(node_latency),
+		"node_visits": dict(visits),
+		"llm": {name: stats for name, stats in llm.items() if stats["llm_calls"]},
+	}
+
+def summarize(runs: list, wall_time: float, concurrent_wall_time: float, concurrency: int) -> dict:
+	node_latency, llm = defaultdict(list), defaultdict(lambda: defaultdict(int))
+	for run in runs:
+		for node, latency in run["node_latency"].items():
+			node_latency[node].append(latency)
+		for node, stats in run["llm"].items():
+			for key, value in stats.items():
+				llm[node][key] += value
+
+	latencies = sorted(run["latency"] for run in runs)
+	return {
+		"questions": len(runs),
+		"latency_mean": statistics.mean(latencies),
+		"latency_p95": latencies[min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))],
+		"recall_mean": statistics.mean(run["recall"] or 0.0 for run in runs),
+		"llm_calls": sum(stats["llm_calls"] for stats in llm.values()),
+		"prompt_tokens": sum(stats["prompt_tokens"] for stats in llm.values()),
+		"completion_tokens": sum(stats["completion_tokens"] for stats in llm.values()),
+		"llm_queue_time": sum(stats["llm_queue_time"] for stats in llm.values()),
+		"llm_model_time": sum(stats["llm_model_time"] for stats in llm.values()),
+		"throughput_sequential": len(runs) / wall_time,
+		f"throughput_concurrency_{concurrency}": len(runs) / concurrent_wall_time,
+		"node_latency_mean": {node: statistics.mean(values) for node, values in node_latency.items()},
+		"node_llm": {node: dict(stats) for node, stats in llm.items()},
+	}
+
+def _git_commit():
+	try:
+		return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+	except Exception:
+		return None
+
+def compare(report: dict, baseline: dict) -> dict:
+	"""
+	Relative change of each top-level numeric summary metric against a baseline report
+	"""
+	deltas = {}
+	for key, value in report["summary"].items():
+		previous = baseline.get("summary", {}).get(key)
+		if isinstance(value, (int, float)) and isinstance(previous, (int, float)) and previous:
+			deltas[key] = (value - previous) / previous
+	return deltas
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--questions", default=QUESTIONS_PATH)
+	parser.add_argument("--max-search-queries", type=int, default=2)
+	parser.add_argument("--concurrency", type=int, default=4)
+	parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+	parser.add_argument("--baseline", default=None, help="Earlier JSON report to compare against")
+	args = parser.parse_args(argv)
+
+	build_fixture_collection()
+	from src.agent.workflow import RAG_AGENT
+	from src.tokenizer import load_encoding
+
+	questions = load_json(args.questions)
+	run_question(RAG_AGENT, questions[0], args.max_search_queries)  # Warm-up: loads handles and compiles prompts
+
+	started = time.perf_counter()
+	runs = [run_question(RAG_AGENT, case, args.max_search_queries) for case in questions]
+	wall_time = time.perf_counter() - started
+
+	started = time.perf_counter()
+	with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+		list(executor.map(lambda case: run_question(RAG_AGENT, case, args.max_search_queries), questions))
+	concurrent_wall_time = time.perf_counter() - started
+
+	report = {
+		"commit": _git_commit(),
+		"python": platform.python_version(),
+		"tokenizer": load_encoding("gpt2").name,
+		"settings": {key: os.environ.get(key) for key in ("LLM_BACKEND", "EMBEDDING_BACKEND", "SEARCH_BACKEND", "GRADING_MODE", "GENERATION_GRADER_MODE", "RETRIEVAL_MODE", "STUB_LLM_LATENCY")},
+		"summary": summarize(runs, wall_time, concurrent_wall_time, args.concurrency),
+		"runs": runs,
+	}
+	if args.baseline:
+		report["delta_vs_baseline"] = compare(report, load_json(args.baseline))
+
+	print(json.dumps({key: value for key, value in report.items() if key != "runs"}, indent=2))
+	if args.output:
+		with open(args.output, "w", encoding="utf-8") as f:
+			json.dump(report, f, indent=2)
+	return report
+
+if __name__ == "__main__":
+	main()
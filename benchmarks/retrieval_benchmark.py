@@ -0,0 +1,50 @@
+"""
+Benchmarks recall@k and latency of dense-only against hybrid (BM25 + dense, RRF) retrieval
+over the fixture study corpus.
+
+	python -m benchmarks.retrieval_benchmark --k 4 --output retrieval_benchmark.json
+"""
+import json
+import time
+import argparse
+import statistics
+from benchmarks.fixture_store import QUESTIONS_PATH, build_fixture_collection, load_json, recall_at_k
+
+def run_mode(mode: str, questions: list, k: int) -> dict:
+	from src.database.vector_db import retrieve_relevant_documents
+
+	recalls, latencies = [], []
+	for case in questions:
+		started = time.perf_counter()
+		documents = retrieve_relevant_documents(case["question"], k=k, mode=mode)
+		latencies.append(time.perf_counter() - started)
+		recalls.append(recall_at_k(documents, case["relevant"]))
+
+	return {
+		"mode": mode,
+		f"recall@{k}": statistics.mean(recalls),
+		"latency_mean": statistics.mean(latencies),
+		"latency_max": max(latencies),
+	}
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--k", type=int, default=4)
+	parser.add_argument("--questions", default=QUESTIONS_PATH)
+	parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+	args = parser.parse_args(argv)
+
+	passages = build_fixture_collection()
+	questions = load_json(args.questions)
+	# Warm the embedding model and Chroma handle so the first mode is not charged for loading them
+	run_mode("dense", questions[:1], args.k)
+
+	report = {"passages": passages, "questions": len(questions), "modes": [run_mode(mode, questions, args.k) for mode in ("dense", "hybrid")]}
+	print(json.dumps(report, indent=2))
+	if args.output:
+		with open(args.output, "w", encoding="utf-8") as f:
+			json.dump(report, f, indent=2)
+	return report
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,103 @@
+"""
+Measures the cold import cost of the app's entry modules with python -X importtime.
+
+Each target is imported in a fresh interpreter, so nothing is shared between runs. The report
+gives the wall time of the import, the modules with the largest cumulative import time and the
+self time summed per top-level package (torch, langchain, chromadb, ...).
+
+	python -m benchmarks.startup_benchmark --output startup.json
+	python -m benchmarks.startup_benchmark --targets app src.agent.workflow --baseline startup.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from collections import defaultdict
+
+# What a Streamlit page render, a first RAG answer and the HTTP API import respectively
+DEFAULT_TARGETS = ("app", "src.utils", "src.agent.workflow", "src.server.api")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_importtime(stderr: str) -> list:
+	"""
+	Parses -X importtime output into {"module", "self", "cumulative"} rows, times in seconds
+	"""
+	rows = []
+	for line in stderr.splitlines():
+		if not line.startswith("import time:") or "[us]" in line:
+			continue
+		self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+		rows.append({"module": module.strip(), "self": int(self_us) / 1e6, "cumulative": int(cumulative_us) / 1e6})
+	return rows
+
+def measure(target: str) -> dict:
+	"""
+	Imports target in a fresh interpreter and returns its wall time and import rows
+	"""
+	started = time.perf_counter()
+	result = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", f"import {target}"],
+		cwd=PROJECT_ROOT, capture_output=True, text=True,
+	)
+	wall_time = time.perf_counter() - started
+	rows = parse_importtime(result.stderr)
+	error = result.stderr.strip().splitlines()[-1] if result.returncode else None
+	return {"wall_time": wall_time, "rows": rows, "error": error}
+
+def summarize(target: str, runs: list, top: int) -> dict:
+	# Keep the fastest run: slower ones measure disk cache misses and noise, not import work
+	best = min(runs, key=lambda run: run["wall_time"])
+	packages = defaultdict(float)
+	for row in best["rows"]:
+		packages[row["module"].split(".")[0]] += row["self"]
+	return {
+		"target": target,
+		"wall_time": best["wall_time"],
+		"wall_times": [run["wall_time"] for run in runs],
+		"import_time": sum(row["self"] for row in best["rows"]),
+		"modules": len(best["rows"]),
+		"error": best["error"],
+		"top_modules": sorted(({"module": row["module"], "cumulative": row["cumulative"]} for row in best["rows"]), key=lambda row: -row["cumulative"])[:top],
+		"top_packages": dict(sorted(packages.items(), key=lambda item: -item[1])[:top]),
+	}
+
+def compare(report: dict, baseline: dict) -> dict:
+	deltas = {}
+	for target, result in report["targets"].items():
+		if target in baseline.get("targets", {}):
+			before = baseline["targets"][target]["wall_time"]
+			deltas[target] = {"wall_time": result["wall_time"] - before, "speedup": before / result["wall_time"] if result["wall_time"] else None}
+	return deltas
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--targets", nargs="+", default=list(DEFAULT_TARGETS))
+	parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per target")
+	parser.add_argument("--top", type=int, default=15)
+	parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+	parser.add_argument("--baseline", default=None, help="Earlier JSON report to compare against")
+	args = parser.parse_args(argv)
+
+	report = {
+		"python": sys.version.split()[0],
+		"targets": {target: summarize(target, [measure(target) for _ in range(args.repeat)], args.top) for target in args.targets},
+	}
+	if args.baseline:
+		with open(args.baseline, "r", encoding="utf-8") as f:
+			report["delta_vs_baseline"] = compare(report, json.load(f))
+
+	for target, result in report["targets"].items():
+		print(f"{target}: {result['wall_time']:.2f}s wall, {result['import_time']:.2f}s importing {result['modules']} modules" + (f" (failed: {result['error']})" if result["error"] else ""))
+		for package, seconds in result["top_packages"].items():
+			print(f"    {package:<28} {seconds:.3f}s")
+	if args.baseline:
+		print(json.dumps(report["delta_vs_baseline"], indent=2))
+	if args.output:
+		with open(args.output, "w", encoding="utf-8") as f:
+			json.dump(report, f, indent=2)
+	return report
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,94 @@
+import time
+import threading
+import numpy as np
+from src.config import ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_MAX_ENTRIES
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+class SemanticAnswerCache:
+	"""
+	In-process cache of RAG answers keyed by question embedding and collection fingerprint.
+
+	A lookup hits when a stored question embedded within `threshold` cosine similarity of the
+	new one was answered against the same collection contents and has not outlived the TTL.
+	Adding or removing documents changes the collection fingerprint, which retires every entry
+	built against the previous contents.
+	"""
+	def __init__(self, threshold: float, ttl_seconds: int, max_entries: int):
+		self.threshold = threshold
+		self.ttl_seconds = ttl_seconds
+		self.max_entries = max_entries
+		self._lock = threading.Lock()
+		self._entries = []
+		self.hits, self.misses, self.latency_saved = 0, 0, 0.0
+
+	@staticmethod
+	def _normalize(vector) -> np.ndarray:
+		vector = np.asarray(vector, dtype=np.float32)
+		norm = np.linalg.norm(vector)
+		return vector / norm if norm else vector
+
+	def _evict_expired(self, fingerprint: str):
+		now = time.time()
+		self._entries = [entry for entry in self._entries if entry["fingerprint"] == fingerprint and now - entry["created_at"] < self.ttl_seconds]
+
+	def lookup(self, question_vector, fingerprint: str):
+		"""
+		Returns the closest cached entry above the similarity threshold, or None
+		"""
+		if fingerprint is None:
+			return None
+		with self._lock:
+			self._evict_expired(fingerprint)
+			best = None
+			if self._entries:
+				similarities = np.stack([entry["vector"] for entry in self._entries]) @ self._normalize(question_vector)
+				index = int(np.argmax(similarities))
+				if similarities[index] >= self.threshold:
+					best = dict(self._entries[index], similarity=float(similarities[index]))
+
+			if best is None:
+				self.misses += 1
+				return None
+			self.hits += 1
+			self.latency_saved += best["latency"]
+			logger.info(f"Answer cache hit (similarity {best['similarity']:.3f}) for: {best['question']}")
+			return best
+
+	def store(self, question: str, question_vector, fingerprint: str, answer: str, reasoning: str, latency: float):
+		"""
+		Caches an answer along with how long the workflow took to produce it
+		"""
+		if fingerprint is None:
+			return
+		with self._lock:
+			self._evict_expired(fingerprint)
+			self._entries.append({
+				"question": question,
+				"vector": self._normalize(question_vector),
+				"fingerprint": fingerprint,
+				"answer": answer,
+				"reasoning": reasoning,
+				"latency": latency,
+				"created_at": time.time(),
+			})
+			del self._entries[:-self.max_entries]
+
+	def clear(self):
+		with self._lock:
+			self._entries = []
+		logger.info("Answer cache cleared")
+
+	def stats(self) -> dict:
+		with self._lock:
+			lookups = self.hits + self.misses
+			return {
+				"entries": len(self._entries),
+				"hits": self.hits,
+				"misses": self.misses,
+				"hit_rate": self.hits / lookups if lookups else 0.0,
+				"latency_saved": self.latency_saved,
+			}
+
+ANSWER_CACHE = SemanticAnswerCache(ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_MAX_ENTRIES)
@@ -0,0 +1,77 @@
+import re
+from functools import lru_cache
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+@lru_cache(maxsize=1)
+def _encoder():
+	# Same encoding RecursiveCharacterTextSplitter.from_tiktoken_encoder uses to size chunks in vector_db.py.
+	# Loaded on first use so importing this module stays cheap at app startup
+	from src.tokenizer import load_encoding
+	return load_encoding("gpt2")
+
+def count_tokens(text: str) -> int:
+	return len(_encoder().encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, token_budget: int, keep_tail: bool = False) -> str:
+	"""
+	Returns text cut to at most token_budget tokens, keeping its start or, with keep_tail, its end
+	"""
+	tokens = _encoder().encode(text, disallowed_special=())
+	if len(tokens) <= token_budget:
+		return text
+	return _encoder().decode(tokens[-token_budget:] if keep_tail else tokens[:token_budget])
+
+def log_prompt_tokens(node: str, prompt: str) -> int:
+	"""
+	Logs and returns the token count of a fully formatted prompt
+	"""
+	tokens = count_tokens(prompt)
+	logger.info(f"[{node}] prompt tokens: {tokens}")
+	return tokens
+
+def _terms(text: str) -> set:
+	return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+def _rank_score(question_terms: set, document) -> float:
+	"""
+	Vectorstore chunks rank by their similarity score; web results, which have none,
+	rank by the share of question terms they contain
+	"""
+	score = document.metadata.get("relevance_score")
+	if score is not None:
+		return score
+	return len(question_terms & _terms(document.page_content)) / len(question_terms) if question_terms else 0.0
+
+def format_document(index: int, document) -> str:
+	source = document.metadata.get("source")
+	header = f"[{index}] ({source})" if source else f"[{index}]"
+	return f"{header}\n{document.page_content.strip()}"
+
+def build_context(question: str, documents: list, token_budget: int) -> str:
+	"""
+	Formats documents compactly and keeps the highest ranked ones that fit in the token budget.
+	A single chunk larger than the remaining budget is truncated rather than dropped when
+	nothing has been included yet, so the context is never empty if documents exist.
+
+	Returns:
+		str: Context text to substitute for {context} / {documents} in prompts
+	"""
+	question_terms = _terms(question)
+	ranked = sorted(documents or [], key=lambda document: _rank_score(question_terms, document), reverse=True)
+
+	sections, used_tokens = [], 0
+	for document in ranked:
+		section = format_document(len(sections) + 1, document)
+		tokens = _encoder().encode(section, disallowed_special=())
+		if used_tokens + len(tokens) > token_budget:
+			if sections:
+				continue
+			tokens = tokens[:token_budget]
+			section = _encoder().decode(tokens)
+		sections.append(section)
+		used_tokens += len(tokens)
+
+	logger.info(f"Context: {len(sections)} of {len(ranked)} documents, {used_tokens}/{token_budget} tokens")
+	return "\n\n".join(sections)
@@ -1,6 +1,8 @@
 from langchain_core.output_parsers import JsonOutputParser
 from langchain.prompts import PromptTemplate 
-from langchain_ollama import ChatOllama
+from src.config import CONTEXT_TOKEN_BUDGET, GENERATION_GRADER_MODE
+from src.agent.context import build_context, log_prompt_tokens
+from src.agent.llm import get_chat_model
 from src.logger import get_logger
 
 logger = get_logger(__name__)
@@ -36,28 +38,142 @@ GRADING_PROMPT = PromptTemplate(
 	input_variables=["generation", "question"],
 )
 
-LLM = ChatOllama(model="deepseek-r1:1.5b", format="json", temperature=0)
+COMBINED_GRADER_PROMPT = PromptTemplate(
+	template="""<|begin_of_text|><|start_header_id|>system<|end_header_id|>
+	You are a grader assessing an answer to a question on two criteria:
+	- grounded: is the answer supported by the facts below?
+	- useful: does the answer resolve the question?
+	You must respond with a JSON object ONLY, with keys 'grounded' and 'useful' whose values are either 'yes' or 'no'.
+	Example: {{"grounded": "yes", "useful": "no"}} — no extra text, no explanation.
 
-def hallucination_grader(state: dict):
+	Facts:
+	{documents}
+	-----
+	Question:
+	{question}
+	-----
+	Answer:
+	{generation}
+	<|eot_id|><|start_header_id|>assistant<|end_header_id|>""",
+	input_variables=["generation", "documents", "question"],
+)
+
+LLM = get_chat_model(json_mode=True)
+
+def _is_yes(score: dict, key: str) -> bool:
+	return str(score.get(key, "no")).strip().lower() == "yes"
+
+def grade_two_call(question: str, context: str, generation: str):
 	"""
+	Grades grounding first, then usefulness only if the answer is grounded (two LLM round trips)
+
+	Returns:
+		tuple: (grounded, useful), where useful is None when grounding failed
 	"""
-	question, documents, generation = state["question"], state["documents"], state["generation"]
 	hallucinationGrader = HALLUCINATION_PROMPT | LLM | JsonOutputParser()
 	answerGrader = GRADING_PROMPT | LLM | JsonOutputParser()
 
-	hallucination_score = hallucinationGrader.invoke({"documents": documents, "generation": generation})
+	log_prompt_tokens("hallucination_grader", HALLUCINATION_PROMPT.format(documents=context, generation=generation))
+	hallucination_score = hallucinationGrader.invoke({"documents": context, "generation": generation})
 	logger.info(f"Hallucination_score: {hallucination_score}")
+	if not _is_yes(hallucination_score, "score"):
+		return False, None
 
-	hallucination_grade = hallucination_score.get("score", "no")
-	
-	if hallucination_grade.lower() == "yes":
+	logger.info("---GRADE LLM GENERATION AGAINST USER QUESTION---")
+	log_prompt_tokens("answer_grader", GRADING_PROMPT.format(question=question, generation=generation))
+	answer_score = answerGrader.invoke({"question": question, "generation": generation})
+	logger.info(f"Answer Grade: {answer_score}")
+	return True, _is_yes(answer_score, "score")
+
+def grade_combined(question: str, context: str, generation: str):
+	"""
+	Grades grounding and usefulness in a single structured LLM call
+
+	Returns:
+		tuple: (grounded, useful)
+	"""
+	combinedGrader = COMBINED_GRADER_PROMPT | LLM | JsonOutputParser()
+	log_prompt_tokens("hallucination_grader", COMBINED_GRADER_PROMPT.format(documents=context, question=question, generation=generation))
+	score = combinedGrader.invoke({"documents": context, "question": question, "generation": generation})
+	logger.info(f"Combined grade: {score}")
+	return _is_yes(score, "grounded"), _is_yes(score, "useful")
+
+async def agrade_two_call(question: str, context: str, generation: str):
+	"""
+	Async variant of grade_two_call
+	"""
+	hallucinationGrader = HALLUCINATION_PROMPT | LLM | JsonOutputParser()
+	answerGrader = GRADING_PROMPT | LLM | JsonOutputParser()
+
+	log_prompt_tokens("hallucination_grader", HALLUCINATION_PROMPT.format(documents=context, generation=generation))
+	hallucination_score = await hallucinationGrader.ainvoke({"documents": context, "generation": generation})
+	logger.info(f"Hallucination_score: {hallucination_score}")
+	if not _is_yes(hallucination_score, "score"):
+		return False, None
+
+	logger.info("---GRADE LLM GENERATION AGAINST USER QUESTION---")
+	log_prompt_tokens("answer_grader", GRADING_PROMPT.format(question=question, generation=generation))
+	answer_score = await answerGrader.ainvoke({"question": question, "generation": generation})
+	logger.info(f"Answer Grade: {answer_score}")
+	return True, _is_yes(answer_score, "score")
+
+async def agrade_combined(question: str, context: str, generation: str):
+	"""
+	Async variant of grade_combined
+	"""
+	combinedGrader = COMBINED_GRADER_PROMPT | LLM | JsonOutputParser()
+	log_prompt_tokens("hallucination_grader", COMBINED_GRADER_PROMPT.format(documents=context, question=question, generation=generation))
+	score = await combinedGrader.ainvoke({"documents": context, "question": question, "generation": generation})
+	logger.info(f"Combined grade: {score}")
+	return _is_yes(score, "grounded"), _is_yes(score, "useful")
+
+GENERATION_GRADERS = {
+	"two_call": grade_two_call,
+	"combined": grade_combined,
+}
+
+ASYNC_GENERATION_GRADERS = {
+	"two_call": agrade_two_call,
+	"combined": agrade_combined,
+}
+
+def _grading_inputs(state: dict):
+	question, generation = state["question"], state["generation"]
+	# Grade against the same trimmed context the answer was generated from
+	context = state.get("context") or build_context(question, state["documents"], CONTEXT_TOKEN_BUDGET)
+	return question, context, generation
+
+def _generation_grader(graders: dict):
+	if GENERATION_GRADER_MODE not in graders:
+		raise ValueError(f"Unknown GENERATION_GRADER_MODE: {GENERATION_GRADER_MODE!r}. Expected one of {', '.join(graders)}.")
+	return graders[GENERATION_GRADER_MODE]
+
+def hallucination_grader(state: dict):
+	"""
+	This function grades whether the generation is grounded in the documents and answers the question,
+	using the GENERATION_GRADER_MODE deployment setting ("two_call" or "combined")
+
+	Args:
+		state: The current graph state
+
+	Returns:
+		str: "useful" to finish, or "not useful" to retry with a web search
+	"""
+	grounded, useful = _generation_grader(GENERATION_GRADERS)(*_grading_inputs(state))
+	return _decide(state, grounded, useful)
+
+async def ahallucination_grader(state: dict):
+	"""
+	Async variant of hallucination_grader
+	"""
+	grounded, useful = await _generation_grader(ASYNC_GENERATION_GRADERS)(*_grading_inputs(state))
+	return _decide(state, grounded, useful)
+
+def _decide(state: dict, grounded: bool, useful: bool) -> str:
+	if grounded:
 		logger.info("---DECISION: LLM GENERATION IS GROUNDED IN DOCUMENTS---") 
-		logger.info("---GRADE LLM GENERATION AGAINST USER QUESTION---")
-		answer_score = answerGrader.invoke({"question": question, "generation": generation})
-		answer_grade = answer_score.get("score", "no")
-		logger.info(f"Answer Grade: {answer_grade}")
 
-		if answer_grade.lower() == "yes":
+		if useful:
 			logger.info("---DECISION: GENERATION ANSWERS QUESTION, NOT HALLUCINATION---")
 			return "useful"
 		else:
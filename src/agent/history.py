@@ -0,0 +1,128 @@
+import re
+from functools import lru_cache
+from src.config import HISTORY_TOKEN_BUDGET, HISTORY_SUMMARY_TOKENS
+from src.agent.context import count_tokens, truncate_to_tokens
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+SUMMARY_TEMPLATE = """<|begin_of_text|><|start_header_id|>system<|end_header_id|>
+	You maintain a rolling summary of a study conversation between a student and an assistant.
+	Update the current summary with the new turns below. Keep the topics, facts and open questions
+	the student may refer back to, drop small talk, and stay under {max_words} words.
+	Reply with the updated summary only.
+	<|eot_id|><|start_header_id|>user<|end_header_id|>
+	Current summary:
+	{summary}
+
+	New turns:
+	{turns}
+	<|eot_id|><|start_header_id|>assistant<|end_header_id|>
+	"""
+
+@lru_cache(maxsize=1)
+def _summarizer():
+	# Built on the first summary update: the app creates a ConversationHistory at startup,
+	# before any chat model is needed
+	from langchain.prompts import PromptTemplate
+	from langchain_core.output_parsers import StrOutputParser
+	from src.agent.llm import get_chat_model
+
+	prompt = PromptTemplate(template=SUMMARY_TEMPLATE, input_variables=["summary", "turns", "max_words"])
+	return prompt | get_chat_model() | StrOutputParser()
+
+def strip_think(text: str) -> str:
+	"""
+	Removes <think> reasoning, including an unterminated block, so it is never resent to the model
+	"""
+	text = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL)
+	return re.sub(r"<think>.*", "", text, flags=re.DOTALL).strip()
+
+def _format_turns(messages: list) -> str:
+	return "\n".join(f"{message['role'].capitalize()}: {message['content']}" for message in messages)
+
+class ConversationHistory:
+	"""
+	Token-budgeted view of one conversation, kept per Streamlit session or API session.
+
+	The most recent turns that fit in token_budget are sent verbatim. Older turns are folded
+	into a rolling summary once, as they leave the window, so each turn costs at most one
+	incremental summary update instead of being resent forever. Only role and content are
+	used, with <think> blocks removed, so stored reasoning never reaches the prompt.
+	"""
+	def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET, summary_token_budget: int = HISTORY_SUMMARY_TOKENS):
+		self.token_budget = token_budget
+		self.summary_token_budget = summary_token_budget
+		self.summary = ""
+		self.summarized = 0  # Leading messages already folded into the summary
+
+	def _split(self, messages: list):
+		"""
+		Returns (turns to fold into the summary, recent turns that fit the token budget)
+		"""
+		cleaned = [{"role": message["role"], "content": strip_think(message["content"])} for message in messages]
+		start, used = len(cleaned), 0
+		while start > self.summarized:
+			tokens = count_tokens(cleaned[start - 1]["content"])
+			if used + tokens > self.token_budget:
+				break
+			used += tokens
+			start -= 1
+		return cleaned[self.summarized:start], cleaned[start:], start
+
+	def _summary_inputs(self, evicted: list) -> dict:
+		logger.info(f"Folding {len(evicted)} messages into the conversation summary")
+		return {"summary": self.summary or "(empty)", "turns": _format_turns(evicted), "max_words": max(20, self.summary_token_budget * 3 // 4)}
+
+	def _apply_summary(self, summary: str, start: int):
+		# Keep the end when over budget: it holds the most recently folded turns
+		self.summary = truncate_to_tokens(strip_think(summary), self.summary_token_budget, keep_tail=True)
+		self.summarized = start
+
+	def _fallback_summary(self, evicted: list, start: int, error: Exception):
+		# Keep the conversation going without the model: append the evicted turns and trim
+		logger.error(f"Conversation summary update failed, falling back to truncation: {error}")
+		self._apply_summary(f"{self.summary}\n{_format_turns(evicted)}".strip(), start)
+
+	def _messages(self, recent: list) -> list:
+		if not self.summary:
+			return recent
+		return [{"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"}] + recent
+
+	def context_messages(self, messages: list) -> list:
+		"""
+		Returns the messages to send as chat history: the summary (as a system message) and
+		the recent turns, updating the summary first if turns left the window
+
+		Args:
+			messages (list): The full conversation as {"role", "content", ...} dicts, oldest first
+		"""
+		evicted, recent, start = self._split(messages)
+		if evicted:
+			try:
+				self._apply_summary(_summarizer().invoke(self._summary_inputs(evicted)), start)
+			except Exception as e:
+				self._fallback_summary(evicted, start, e)
+		return self._messages(recent)
+
+	async def acontext_messages(self, messages: list) -> list:
+		"""
+		Async variant of context_messages
+		"""
+		evicted, recent, start = self._split(messages)
+		if evicted:
+			try:
+				self._apply_summary(await _summarizer().ainvoke(self._summary_inputs(evicted)), start)
+			except Exception as e:
+				self._fallback_summary(evicted, start, e)
+		return self._messages(recent)
+
+	@staticmethod
+	def as_text(context_messages: list) -> str:
+		"""
+		Renders context_messages() output as plain text for prompt templates, e.g. the RAG answer prompt
+		"""
+		return "\n".join(message["content"] if message["role"] == "system" else _format_turns([message]) for message in context_messages)
+
+	def clear(self):
+		self.summary, self.summarized = "", 0
@@ -0,0 +1,252 @@
+import time
+import uuid
+import inspect
+import threading
+from collections import Counter, defaultdict
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import get_buffer_string
+from src.config import OTEL_TRACING
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Callables receiving every trace event; see register_sink()
+TRACE_SINKS = []
+
+def register_sink(sink):
+	"""
+	Registers a callable that receives every structured trace event (a dict with a "type" of
+	"span_start", "span_end" or "run_end")
+	"""
+	if sink not in TRACE_SINKS:
+		TRACE_SINKS.append(sink)
+
+def _emit(event: dict):
+	for sink in TRACE_SINKS:
+		try:
+			sink(event)
+		except Exception as e:
+			logger.error(f"Trace sink {sink!r} failed: {e}")
+
+class _UsageCallback(BaseCallbackHandler):
+	"""
+	Attributes chat model calls and tokens to the node or edge span that made them
+	"""
+	run_inline = True
+
+	def __init__(self, trace):
+		self.trace = trace
+
+	def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+		from src.agent.context import count_tokens
+
+		node = (metadata or {}).get("langgraph_node")
+		self.trace._llm_start(node, run_id, sum(count_tokens(get_buffer_string(batch)) for batch in messages))
+
+	def on_llm_end(self, response, *, run_id, **kwargs):
+		from src.agent.context import count_tokens
+
+		prompt_tokens, completion_tokens, queue_time, model_time = None, 0, 0.0, 0.0
+		for generations in response.generations:
+			for generation in generations:
+				message = getattr(generation, "message", None)
+				usage = getattr(message, "usage_metadata", None)
+				if usage:
+					prompt_tokens = (prompt_tokens or 0) + usage.get("input_tokens", 0)
+					completion_tokens += usage.get("output_tokens", 0)
+				else:
+					completion_tokens += count_tokens(generation.text)
+				# Queue and model time stamped by the LLM gateway (src/agent/llm.py)
+				gateway = getattr(message, "response_metadata", {}).get("gateway") or {}
+				queue_time += gateway.get("queue_time", 0.0)
+				model_time += gateway.get("model_time", 0.0)
+		self.trace._llm_end(run_id, prompt_tokens, completion_tokens, queue_time, model_time)
+
+	def on_llm_error(self, error, *, run_id, **kwargs):
+		self.trace._llm_end(run_id, None, 0, 0.0, 0.0)
+
+class RunTrace:
+	"""
+	Collects one span per node and edge execution of a single RAG run: wall time, LLM calls,
+	prompt/completion tokens, chunk count and loop iteration.
+
+	Pass config() to RAG_AGENT.invoke/stream so the instrumented nodes and edges in workflow.py
+	find the trace and its callback sees the run's LLM calls. Every span is also emitted as a
+	structured event to the registered sinks (Prometheus metrics, OpenTelemetry).
+	"""
+	def __init__(self, question: str = None):
+		self.run_id = uuid.uuid4().hex
+		self.question = question
+		self.start_time = time.time()
+		self.spans = []
+		self.callback = _UsageCallback(self)
+		self._started = time.perf_counter()
+		self._lock = threading.Lock()
+		self._open = defaultdict(list)
+		self._llm_runs = {}
+		self._visits = Counter()
+		self._summary = None
+
+	def config(self) -> dict:
+		return {"configurable": {"run_trace": self}, "callbacks": [self.callback]}
+
+	def start_span(self, name: str, kind: str, node: str) -> dict:
+		"""
+		Opens a span for a node, or for an edge leaving `node`. LLM calls made while it is
+		the innermost open span of `node` are counted towards it.
+		"""
+		with self._lock:
+			self._visits[(kind, name)] += 1
+			span = {
+				"run_id": self.run_id,
+				"name": name,
+				"kind": kind,
+				"node": node,
+				"iteration": self._visits[(kind, name)],
+				"start_time": time.time(),
+				"wall_time": None,
+				"llm_calls": 0,
+				"prompt_tokens": 0,
+				"completion_tokens": 0,
+				"llm_queue_time": 0.0,
+				"llm_model_time": 0.0,
+				"chunks": None,
+				"decision": None,
+				"error": None,
+				"_started": time.perf_counter(),
+			}
+			self._open[node].append(span)
+		_emit({"type": "span_start", **_public(span)})
+		return span
+
+	def end_span(self, span: dict, result=None, error: Exception = None):
+		with self._lock:
+			span["wall_time"] = time.perf_counter() - span.pop("_started")
+			if span["kind"] == "edge":
+				span["decision"] = result
+			elif isinstance(result, dict) and result.get("documents") is not None:
+				span["chunks"] = len(result["documents"])
+			if error is not None:
+				span["error"] = f"{type(error).__name__}: {error}"
+			self._open[span["node"]].remove(span)
+			self.spans.append(span)
+		logger.debug(f"[{span['kind']}:{span['name']}#{span['iteration']}] {span['wall_time']:.3f}s, {span['llm_calls']} LLM calls")
+		_emit({"type": "span_end", **span})
+
+	def _llm_start(self, node: str, run_id, prompt_tokens: int):
+		with self._lock:
+			stack = self._open.get(node)
+			span = stack[-1] if stack else None
+			self._llm_runs[run_id] = (span, prompt_tokens)
+			if span is not None:
+				span["llm_calls"] += 1
+
+	def _llm_end(self, run_id, prompt_tokens, completion_tokens: int, queue_time: float, model_time: float):
+		with self._lock:
+			span, estimated_prompt_tokens = self._llm_runs.pop(run_id, (None, 0))
+			if span is not None:
+				span["prompt_tokens"] += estimated_prompt_tokens if prompt_tokens is None else prompt_tokens
+				span["completion_tokens"] += completion_tokens
+				span["llm_queue_time"] += queue_time
+				span["llm_model_time"] += model_time
+
+	def finish(self) -> dict:
+		"""
+		Closes the run, emits a "run_end" event and returns the run summary
+		"""
+		if self._summary is None:
+			self._summary = self.summary()
+			_emit({"type": "run_end", **self._summary, "spans": list(self.spans)})
+			logger.info(
+				f"Run {self.run_id} finished in {self._summary['wall_time']:.2f}s: {self._summary['llm_calls']} LLM calls, "
+				f"{self._summary['prompt_tokens']} prompt / {self._summary['completion_tokens']} completion tokens"
+			)
+		return self._summary
+
+	def summary(self) -> dict:
+		with self._lock:
+			spans = list(self.spans)
+		return {
+			"run_id": self.run_id,
+			"question": self.question,
+			"start_time": self.start_time,
+			"wall_time": time.perf_counter() - self._started,
+			"llm_calls": sum(span["llm_calls"] for span in spans),
+			"prompt_tokens": sum(span["prompt_tokens"] for span in spans),
+			"completion_tokens": sum(span["completion_tokens"] for span in spans),
+			"llm_queue_time": sum(span["llm_queue_time"] for span in spans),
+			"llm_model_time": sum(span["llm_model_time"] for span in spans),
+			"retrieved_chunks": sum(span["chunks"] or 0 for span in spans if span["name"] == "retrieve"),
+			"iterations": {span["name"]: span["iteration"] for span in spans if span["kind"] == "node"},
+			"steps": [{key: span[key] for key in ("name", "kind", "iteration", "wall_time", "llm_calls", "prompt_tokens", "completion_tokens", "llm_queue_time", "llm_model_time", "chunks", "decision", "error")} for span in spans],
+		}
+
+def _public(span: dict) -> dict:
+	return {key: value for key, value in span.items() if not key.startswith("_")}
+
+def _trace_from(config) -> RunTrace:
+	"""
+	Returns the run's trace, or a throwaway one so metrics are still recorded for untraced runs
+	"""
+	trace = ((config or {}).get("configurable") or {}).get("run_trace")
+	return trace if trace is not None else RunTrace()
+
+def _wrap(func, name: str, kind: str, node: str):
+	# Not functools.wraps: LangGraph inspects the signature to decide whether to pass config
+	if inspect.iscoroutinefunction(func):
+		async def wrapped(state, config):
+			trace = _trace_from(config)
+			span = trace.start_span(name, kind, node)
+			try:
+				result = await func(state)
+			except Exception as e:
+				trace.end_span(span, error=e)
+				raise
+			trace.end_span(span, result)
+			return result
+	else:
+		def wrapped(state, config):
+			trace = _trace_from(config)
+			span = trace.start_span(name, kind, node)
+			try:
+				result = func(state)
+			except Exception as e:
+				trace.end_span(span, error=e)
+				raise
+			trace.end_span(span, result)
+			return result
+
+	wrapped.__name__, wrapped.__qualname__, wrapped.__doc__ = func.__name__, func.__qualname__, func.__doc__
+	return wrapped
+
+def _instrument(func, afunc, name: str, kind: str, node: str):
+	"""
+	Wraps func, and its async variant afunc if given, into one graph runnable: invoke/stream
+	run func and ainvoke/astream run afunc
+	"""
+	if afunc is None:
+		return _wrap(func, name, kind, node)
+	from langgraph.utils.runnable import RunnableCallable
+	return RunnableCallable(_wrap(func, name, kind, node), _wrap(afunc, name, kind, node), name=name)
+
+def instrument_node(name: str, func, afunc=None):
+	"""
+	Wraps a graph node so each execution is recorded as a span of the current RunTrace
+	"""
+	return _instrument(func, afunc, name, "node", name)
+
+def instrument_edge(source: str, func, afunc=None):
+	"""
+	Wraps a conditional edge leaving `source`; the span records the routing decision and the
+	LLM calls the edge makes (e.g. the hallucination grader)
+	"""
+	return _instrument(func, afunc, func.__name__, "edge", source)
+
+def _register_default_sinks():
+	from src.agent.metrics import METRICS
+	register_sink(METRICS.observe)
+	if OTEL_TRACING:
+		from src.agent.otel import OpenTelemetrySink
+		register_sink(OpenTelemetrySink())
+
+_register_default_sinks()
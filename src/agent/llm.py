@@ -0,0 +1,500 @@
+"""
+LLM gateway: every chat model call in the process goes through GATEWAY, which
+
+	- shares one pooled HTTP client per direction between all ChatOllama instances
+	- coalesces identical concurrent non-streaming prompts into one model call (single-flight)
+	- micro-batches short JSON grading prompts from concurrent runs into one combined call
+	- caps the calls in flight at LLM_CONCURRENCY across threads and event loops
+	- stamps each response with the time spent queueing versus inside the model
+
+Build models with get_chat_model(); RunTrace picks the timings up from response_metadata["gateway"].
+"""
+import json
+import time
+import queue
+import asyncio
+import threading
+from functools import lru_cache
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from src.config import (
+	LLM_BACKEND, LLM_MODEL, STUB_LLM_LATENCY, LLM_CONCURRENCY, LLM_SINGLE_FLIGHT, LLM_FLIGHT_TIMEOUT_SECONDS,
+	LLM_BATCH_WINDOW_MS, LLM_BATCH_MAX_SIZE, LLM_BATCH_MAX_PROMPT_TOKENS,
+)
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+BATCH_PROMPT = """You will receive {count} independent tasks, each starting with a line "### Task <number>".
+Complete every task exactly as its own instructions say, independently of the other tasks.
+You must respond in **strict JSON format** as follows:
+{{"results": [<JSON answer to task 1>, <JSON answer to task 2>, ...]}}
+with exactly {count} entries in task order. Do not include any preamble, explanation, or extra text.
+
+{tasks}"""
+
+class ConcurrencyLimiter:
+	"""
+	Caps the number of LLM calls in flight across threads (Streamlit sessions, grading pools)
+	and event loops (the async API), so Ollama never sees more parallel requests than it serves.
+	Waiters are admitted in arrival order; a released slot is handed straight to the next one.
+	"""
+	def __init__(self, limit: int):
+		if limit < 1:
+			raise ValueError("LLM concurrency limit must be at least 1")
+		self.limit = limit
+		self._lock = threading.Lock()
+		self._active = 0
+		self._waiters = deque()
+
+	def acquire(self):
+		event = threading.Event()
+		with self._lock:
+			if self._active < self.limit and not self._waiters:
+				self._active += 1
+				return
+			self._waiters.append(event)
+		event.wait()
+
+	async def aacquire(self):
+		loop = asyncio.get_running_loop()
+		future = loop.create_future()
+		waiter = (loop, future)
+		with self._lock:
+			if self._active < self.limit and not self._waiters:
+				self._active += 1
+				return
+			self._waiters.append(waiter)
+		try:
+			await future
+		except asyncio.CancelledError:
+			with self._lock:
+				queued = waiter in self._waiters
+				if queued:
+					self._waiters.remove(waiter)
+			# A slot already handed to this waiter must be passed on
+			if not queued and not future.cancelled():
+				self.release()
+			raise
+
+	def release(self):
+		with self._lock:
+			if not self._waiters:
+				self._active -= 1
+				return
+			waiter = self._waiters.popleft()
+		if isinstance(waiter, threading.Event):
+			waiter.set()
+		else:
+			loop, future = waiter
+			loop.call_soon_threadsafe(self._hand_over, future)
+
+	def _hand_over(self, future):
+		if future.done():
+			self.release()
+		else:
+			future.set_result(None)
+
+	def stats(self) -> dict:
+		with self._lock:
+			return {"limit": self.limit, "active": self._active, "waiting": len(self._waiters)}
+
+	def __enter__(self):
+		self.acquire()
+		return self
+
+	def __exit__(self, *exc_info):
+		self.release()
+
+	async def __aenter__(self):
+		await self.aacquire()
+		return self
+
+	async def __aexit__(self, *exc_info):
+		self.release()
+
+def _settle(future, result, error):
+	if future.done():
+		return
+	if error is not None:
+		future.set_exception(error)
+	else:
+		future.set_result(result)
+
+def _shared_error(error: BaseException) -> Exception:
+	"""
+	The error handed to the other callers waiting on a call that raised error. Interrupts such as
+	KeyboardInterrupt or cancellation belong to the caller they hit, so the others get a RuntimeError
+	"""
+	return error if isinstance(error, Exception) else RuntimeError(f"Coalesced call was interrupted ({type(error).__name__})")
+
+class PendingTimeout(TimeoutError):
+	"""
+	Raised when a PendingResult is not resolved within the caller's timeout
+	"""
+
+class PendingResult:
+	"""
+	Result of a call made on someone else's behalf, awaitable from threads and event loops alike
+	"""
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._event = threading.Event()
+		self._futures = []
+		self._result, self._error = None, None
+
+	def resolve(self, result=None, error: Exception = None):
+		with self._lock:
+			self._result, self._error = result, error
+			self._event.set()
+			futures, self._futures = self._futures, []
+		for loop, future in futures:
+			loop.call_soon_threadsafe(_settle, future, result, error)
+
+	def wait(self, timeout: float = None):
+		if not self._event.wait(timeout):
+			raise PendingTimeout(f"No result after {timeout}s")
+		if self._error is not None:
+			raise self._error
+		return self._result
+
+	async def await_result(self, timeout: float = None):
+		with self._lock:
+			if self._event.is_set():
+				future = None
+			else:
+				future = asyncio.get_running_loop().create_future()
+				self._futures.append((asyncio.get_running_loop(), future))
+		if future is not None:
+			try:
+				return await asyncio.wait_for(future, timeout)
+			except asyncio.TimeoutError:
+				raise PendingTimeout(f"No result after {timeout}s") from None
+		return self.wait()
+
+def _prompt_text(messages: list) -> str:
+	return "\n\n".join(message.content for message in messages if isinstance(message.content, str))
+
+def _stamp(result: ChatResult, **gateway) -> ChatResult:
+	for generation in result.generations:
+		generation.message.response_metadata["gateway"] = gateway
+	return result
+
+def _follower_copy(result: ChatResult, waited: float) -> ChatResult:
+	"""
+	Copy of a coalesced result for a follower: no model time or tokens were spent on its behalf
+	"""
+	generations = []
+	for generation in result.generations:
+		message = generation.message.model_copy(deep=True)
+		message.usage_metadata = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+		message.response_metadata["gateway"] = {"queue_time": waited, "model_time": 0.0, "coalesced": True}
+		generations.append(ChatGeneration(message=message, generation_info=generation.generation_info))
+	return ChatResult(generations=generations, llm_output=result.llm_output)
+
+class MicroBatcher:
+	"""
+	Collects short batchable prompts for up to window seconds (or max_size prompts), then sends
+	them as one BATCH_PROMPT call and splits the JSON results back out. Prompts from different
+	runs share the call, so concurrent students' grading costs one round trip instead of many.
+	If the combined answer cannot be split, each prompt is sent on its own.
+	"""
+	def __init__(self, gateway, window: float, max_size: int):
+		self.gateway = gateway
+		self.window = window
+		self.max_size = max_size
+		self._queue = queue.Queue()
+		self._thread = None
+		self._thread_lock = threading.Lock()
+		self._executor = ThreadPoolExecutor(max_workers=gateway.limiter.limit, thread_name_prefix="llm-batch")
+
+	def submit(self, model: BaseChatModel, messages: list) -> PendingResult:
+		with self._thread_lock:
+			if self._thread is None:
+				self._thread = threading.Thread(target=self._collect, name="llm-batcher", daemon=True)
+				self._thread.start()
+		pending = PendingResult()
+		self._queue.put((model, messages, pending, time.perf_counter()))
+		return pending
+
+	def _collect(self):
+		while True:
+			batch = [self._queue.get()]
+			deadline = time.perf_counter() + self.window
+			while len(batch) < self.max_size:
+				remaining = deadline - time.perf_counter()
+				if remaining <= 0:
+					break
+				try:
+					batch.append(self._queue.get(timeout=remaining))
+				except queue.Empty:
+					break
+
+			groups = {}
+			for item in batch:
+				groups.setdefault(id(item[0]), []).append(item)
+			for group in groups.values():
+				self._executor.submit(self._dispatch, group)
+
+	def _dispatch(self, group: list):
+		model = group[0][0]
+		if len(group) == 1:
+			_, messages, pending, submitted = group[0]
+			try:
+				pending.resolve(self.gateway._call(model, messages, None, None, submitted))
+			except BaseException as e:
+				pending.resolve(error=_shared_error(e))
+				if not isinstance(e, Exception):
+					raise
+			return
+
+		tasks = "\n\n".join(f"### Task {index}\n{_prompt_text(messages)}" for index, (_, messages, _, _) in enumerate(group, start=1))
+		prompt = [HumanMessage(content=BATCH_PROMPT.format(count=len(group), tasks=tasks))]
+		submitted = min(item[3] for item in group)
+		try:
+			combined = self.gateway._call(model, prompt, None, None, submitted)
+			results = json.loads(combined.generations[0].message.content)["results"]
+			if not isinstance(results, list) or len(results) != len(group):
+				raise ValueError(f"expected {len(group)} results, got {results!r}")
+		except BaseException as e:
+			if not isinstance(e, Exception):
+				for _, _, pending, _ in group:
+					pending.resolve(error=_shared_error(e))
+				raise
+			logger.info(f"Micro-batch of {len(group)} prompts could not be split ({e}); sending them one by one")
+			self.gateway._count("batch_fallbacks")
+			for _, messages, pending, queued_at in group:
+				self._executor.submit(self._dispatch, [(model, messages, pending, queued_at)])
+			return
+
+		self.gateway._count("batched_calls")
+		self.gateway._count("batched_prompts", len(group))
+		gateway = combined.generations[0].message.response_metadata["gateway"]
+		usage = combined.generations[0].message.usage_metadata
+		# The combined call's token counts are split evenly between the prompts it answered
+		usage = {key: value // len(group) for key, value in usage.items() if isinstance(value, int)} if usage else None
+		for (_, _, pending, queued_at), result in zip(group, results):
+			message = AIMessage(content=json.dumps(result), usage_metadata=usage, response_metadata={
+				"gateway": {"queue_time": gateway["queue_time"] + submitted - queued_at, "model_time": gateway["model_time"], "batched": len(group)},
+			})
+			pending.resolve(ChatResult(generations=[ChatGeneration(message=message)]))
+
+class LLMGateway:
+	"""
+	Process-wide front door for chat model calls; see the module docstring
+	"""
+	def __init__(self, limit: int, single_flight: bool, batch_window: float, batch_max_size: int, batch_max_prompt_tokens: int, flight_timeout: float = None):
+		self.limiter = ConcurrencyLimiter(limit)
+		self.single_flight = single_flight
+		self.flight_timeout = flight_timeout
+		self.batch_max_prompt_tokens = batch_max_prompt_tokens
+		self.batcher = MicroBatcher(self, batch_window, batch_max_size) if batch_window > 0 and batch_max_size > 1 else None
+		self._lock = threading.Lock()
+		self._flights = {}
+		self._counters = {"calls": 0, "coalesced": 0, "batched_calls": 0, "batched_prompts": 0, "batch_fallbacks": 0, "queue_time": 0.0, "model_time": 0.0}
+		self._client, self._async_client = None, None
+
+	def _count(self, key: str, value=1):
+		with self._lock:
+			self._counters[key] += value
+
+	def pooled(self, model):
+		"""
+		Points a ChatOllama at the gateway's shared HTTP clients, so every node reuses one
+		keep-alive connection pool instead of opening its own
+		"""
+		with self._lock:
+			if self._client is None:
+				import httpx
+				from ollama import AsyncClient, Client
+
+				limits = httpx.Limits(max_connections=self.limiter.limit * 2, max_keepalive_connections=self.limiter.limit)
+				self._client = Client(host=model.base_url, limits=limits, **(model.client_kwargs or {}))
+				self._async_client = AsyncClient(host=model.base_url, limits=limits, **(model.client_kwargs or {}))
+		model._client, model._async_client = self._client, self._async_client
+		return model
+
+	# Direct calls, holding a limiter slot for their duration
+
+	def _call(self, model, messages, stop, run_manager, submitted: float, **kwargs) -> ChatResult:
+		with self.limiter:
+			started = time.perf_counter()
+			result = model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+		return self._record(result, started - submitted, time.perf_counter() - started)
+
+	async def _acall(self, model, messages, stop, run_manager, submitted: float, **kwargs) -> ChatResult:
+		async with self.limiter:
+			started = time.perf_counter()
+			result = await model._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+		return self._record(result, started - submitted, time.perf_counter() - started)
+
+	def _record(self, result: ChatResult, queue_time: float, model_time: float) -> ChatResult:
+		with self._lock:
+			self._counters["calls"] += 1
+			self._counters["queue_time"] += queue_time
+			self._counters["model_time"] += model_time
+		return _stamp(result, queue_time=queue_time, model_time=model_time)
+
+	# Non-streaming calls: single-flight, then micro-batching or a direct call
+
+	def _join(self, key):
+		"""
+		Returns (flight, is_leader) for a prompt key
+		"""
+		with self._lock:
+			flight = self._flights.get(key)
+			if flight is not None:
+				self._counters["coalesced"] += 1
+				return flight, False
+			flight = self._flights[key] = PendingResult()
+			return flight, True
+
+	def _leave(self, key, flight: PendingResult, result=None, error: BaseException = None):
+		with self._lock:
+			if self._flights.get(key) is flight:
+				self._flights.pop(key)
+		flight.resolve(result, None if error is None else _shared_error(error))
+
+	def _flight_key(self, model, messages, stop, kwargs):
+		if not self.single_flight:
+			return None
+		return (model._get_llm_string(stop=stop, **kwargs), tuple((message.type, str(message.content)) for message in messages))
+
+	def _batchable(self, batchable: bool, messages: list, kwargs: dict) -> bool:
+		if not (batchable and self.batcher is not None) or kwargs:
+			return False
+		from src.agent.context import count_tokens
+		return count_tokens(_prompt_text(messages)) <= self.batch_max_prompt_tokens
+
+	def generate(self, model, messages, stop=None, run_manager=None, batchable: bool = False, **kwargs) -> ChatResult:
+		submitted = time.perf_counter()
+		key = self._flight_key(model, messages, stop, kwargs)
+		if key is not None:
+			flight, leader = self._join(key)
+			if not leader:
+				try:
+					return _follower_copy(flight.wait(self.flight_timeout), time.perf_counter() - submitted)
+				except PendingTimeout:
+					logger.info(f"Coalesced prompt got no answer within {self.flight_timeout}s; calling the model directly")
+					key = None
+		try:
+			if stop is None and self._batchable(batchable, messages, kwargs):
+				result = self.batcher.submit(model, messages).wait()
+			else:
+				result = self._call(model, messages, stop, run_manager, submitted, **kwargs)
+		except BaseException as e:
+			# BaseException too: a leader interrupted by KeyboardInterrupt, SystemExit or a host's
+			# script-control exception must still release its followers and its flight key
+			if key is not None:
+				self._leave(key, flight, error=e)
+			raise
+		if key is not None:
+			self._leave(key, flight, result)
+		return result
+
+	async def agenerate(self, model, messages, stop=None, run_manager=None, batchable: bool = False, **kwargs) -> ChatResult:
+		submitted = time.perf_counter()
+		key = self._flight_key(model, messages, stop, kwargs)
+		if key is not None:
+			flight, leader = self._join(key)
+			if not leader:
+				try:
+					return _follower_copy(await flight.await_result(self.flight_timeout), time.perf_counter() - submitted)
+				except PendingTimeout:
+					logger.info(f"Coalesced prompt got no answer within {self.flight_timeout}s; calling the model directly")
+					key = None
+		try:
+			if stop is None and self._batchable(batchable, messages, kwargs):
+				result = await self.batcher.submit(model, messages).await_result()
+			else:
+				result = await self._acall(model, messages, stop, run_manager, submitted, **kwargs)
+		except BaseException as e:
+			if key is not None:
+				self._leave(key, flight, error=e)
+			raise
+		if key is not None:
+			self._leave(key, flight, result)
+		return result
+
+	# Streaming calls: capped and timed; the timings arrive on a final empty chunk
+
+	def _timing_chunk(self, queue_time: float, model_time: float) -> ChatGenerationChunk:
+		with self._lock:
+			self._counters["calls"] += 1
+			self._counters["queue_time"] += queue_time
+			self._counters["model_time"] += model_time
+		return ChatGenerationChunk(message=AIMessageChunk(content="", response_metadata={"gateway": {"queue_time": queue_time, "model_time": model_time}}))
+
+	def stream(self, model, messages, stop=None, run_manager=None, **kwargs):
+		submitted = time.perf_counter()
+		with self.limiter:
+			started = time.perf_counter()
+			yield from model._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+		yield self._timing_chunk(started - submitted, time.perf_counter() - started)
+
+	async def astream(self, model, messages, stop=None, run_manager=None, **kwargs):
+		submitted = time.perf_counter()
+		async with self.limiter:
+			started = time.perf_counter()
+			async for chunk in model._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+				yield chunk
+		yield self._timing_chunk(started - submitted, time.perf_counter() - started)
+
+	def stats(self) -> dict:
+		with self._lock:
+			counters = dict(self._counters)
+		return {**counters, **self.limiter.stats(), "batching": self.batcher is not None}
+
+GATEWAY = LLMGateway(LLM_CONCURRENCY, LLM_SINGLE_FLIGHT, LLM_BATCH_WINDOW_MS / 1000, LLM_BATCH_MAX_SIZE, LLM_BATCH_MAX_PROMPT_TOKENS, LLM_FLIGHT_TIMEOUT_SECONDS)
+
+class GatewayChatModel(BaseChatModel):
+	"""
+	Chat model wrapper that routes every call of `model` through GATEWAY
+	"""
+	model: BaseChatModel
+	batchable: bool = False
+
+	@property
+	def _llm_type(self) -> str:
+		return self.model._llm_type
+
+	def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+		return GATEWAY.generate(self.model, messages, stop, run_manager, self.batchable, **kwargs)
+
+	async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+		return await GATEWAY.agenerate(self.model, messages, stop, run_manager, self.batchable, **kwargs)
+
+	def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+		yield from GATEWAY.stream(self.model, messages, stop, run_manager, **kwargs)
+
+	async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+		async for chunk in GATEWAY.astream(self.model, messages, stop, run_manager, **kwargs):
+			yield chunk
+
+@lru_cache(maxsize=None)
+def get_chat_model(json_mode: bool = False, streaming: bool = False, batchable: bool = False, model: str = None):
+	"""
+	Builds the chat model for a workflow node from the LLM_BACKEND setting, once per argument set
+
+	Args:
+		json_mode: Constrain the output to JSON (graders and query rewriting)
+		streaming: Whether the node's tokens should reach LangGraph's "messages" stream;
+			non-streaming models are tagged "nostream" so their JSON stays out of the chat
+		batchable: Short JSON prompts from this model may be micro-batched with other runs' prompts
+		model: Ollama model name, LLM_MODEL by default
+
+	Returns:
+		Runnable: ChatOllama, or StubChatModel for offline runs, behind the shared GATEWAY
+	"""
+	if LLM_BACKEND == "stub":
+		from src.agent.stub_llm import StubChatModel
+		chat_model = StubChatModel(json_mode=json_mode, latency=STUB_LLM_LATENCY)
+	else:
+		from langchain_ollama import ChatOllama
+		chat_model = GATEWAY.pooled(ChatOllama(model=model or LLM_MODEL, temperature=0, **({"format": "json"} if json_mode else {})))
+	# Non-streaming models always take the generate path, where single-flight and batching apply
+	chat_model = GatewayChatModel(model=chat_model, batchable=batchable and json_mode, disable_streaming=not streaming)
+	return chat_model if streaming else chat_model.with_config(tags=["nostream"])
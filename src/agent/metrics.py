@@ -0,0 +1,108 @@
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _labels(**labels) -> str:
+	return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+class PrometheusMetrics:
+	"""
+	In-process counters and histograms fed by RunTrace events, rendered in the Prometheus
+	text exposition format. No client library is needed; see start_metrics_server().
+	"""
+	def __init__(self, buckets: tuple = DURATION_BUCKETS):
+		self.buckets = buckets
+		self._lock = threading.Lock()
+		self._counters = defaultdict(float)
+		self._histograms = {}
+
+	def _observe_histogram(self, name: str, labels: str, value: float):
+		histogram = self._histograms.setdefault((name, labels), {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+		for index, bound in enumerate(self.buckets):
+			if value <= bound:
+				histogram["buckets"][index] += 1
+		histogram["sum"] += value
+		histogram["count"] += 1
+
+	def observe(self, event: dict):
+		"""
+		Trace sink: updates the metrics from one span_end or run_end event
+		"""
+		with self._lock:
+			if event["type"] == "span_end":
+				labels = _labels(name=event["name"], kind=event["kind"])
+				self._observe_histogram("rag_step_duration_seconds", labels, event["wall_time"])
+				self._counters[("rag_llm_calls_total", labels)] += event["llm_calls"]
+				self._counters[("rag_llm_tokens_total", _labels(name=event["name"], kind=event["kind"], type="prompt"))] += event["prompt_tokens"]
+				self._counters[("rag_llm_tokens_total", _labels(name=event["name"], kind=event["kind"], type="completion"))] += event["completion_tokens"]
+				self._counters[("rag_llm_seconds_total", _labels(name=event["name"], kind=event["kind"], phase="queue"))] += event["llm_queue_time"]
+				self._counters[("rag_llm_seconds_total", _labels(name=event["name"], kind=event["kind"], phase="model"))] += event["llm_model_time"]
+				if event["chunks"] is not None:
+					self._counters[("rag_documents_total", labels)] += event["chunks"]
+				if event["error"] is not None:
+					self._counters[("rag_step_errors_total", labels)] += 1
+			elif event["type"] == "run_end":
+				self._observe_histogram("rag_run_duration_seconds", "", event["wall_time"])
+				self._counters[("rag_runs_total", "")] += 1
+
+	def render(self) -> str:
+		with self._lock:
+			lines = []
+			for name in sorted({name for name, _ in self._counters}):
+				lines.append(f"# TYPE {name} counter")
+				for (metric, labels), value in sorted(self._counters.items()):
+					if metric == name:
+						lines.append(f"{name}{{{labels}}} {value:g}" if labels else f"{name} {value:g}")
+
+			for name in sorted({name for name, _ in self._histograms}):
+				lines.append(f"# TYPE {name} histogram")
+				for (metric, labels), histogram in sorted(self._histograms.items()):
+					if metric != name:
+						continue
+					prefix = f"{labels}," if labels else ""
+					for bound, count in zip(self.buckets, histogram["buckets"]):
+						lines.append(f'{name}_bucket{{{prefix}le="{bound:g}"}} {count}')
+					lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram["count"]}')
+					lines.append(f"{name}_sum{{{labels}}} {histogram['sum']:g}" if labels else f"{name}_sum {histogram['sum']:g}")
+					lines.append(f"{name}_count{{{labels}}} {histogram['count']}" if labels else f"{name}_count {histogram['count']}")
+			return "\n".join(lines) + "\n"
+
+METRICS = PrometheusMetrics()
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port: int, metrics: PrometheusMetrics = METRICS):
+	"""
+	Serves metrics.render() at http://0.0.0.0:<port>/metrics from a daemon thread.
+	Safe to call on every Streamlit rerun; only the first call starts the server.
+	"""
+	global _server
+	with _server_lock:
+		if _server is not None:
+			return _server
+
+		class MetricsHandler(BaseHTTPRequestHandler):
+			def do_GET(self):
+				if self.path.split("?")[0] != "/metrics":
+					self.send_error(404)
+					return
+				body = metrics.render().encode("utf-8")
+				self.send_response(200)
+				self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+				self.send_header("Content-Length", str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+			def log_message(self, format, *args):
+				logger.debug(format % args)
+
+		_server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+		threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+		logger.info(f"Serving Prometheus metrics on port {port}")
+		return _server
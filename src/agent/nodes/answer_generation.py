@@ -1,22 +1,33 @@
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_ollama import ChatOllama
+from src.config import CONTEXT_TOKEN_BUDGET
+from src.agent.context import build_context, log_prompt_tokens
+from src.agent.llm import get_chat_model
 from src.logger import get_logger
 
 
 logger = get_logger(__name__)
-LLM = ChatOllama(model="deepseek-r1:1.5b", temperature=0)
+LLM = get_chat_model(streaming=True)
 
 ANSGEN_PROMPT = PromptTemplate(
 	template="""<|begin_of_text|><|start_header_id|>system<|end_header_id|> You are an assistant for question-answering tasks.
 	Use the following pieces of retrieved context to answer the question. If you don't know the answer, just say that you don't know.
 	Use three sentences maximum and keep the answer concise <|eot_id|><|start_header_id|>user<|end_header_id|>
+	Conversation so far: {history}
 	Question: {question}
 	Context: {context}
 	Answer: <|eot_id|><|start_header_id|>assistant<|end_header_id|>""",
-	input_variables=["question", "document"],
+	input_variables=["question", "context", "history"],
 )
 
+def _prepare(state: dict):
+	logger.info("---GENERATE RESPONSE---")
+	question, documents = state["question"], state["documents"]
+	context = build_context(question, documents, CONTEXT_TOKEN_BUDGET)
+	inputs = {"context": context, "question": question, "history": state.get("history") or "None"}
+	log_prompt_tokens("generate_response", ANSGEN_PROMPT.format(**inputs))
+	return question, documents, context, inputs
+
 def generate_response(state: dict):
 	"""
 	This function generates an answer using RAG on retrieved documents 
@@ -25,12 +36,21 @@ def generate_response(state: dict):
 		state: Current state of graph
 
 	Returns:
-		state: New key "generation" added to state that contains LLM response
+		state: New keys "generation" with the LLM response and "context" with the trimmed context it saw
 	"""
-	logger.info("---GENERATE RESPONSE---")
-	question, documents = state["question"], state["documents"]
+	question, documents, context, inputs = _prepare(state)
 	
+	# Streaming the chain lets LangGraph's "messages" stream mode forward tokens as they arrive
 	rag_chain = ANSGEN_PROMPT | LLM | StrOutputParser()
-	generation = rag_chain.invoke({"context": documents, "question": question})
+	generation = "".join(rag_chain.stream(inputs))
 	
-	return {"documents": documents, "question": question, "generation": generation} 
+	return {"documents": documents, "question": question, "generation": generation, "context": context}
+
+async def agenerate_response(state: dict):
+	"""
+	Async variant of generate_response, streaming the chain with astream
+	"""
+	question, documents, context, inputs = _prepare(state)
+	rag_chain = ANSGEN_PROMPT | LLM | StrOutputParser()
+	generation = "".join([chunk async for chunk in rag_chain.astream(inputs)])
+	return {"documents": documents, "question": question, "generation": generation, "context": context}
@@ -1,11 +1,14 @@
-from langchain_ollama import ChatOllama
 from langchain_core.output_parsers import JsonOutputParser
 from langchain.prompts import PromptTemplate 
+from src.config import GRADING_MODE, GRADING_CONCURRENCY, RELEVANCE_ACCEPT_THRESHOLD, RELEVANCE_REJECT_THRESHOLD
+from src.agent.context import log_prompt_tokens
+from src.agent.llm import get_chat_model
 from src.logger import get_logger
 
 
 logger = get_logger(__name__)
-LLM = ChatOllama(model="deepseek-r1:1.5b", format="json", temperature=0)
+# Per-document relevance prompts are short, so the gateway may micro-batch them across runs
+LLM = get_chat_model(json_mode=True, batchable=True)
 
 RETRIEVAL_PROMPT = PromptTemplate(
 	template="""<|begin_of_text|><|start_header_id|>system<|end_header_id|>
@@ -37,6 +40,172 @@ RETRIEVAL_PROMPT = PromptTemplate(
 )
 
 
+BATCH_RETRIEVAL_PROMPT = PromptTemplate(
+	template="""<|begin_of_text|><|start_header_id|>system<|end_header_id|>
+	You are a grader assessing the relevance of several retrieved documents to a user question.
+	If a document contains keywords or content related to the user question, grade it as relevant.
+	It does not need to be a stringent test — the goal is to filter out obviously unrelated results.
+
+	You must respond in **strict JSON format** with one score per document, in document order:
+	{{"scores": ["yes", "no", ...]}}
+
+	- The list must contain exactly {count} scores.
+	- Do not use numeric values like 1 or 0.
+	- Do not include any preamble, explanation, or extra text.
+
+	<|eot_id|><|start_header_id|>user<|end_header_id|>
+	Here are the retrieved documents:
+
+	{documents}
+
+	Here is the user question:
+
+	{question}
+
+	Now, grade each document's relevance to the question. Respond strictly as instructed.
+
+	<|eot_id|><|start_header_id|>assistant<|end_header_id|>
+	""",
+	input_variables=["question", "documents", "count"]
+)
+
+
+def _grade_inputs(question: str, documents: list):
+	inputs = [{"question": question, "document": doc.page_content} for doc in documents]
+	log_prompt_tokens("grade_documents", "".join(RETRIEVAL_PROMPT.format(**grade_input) for grade_input in inputs))
+	return inputs
+
+def _parse_grade(score) -> str:
+	grade = score.get("score", "no") if isinstance(score, dict) else score
+	return str(grade).strip().lower()
+
+def _grade_sequential(question: str, documents: list):
+	grader = RETRIEVAL_PROMPT | LLM | JsonOutputParser()
+	grades = []
+	for grade_input, doc in zip(_grade_inputs(question, documents), documents):
+		logger.info(f"Analyzing {doc.metadata.get('source')}")
+		grades.append(_parse_grade(grader.invoke(grade_input)))
+	return grades
+
+def _grade_concurrent(question: str, documents: list):
+	grader = RETRIEVAL_PROMPT | LLM | JsonOutputParser()
+	logger.info(f"Grading {len(documents)} documents with max concurrency {GRADING_CONCURRENCY}")
+	scores = grader.batch(_grade_inputs(question, documents), config={"max_concurrency": GRADING_CONCURRENCY})
+	return [_parse_grade(score) for score in scores]
+
+async def _agrade_sequential(question: str, documents: list):
+	grader = RETRIEVAL_PROMPT | LLM | JsonOutputParser()
+	grades = []
+	for grade_input, doc in zip(_grade_inputs(question, documents), documents):
+		logger.info(f"Analyzing {doc.metadata.get('source')}")
+		grades.append(_parse_grade(await grader.ainvoke(grade_input)))
+	return grades
+
+async def _agrade_concurrent(question: str, documents: list):
+	grader = RETRIEVAL_PROMPT | LLM | JsonOutputParser()
+	logger.info(f"Grading {len(documents)} documents with max concurrency {GRADING_CONCURRENCY}")
+	scores = await grader.abatch(_grade_inputs(question, documents), config={"max_concurrency": GRADING_CONCURRENCY})
+	return [_parse_grade(score) for score in scores]
+
+def _batch_prompt_inputs(question: str, documents: list):
+	numbered = "\n\n".join(f"Document {index + 1}:\n{doc.page_content}" for index, doc in enumerate(documents))
+	inputs = {"question": question, "documents": numbered, "count": len(documents)}
+	log_prompt_tokens("grade_documents", BATCH_RETRIEVAL_PROMPT.format(**inputs))
+	return inputs
+
+def _parse_batch_scores(result, expected: int):
+	"""
+	Accepts either {"scores": [...]} or a bare JSON list; returns None if the count does not match
+	"""
+	scores = result.get("scores") if isinstance(result, dict) else result
+	if not isinstance(scores, list) or len(scores) != expected:
+		logger.info(f"Single-prompt grader returned {scores!r}, expected {expected} scores")
+		return None
+	return [_parse_grade(score) for score in scores]
+
+def _grade_single_prompt(question: str, documents: list):
+	grader = BATCH_RETRIEVAL_PROMPT | LLM | JsonOutputParser()
+	grades = _parse_batch_scores(grader.invoke(_batch_prompt_inputs(question, documents)), len(documents))
+	if grades is None:
+		logger.info("---SINGLE PROMPT GRADING FAILED, FALLING BACK TO PER-DOCUMENT GRADING---")
+		return _grade_concurrent(question, documents)
+	return grades
+
+async def _agrade_single_prompt(question: str, documents: list):
+	grader = BATCH_RETRIEVAL_PROMPT | LLM | JsonOutputParser()
+	grades = _parse_batch_scores(await grader.ainvoke(_batch_prompt_inputs(question, documents)), len(documents))
+	if grades is None:
+		logger.info("---SINGLE PROMPT GRADING FAILED, FALLING BACK TO PER-DOCUMENT GRADING---")
+		return await _agrade_concurrent(question, documents)
+	return grades
+
+GRADERS = {
+	"sequential": _grade_sequential,
+	"concurrent": _grade_concurrent,
+	"single_prompt": _grade_single_prompt,
+}
+
+ASYNC_GRADERS = {
+	"sequential": _agrade_sequential,
+	"concurrent": _agrade_concurrent,
+	"single_prompt": _agrade_single_prompt,
+}
+
+def _grader(graders: dict):
+	if GRADING_MODE not in graders:
+		raise ValueError(f"Unknown GRADING_MODE: {GRADING_MODE!r}. Expected one of {', '.join(graders)}.")
+	return graders[GRADING_MODE]
+
+def _prefilter(documents: list):
+	"""
+	Grades documents from their similarity score alone where the score is decisive.
+	Documents without a score (e.g. web results) or inside the uncertain band are left to the LLM.
+	BM25 matches from hybrid retrieval are never rejected on their dense score: exact-term hits
+	matter most exactly when the dense similarity is weak.
+
+	Returns:
+		tuple: Grade per document (None when undecided) and indices of undecided documents
+	"""
+	grades, uncertain = [], []
+	for index, doc in enumerate(documents):
+		score = doc.metadata.get("relevance_score")
+		if score is not None and score >= RELEVANCE_ACCEPT_THRESHOLD:
+			grades.append("yes")
+		elif score is not None and score < RELEVANCE_REJECT_THRESHOLD and not doc.metadata.get("lexical_match"):
+			grades.append("no")
+		else:
+			grades.append(None)
+			uncertain.append(index)
+
+	logger.info(f"---PRE-FILTER: {len(documents) - len(uncertain)} of {len(documents)} documents graded by similarity, saved {len(documents) - len(uncertain)} LLM calls---")
+	return grades, uncertain
+
+def _merge_grades(grades: list, uncertain: list, llm_grades: list):
+	for index, grade in zip(uncertain, llm_grades):
+		grades[index] = grade
+	return grades
+
+def _apply_grades(question: str, documents: list, grades: list, llm_calls_saved: int = 0):
+	"""
+	Keeps relevant documents in their retrieved order and sets the web search flag
+	"""
+	web_search = "No"
+	filtered_docs = []
+	for doc, grade in zip(documents, grades):
+		logger.info(f"Is document {doc.metadata.get('source')} relevant?: {grade}")
+
+		if grade in {"yes", "1"}:
+			logger.info("---GRADE: DOCUMENT RELEVANT, adding to state---")
+			filtered_docs.append(doc)
+		else:
+			logger.info("---GRADE: DOCUMENT NOT RELEVANT, continuing---")
+			web_search = "Yes"
+
+	if not filtered_docs:
+		web_search = "Yes"
+
+	return {"documents": filtered_docs, "question": question, "web_search": web_search, "llm_calls_saved": llm_calls_saved}
+
 def retrieval_grader(state: dict):
 	"""
 	This function determines if any retrieved documents are relevant to the question.
@@ -49,28 +218,27 @@ def retrieval_grader(state: dict):
 		state: Filtered to contain only relevant documents + updated web search state 
 	"""
 	question, documents = state["question"], state["documents"]
-	web_search = "Yes" if not documents else "No"
-	filtered_docs = []
+	if not documents:
+		return {"documents": [], "question": question, "web_search": "Yes", "llm_calls_saved": 0}
 
-	if documents:
-		logger.info("---CHECK DOCUMENT RELEVANCE TO THE QUESTION---")
-		retrieval_grader = RETRIEVAL_PROMPT | LLM | JsonOutputParser()
-		
-		for doc in documents:
-			logger.info(f"Analyzing {doc.metadata['source']}")
-			score = retrieval_grader.invoke({"question": question, "document": doc.page_content})
-			grade = score["score"]
-
-			logger.info(f"Is document relevant?: {grade}")
-			
-			if grade in {"yes", "1"}:
-				logger.info("---GRADE: DOCUMENT RELEVANT, adding to state---")
-				filtered_docs.append(doc)
-			else:
-				logger.info("---GRADE: DOCUMENT NOT RELEVANT, continuing---")
-				web_search = "Yes"
-			
-	if not filtered_docs:
-		web_search = "Yes"
-	
-	return {"documents": filtered_docs, "question": question, "web_search": web_search}
\ No newline at end of file
+	grades, uncertain = _prefilter(documents)
+	if uncertain:
+		logger.info(f"---CHECK DOCUMENT RELEVANCE TO THE QUESTION ({GRADING_MODE})---")
+		llm_grades = _grader(GRADERS)(question, [documents[index] for index in uncertain])
+		grades = _merge_grades(grades, uncertain, llm_grades)
+	return _apply_grades(question, documents, grades, llm_calls_saved=len(documents) - len(uncertain))
+
+async def aretrieval_grader(state: dict):
+	"""
+	Async variant of retrieval_grader, grading through the chain's abatch/ainvoke APIs
+	"""
+	question, documents = state["question"], state["documents"]
+	if not documents:
+		return {"documents": [], "question": question, "web_search": "Yes", "llm_calls_saved": 0}
+
+	grades, uncertain = _prefilter(documents)
+	if uncertain:
+		logger.info(f"---CHECK DOCUMENT RELEVANCE TO THE QUESTION ({GRADING_MODE})---")
+		llm_grades = await _grader(ASYNC_GRADERS)(question, [documents[index] for index in uncertain])
+		grades = _merge_grades(grades, uncertain, llm_grades)
+	return _apply_grades(question, documents, grades, llm_calls_saved=len(documents) - len(uncertain))
@@ -1,4 +1,6 @@
-from src.database.vector_db import retrieve_vector_database
+import asyncio
+from src.database.vector_db import retrieve_relevant_documents
+from src.config import RETRIEVAL_K
 from src.logger import get_logger
 
 logger = get_logger(__name__)
@@ -9,13 +11,17 @@ def retrieve(state: dict):
 
 	Args:
 		state: The current graph state
-		retriever: retriever tool from vectorDB
 			
 	Returns:
-			state: New key added to state, documents that contains retrieved documents
+			state: New key added to state, documents that contains retrieved documents with relevance scores
 	"""
-	retriever = retrieve_vector_database()
 	logger.info("---RETRIEVING VECTORSTORE---")
 	question = state["question"]
-	documents = retriever.invoke(question)
-	return {"documents": documents, "question": question}
\ No newline at end of file
+	documents = retrieve_relevant_documents(question, k=RETRIEVAL_K)
+	return {"documents": documents, "question": question}
+
+async def aretrieve(state: dict):
+	"""
+	Async variant of retrieve; the Chroma and BM25 lookups are blocking, so they run in a worker thread
+	"""
+	return await asyncio.to_thread(retrieve, state)
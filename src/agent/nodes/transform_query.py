@@ -0,0 +1,87 @@
+from langchain_core.output_parsers import JsonOutputParser
+from langchain.prompts import PromptTemplate
+from src.search.cache import normalize_query
+from src.agent.context import log_prompt_tokens
+from src.agent.llm import get_chat_model
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+LLM = get_chat_model(json_mode=True)
+
+TRANSFORM_PROMPT = PromptTemplate(
+	template="""<|begin_of_text|><|start_header_id|>system<|end_header_id|>
+	You are rewriting a student's question into web search queries.
+	The previous searches did not produce a useful answer, so every new query must take a different angle:
+	rephrase with precise terminology, or break the question into simpler sub-questions.
+
+	You must respond in **strict JSON format** as follows:
+	{{"queries": ["first query", "second query"]}}
+
+	- Return between one and three queries, best first.
+	- Do not repeat any of the previous queries.
+	- Do not include any preamble, explanation, or extra text.
+
+	<|eot_id|><|start_header_id|>user<|end_header_id|>
+	Question: {question}
+
+	Previous queries:
+	{previous_queries}
+	<|eot_id|><|start_header_id|>assistant<|end_header_id|>
+	""",
+	input_variables=["question", "previous_queries"]
+)
+
+def transform_query(state: dict):
+	"""
+	This function rewrites or decomposes the question before a web search retry,
+	so a retry never repeats an identical search
+
+	Args:
+		state: The current graph state
+
+	Returns:
+		state: New key "search_query" with the query for the next web search
+	"""
+	question, previous_queries, inputs = _rewrite_inputs(state)
+	query_rewriter = TRANSFORM_PROMPT | LLM | JsonOutputParser()
+	try:
+		result = query_rewriter.invoke(inputs)
+	except Exception as e:
+		logger.error(f"Query rewriting failed: {e}")
+		result = []
+	return _pick_query(question, previous_queries, result)
+
+async def atransform_query(state: dict):
+	"""
+	Async variant of transform_query
+	"""
+	question, previous_queries, inputs = _rewrite_inputs(state)
+	query_rewriter = TRANSFORM_PROMPT | LLM | JsonOutputParser()
+	try:
+		result = await query_rewriter.ainvoke(inputs)
+	except Exception as e:
+		logger.error(f"Query rewriting failed: {e}")
+		result = []
+	return _pick_query(question, previous_queries, result)
+
+def _rewrite_inputs(state: dict):
+	logger.info("---TRANSFORM QUERY---")
+	question = state["question"]
+	previous_queries = state.get("search_queries") or [question]
+	inputs = {"question": question, "previous_queries": "\n".join(f"- {query}" for query in previous_queries)}
+	log_prompt_tokens("transform_query", TRANSFORM_PROMPT.format(**inputs))
+	return question, previous_queries, inputs
+
+def _pick_query(question: str, previous_queries: list, result) -> dict:
+	"""
+	Returns the first rewritten query that was not searched before, or the original question
+	"""
+	used = {normalize_query(query) for query in previous_queries}
+	candidates = result.get("queries", []) if isinstance(result, dict) else result
+	search_query = next((query for query in candidates if isinstance(query, str) and query.strip() and normalize_query(query) not in used), None)
+	if search_query is None:
+		logger.info("---NO NEW QUERY PRODUCED, FALLING BACK TO ORIGINAL QUESTION---")
+		search_query = question
+
+	logger.info(f"Rewritten search query: {search_query}")
+	return {"search_query": search_query}
@@ -1,32 +1,55 @@
-from langchain_community.tools.tavily_search import TavilySearchResults
+import asyncio
 from langchain.schema import Document
-from src.config import TAVILY_API_KEY
+from src.config import SEARCH_RESULTS_K
+from src.database.vector_db import content_hash
+from src.search.factory import get_search_backend
 from src.logger import get_logger
 
 logger = get_logger(__name__)
 
 def tavily_web_search_tool(state: dict):
     """
-    This function conducts web search based on question and change in state
+    This function conducts web search based on question and change in state,
+    through the configured search backend (Tavily by default)
 
     Args:
         state: Current graph state
 
     Returns:
-        state: Appended web results to documents
+        state: Appended web results to documents, one Document per result
     """
     logger.info("---STARTING WEB SEARCH---")
-    question, documents, search_count = state["question"], state["documents"], state.get("curr_search_count", 0)
-    web_search_tool = TavilySearchResults(k=3, tavily_api_key=TAVILY_API_KEY) 
-
-    documents_searched = web_search_tool.invoke({"query": question})
-    web_results = "\n".join([document["content"] for document in documents_searched])
-    web_results = Document(page_content=web_results)
-
-    if documents is not None:
-        documents.append(web_results)
-    else:
-        documents = [web_results]
-     
+    question, documents, search_count = state["question"], state["documents"] or [], state.get("curr_search_count", 0)
+    search_query = state.get("search_query") or question
+    web_search_tool = get_search_backend()
+
+    documents_searched = web_search_tool.search(search_query, SEARCH_RESULTS_K)
+
+    # Skip results whose text is already in context, e.g. repeated across retries
+    seen = {content_hash(document.page_content) for document in documents}
+    web_results = []
+    for result in documents_searched:
+        result_hash = content_hash(result["content"])
+        if result_hash in seen:
+            continue
+        seen.add(result_hash)
+        web_results.append(Document(
+            page_content=result["content"],
+            metadata={"source": result["url"], "title": result.get("title", ""), "content_hash": result_hash}
+        ))
+    logger.info(f"Web search for '{search_query}' added {len(web_results)} of {len(documents_searched)} results")
+
     search_count += 1
-    return {"documents": documents, "question": question, "curr_search_count": search_count}
\ No newline at end of file
+    return {
+        "documents": documents + web_results,
+        "question": question,
+        "curr_search_count": search_count,
+        "search_queries": (state.get("search_queries") or []) + [search_query],
+    }
+
+async def atavily_web_search_tool(state: dict):
+    """
+    Async variant of tavily_web_search_tool; search backends are blocking clients, so the
+    search runs in a worker thread
+    """
+    return await asyncio.to_thread(tavily_web_search_tool, state)
@@ -0,0 +1,44 @@
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+class OpenTelemetrySink:
+	"""
+	Trace sink exporting each finished RAG run as an OpenTelemetry trace: one "rag_run" root
+	span with a child span per node and edge execution.
+
+	Uses the globally configured tracer provider, so exporters (OTLP, console, ...) are set up
+	the usual OpenTelemetry way, e.g. with opentelemetry-instrument or the OTEL_* variables.
+	"""
+	def __init__(self, tracer_name: str = "studybuddy.rag"):
+		try:
+			from opentelemetry import trace
+		except ImportError as e:
+			raise ValueError("OTEL_TRACING requires the opentelemetry-api package (pip install opentelemetry-sdk).") from e
+		self._trace = trace
+		self.tracer = trace.get_tracer(tracer_name)
+
+	def __call__(self, event: dict):
+		if event["type"] != "run_end":
+			return
+
+		def nanoseconds(seconds: float) -> int:
+			return int(seconds * 1e9)
+
+		root = self.tracer.start_span("rag_run", start_time=nanoseconds(event["start_time"]), attributes={
+			"rag.run_id": event["run_id"],
+			"rag.llm_calls": event["llm_calls"],
+			"rag.prompt_tokens": event["prompt_tokens"],
+			"rag.completion_tokens": event["completion_tokens"],
+			"rag.retrieved_chunks": event["retrieved_chunks"],
+		})
+		context = self._trace.set_span_in_context(root)
+
+		for span in event["spans"]:
+			attributes = {f"rag.{key}": span[key] for key in ("kind", "iteration", "llm_calls", "prompt_tokens", "completion_tokens", "llm_queue_time", "llm_model_time", "chunks", "decision", "error") if span[key] is not None}
+			child = self.tracer.start_span(f"{span['kind']}:{span['name']}", context=context, start_time=nanoseconds(span["start_time"]), attributes=attributes)
+			if span["error"] is not None:
+				child.set_status(self._trace.Status(self._trace.StatusCode.ERROR, span["error"]))
+			child.end(end_time=nanoseconds(span["start_time"] + span["wall_time"]))
+
+		root.end(end_time=nanoseconds(event["start_time"] + event["wall_time"]))
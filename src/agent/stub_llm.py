@@ -0,0 +1,118 @@
+import re
+import json
+import time
+import asyncio
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, get_buffer_string
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from src.agent.context import count_tokens
+
+STOPWORDS = {"what", "which", "when", "where", "does", "with", "that", "this", "from", "have", "into", "about", "explain", "state", "there", "their", "they", "then", "than", "your", "will", "would", "should", "could"}
+
+def _terms(text: str) -> set:
+	return {term for term in re.findall(r"[a-z0-9]+", text.lower()) if len(term) > 3 and term not in STOPWORDS}
+
+def _overlap(reference: str, text: str) -> float:
+	"""
+	Share of the reference's content terms that also appear in text
+	"""
+	reference_terms = _terms(reference)
+	return len(reference_terms & _terms(text)) / len(reference_terms) if reference_terms else 0.0
+
+def _between(text: str, start: str, end: str = None) -> str:
+	after = text.split(start, 1)[1] if start in text else ""
+	return (after.split(end, 1)[0] if end and end in after else after).strip()
+
+def _yes(condition: bool) -> str:
+	return "yes" if condition else "no"
+
+class StubChatModel(BaseChatModel):
+	"""
+	Deterministic offline stand-in for the Ollama chat model.
+
+	Recognizes the workflow's prompts by their wording and answers them with simple term-overlap
+	heuristics: graders return the JSON shapes they expect, and answer generation returns a
+	<think> block plus the context sentence that best matches the question. `latency` seconds
+	are slept per call to emulate model time in load tests and benchmarks.
+	"""
+	json_mode: bool = False
+	latency: float = 0.0
+
+	@property
+	def _llm_type(self) -> str:
+		return "stub"
+
+	def _respond(self, prompt: str) -> str:
+		if "rolling summary of a study conversation" in prompt:
+			summary, turns = _between(prompt, "Current summary:", "New turns:"), _between(prompt, "New turns:", "<|eot_id|>")
+			firsts = [re.split(r"(?<=[.!?])\s+", line.strip())[0] for line in turns.splitlines() if line.strip()]
+			return "\n".join(([] if summary == "(empty)" else [summary]) + firsts)
+		if "independent tasks, each starting with" in prompt:
+			tasks = re.split(r"^### Task \d+$", prompt, flags=re.MULTILINE)[1:]
+			return json.dumps({"results": [json.loads(self._respond(task)) for task in tasks]})
+		if "'grounded' and 'useful'" in prompt:
+			facts, question, answer = _between(prompt, "Facts:", "-----"), _between(prompt, "Question:", "-----"), _between(prompt, "Answer:", "<|eot_id|>")
+			return json.dumps({"grounded": _yes(_overlap(answer, facts) >= 0.5), "useful": _yes(_overlap(question, answer) >= 0.2 and "don't know" not in answer)})
+		if "relevance of several retrieved documents" in prompt:
+			documents, question = _between(prompt, "Here are the retrieved documents:", "Here is the user question:"), _between(prompt, "Here is the user question:", "Now,")
+			return json.dumps({"scores": [_yes(_overlap(question, document) >= 0.3) for document in re.split(r"Document \d+:", documents)[1:]]})
+		if "relevance of a retrieved document" in prompt:
+			document, question = _between(prompt, "Here is the retrieved document:", "Here is the user question:"), _between(prompt, "Here is the user question:", "Now,")
+			return json.dumps({"score": _yes(_overlap(question, document) >= 0.3)})
+		if "grounded in / supported by" in prompt:
+			facts, answer = _between(prompt, "Facts:", "-----"), _between(prompt, "Answer:", "<|eot_id|>")
+			return json.dumps({"score": _yes(_overlap(answer, facts) >= 0.5)})
+		if "whether an answer is useful" in prompt:
+			question, answer = _between(prompt, "Question:", "-----"), _between(prompt, "Answer:", "<|eot_id|>")
+			return json.dumps({"score": _yes(_overlap(question, answer) >= 0.2 and "don't know" not in answer)})
+		if "rewriting a student's question" in prompt:
+			question = _between(prompt, "Question:", "Previous queries:")
+			return json.dumps({"queries": [f"{question} definition", f"{question} explained with examples"]})
+		if "Context:" in prompt:
+			return self._answer(_between(prompt, "Question:", "Context:"), _between(prompt, "Context:", "Answer:"))
+		return self._answer(prompt.strip().splitlines()[-1] if prompt.strip() else "", "")
+
+	def _answer(self, question: str, context: str) -> str:
+		sentences = [sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+|\n+", context) if sentence.strip() and not sentence.startswith("[")]
+		best = max(sentences, key=lambda sentence: _overlap(question, sentence), default="")
+		if not best or _overlap(question, best) == 0:
+			return "<think>\nNothing in the context matches the question.\n</think>\n\nI don't know."
+		return f"<think>\nThe question asks: {question}\nThe closest matching context sentence answers it.\n</think>\n\n{best}"
+
+	def _result_message(self, messages: list):
+		prompt = get_buffer_string(messages)
+		text = self._respond(prompt)
+		input_tokens, output_tokens = count_tokens(prompt), count_tokens(text)
+		return text, {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+	@staticmethod
+	def _chunks(text: str, usage: dict) -> list:
+		pieces = re.findall(r"\S+\s*|\s+", text)
+		# Usage is reported once, on the last chunk, as Ollama does
+		return [ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage if index == len(pieces) - 1 else None)) for index, piece in enumerate(pieces)]
+
+	def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+		text, usage = self._result_message(messages)
+		time.sleep(self.latency)
+		return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+	async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+		text, usage = self._result_message(messages)
+		await asyncio.sleep(self.latency)
+		return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+	def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+		text, usage = self._result_message(messages)
+		time.sleep(self.latency)
+		for chunk in self._chunks(text, usage):
+			if run_manager:
+				run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+			yield chunk
+
+	async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+		text, usage = self._result_message(messages)
+		await asyncio.sleep(self.latency)
+		for chunk in self._chunks(text, usage):
+			if run_manager:
+				await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+			yield chunk
@@ -1,10 +1,13 @@
+from functools import lru_cache
 from langgraph.graph import END, StateGraph
-from src.agent.nodes.retrieve import retrieve
-from src.agent.nodes.web_search import tavily_web_search_tool
-from src.agent.nodes.grade_documents import retrieval_grader
-from src.agent.nodes.answer_generation import generate_response
+from src.agent.nodes.retrieve import retrieve, aretrieve
+from src.agent.nodes.web_search import tavily_web_search_tool, atavily_web_search_tool
+from src.agent.nodes.transform_query import transform_query, atransform_query
+from src.agent.nodes.grade_documents import retrieval_grader, aretrieval_grader
+from src.agent.nodes.answer_generation import generate_response, agenerate_response
 from src.agent.edges.answer_generation_edge import decide_to_generate
-from src.agent.edges.grader_edge import hallucination_grader
+from src.agent.edges.grader_edge import hallucination_grader, ahallucination_grader
+from src.agent.instrumentation import instrument_node, instrument_edge
 from src.logger import get_logger
 from typing_extensions import TypedDict
 from typing import List, Optional
@@ -21,6 +24,11 @@ class LangGraphState(TypedDict):
     generation => response generated from LLM
     web_search => result from web search 
     documents => corpus of documents for embedding
+    llm_calls_saved => grading calls skipped by the similarity pre-filter
+    search_query => query for the next web search, rewritten on retries
+    search_queries => web search queries already run
+    context => token-budgeted context shared by generation and hallucination grading
+    history => earlier conversation (rolling summary and recent turns) given to answer generation
   """
   question: str
   max_search_queries: int
@@ -29,33 +37,50 @@ class LangGraphState(TypedDict):
   generation: Optional[str]
   web_search: Optional[str]
   documents: Optional[List[str]]
+  llm_calls_saved: Optional[int]
+  search_query: Optional[str]
+  search_queries: Optional[List[str]]
+  context: Optional[str]
+  history: Optional[str]
 
 workflow = StateGraph(LangGraphState)
 
-# Define nodes
-workflow.add_node("retrieve", retrieve) 
-workflow.add_node("websearch", tavily_web_search_tool) 
-workflow.add_node("grade_documents", retrieval_grader)
-workflow.add_node("generate_response", generate_response)
+# Define nodes, each wrapped to record a span in the run's RunTrace (see src/agent/instrumentation.py).
+# Nodes with an async variant use it under RAG_AGENT.ainvoke/astream (the HTTP API in src/server).
+workflow.add_node("retrieve", instrument_node("retrieve", retrieve, aretrieve)) 
+workflow.add_node("websearch", instrument_node("websearch", tavily_web_search_tool, atavily_web_search_tool)) 
+workflow.add_node("grade_documents", instrument_node("grade_documents", retrieval_grader, aretrieval_grader))
+workflow.add_node("generate_response", instrument_node("generate_response", generate_response, agenerate_response))
+workflow.add_node("transform_query", instrument_node("transform_query", transform_query, atransform_query))
 
 # Build graph
 workflow.set_entry_point("retrieve")
 workflow.add_edge("retrieve", "grade_documents")
-workflow.add_conditional_edges("grade_documents", decide_to_generate, {
+workflow.add_conditional_edges("grade_documents", instrument_edge("grade_documents", decide_to_generate), {
   "websearch": "websearch",
   "generate_response": "generate_response"
 })
 workflow.add_edge("websearch", "generate_response")
+workflow.add_edge("transform_query", "websearch")
 workflow.add_conditional_edges(
   "generate_response",
-  hallucination_grader,
+  instrument_edge("generate_response", hallucination_grader, ahallucination_grader),
   {
     "not_supported": "generate_response",
     "useful": END,
-    "not useful": "websearch",
+    "not useful": "transform_query",
   }
 )
 
-# Compile graph
-RAG_AGENT = workflow.compile()
-logger.info("RAG Workflow compiled")
+# Compile graph on first use, so importing this module (or src.utils) does not pay for it
+@lru_cache(maxsize=1)
+def get_rag_agent():
+  rag_agent = workflow.compile()
+  logger.info("RAG Workflow compiled")
+  return rag_agent
+
+def __getattr__(name):
+  # Keeps `from src.agent.workflow import RAG_AGENT` working; compiles on first access
+  if name == "RAG_AGENT":
+    return get_rag_agent()
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -5,6 +5,109 @@ import os
 dotenv_path = join(dirname(dirname(__file__)), '.env.local')
 load_dotenv(dotenv_path)
 
+# Web search: "tavily" or "local" (offline fixture corpus)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "tavily")
+# Only required once a Tavily search actually runs (see src/search/factory.py)
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
-if not TAVILY_API_KEY:
-    raise ValueError("TAVILY_API_KEY not found in environment variables.")
\ No newline at end of file
+
+# Document relevance grading: "sequential", "concurrent" or "single_prompt"
+GRADING_MODE = os.getenv("GRADING_MODE", "concurrent")
+GRADING_CONCURRENCY = int(os.getenv("GRADING_CONCURRENCY", "4"))
+
+# Similarity pre-filter applied before LLM grading (Chroma relevance scores in [0, 1])
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+RELEVANCE_ACCEPT_THRESHOLD = float(os.getenv("RELEVANCE_ACCEPT_THRESHOLD", "0.8"))
+RELEVANCE_REJECT_THRESHOLD = float(os.getenv("RELEVANCE_REJECT_THRESHOLD", "0.2"))
+
+# Vectorstore collections live under a fixed root; see src/database/collection_registry.py
+VECTOR_DB_ROOT = os.getenv("VECTOR_DB_ROOT", "vectorstores")
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-mpnet-base-v2")
+# "huggingface" (sentence-transformers on PyTorch), "onnx", "onnx_int8" (ONNX Runtime, int8-quantized
+# weights) or "hashing" (offline, model-free embeddings for benchmarks and tests)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+# Intra-op threads of the embedding runtime (0 keeps the library default, usually one per core)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+# ONNX weights file in the model repository; empty picks onnx/model.onnx or the int8 export
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "")
+
+# On-disk embedding cache shared by the semantic splitter and the vectorstore (0 disables it)
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", ".embedding_cache")
+EMBEDDING_CACHE_CAPACITY = int(os.getenv("EMBEDDING_CACHE_CAPACITY", "50000"))
+
+# Chunking: "single_pass" (one sentence split, batched sentence embeddings, one tokenizer run) or
+# "two_stage" (SemanticChunker, then RecursiveCharacterTextSplitter)
+CHUNKER = os.getenv("CHUNKER", "single_pass")
+CHUNK_BREAKPOINT_PERCENTILE = float(os.getenv("CHUNK_BREAKPOINT_PERCENTILE", "95"))
+# Chunk vectors: "embed" embeds each chunk's text, "sentence_mean" reuses the single-pass chunker's
+# sentence vectors (no second embedding pass, approximate; stored in separate collections)
+CHUNK_VECTORS = os.getenv("CHUNK_VECTORS", "embed")
+
+# Number of worker processes parsing uploaded files (0 parses in a single background thread)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+# PDF pages parsed, chunked, embedded and written together; bounds ingestion memory for large documents
+INGEST_PAGE_WINDOW = int(os.getenv("INGEST_PAGE_WINDOW", "16"))
+# Background ingestion jobs: uploads are spooled to disk and tracked in SQLite so jobs resume after a restart
+INGEST_JOBS_DB = os.getenv("INGEST_JOBS_DB", ".ingest_jobs.sqlite3")
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", ".ingest_spool")
+# A running job whose worker has not checked in for this long is picked up again
+INGEST_JOB_LEASE_SECONDS = int(os.getenv("INGEST_JOB_LEASE_SECONDS", "120"))
+
+# Semantic answer cache in front of the RAG workflow
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512"))
+
+# Web search results and their persistent cache (TTL 0 disables it)
+SEARCH_RESULTS_K = int(os.getenv("SEARCH_RESULTS_K", "3"))
+LOCAL_SEARCH_CORPUS = os.getenv("LOCAL_SEARCH_CORPUS", join(dirname(__file__), "search", "fixtures", "web_corpus.json"))
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", ".search_cache.sqlite3")
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "86400"))
+
+# Token budget for the document context sent to answer generation and hallucination grading
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2048"))
+
+# Conversation history: recent turns sent verbatim up to HISTORY_TOKEN_BUDGET tokens, older turns
+# folded into a rolling summary of at most HISTORY_SUMMARY_TOKENS tokens
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1024"))
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "256"))
+# Give the RAG answer prompt the conversation too; follow-up turns then bypass the answer cache
+RAG_USE_HISTORY = os.getenv("RAG_USE_HISTORY", "false").lower() == "true"
+
+# Generation grading: "two_call" (grounding, then usefulness) or "combined" (one structured call).
+# Formerly GRADER_MODE, which is still read but too easily confused with GRADING_MODE
+GENERATION_GRADER_MODE = os.getenv("GENERATION_GRADER_MODE", os.getenv("GRADER_MODE", "two_call"))
+
+# Retrieval: "dense" (vector similarity) or "hybrid" (dense + BM25 fused with reciprocal rank fusion)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+DENSE_WEIGHT = float(os.getenv("DENSE_WEIGHT", "1.0"))
+LEXICAL_WEIGHT = float(os.getenv("LEXICAL_WEIGHT", "1.0"))
+
+# Chat model backend: "ollama", or "stub" for the offline deterministic stand-in used by benchmarks
+LLM_BACKEND = os.getenv("LLM_BACKEND", "ollama")
+LLM_MODEL = os.getenv("LLM_MODEL", "deepseek-r1:1.5b")
+STUB_LLM_LATENCY = float(os.getenv("STUB_LLM_LATENCY", "0"))
+# Maximum chat model calls in flight across all sessions; match the server's OLLAMA_NUM_PARALLEL
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+# LLM gateway (src/agent/llm.py): coalesce identical concurrent prompts, and micro-batch short
+# grading prompts arriving within LLM_BATCH_WINDOW_MS of each other (0 disables batching)
+LLM_SINGLE_FLIGHT = os.getenv("LLM_SINGLE_FLIGHT", "true").lower() in ("1", "true", "yes")
+# Longest a coalesced caller waits on another caller's identical prompt before calling the model itself
+LLM_FLIGHT_TIMEOUT_SECONDS = float(os.getenv("LLM_FLIGHT_TIMEOUT_SECONDS", "300"))
+LLM_BATCH_WINDOW_MS = float(os.getenv("LLM_BATCH_WINDOW_MS", "0"))
+LLM_BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", "8"))
+LLM_BATCH_MAX_PROMPT_TOKENS = int(os.getenv("LLM_BATCH_MAX_PROMPT_TOKENS", "512"))
+
+# Run instrumentation: Prometheus metrics endpoint port (0 disables it) and OpenTelemetry span export
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+OTEL_TRACING = os.getenv("OTEL_TRACING", "false").lower() in ("1", "true", "yes")
+
+# Async HTTP API (python -m src.server.api): concurrent graph runs, queued requests beyond that
+# (further requests get 503), queue wait before giving up, and idle conversation session expiry
+API_MAX_CONCURRENT_RUNS = int(os.getenv("API_MAX_CONCURRENT_RUNS", "4"))
+API_MAX_QUEUED = int(os.getenv("API_MAX_QUEUED", "32"))
+API_QUEUE_TIMEOUT_SECONDS = float(os.getenv("API_QUEUE_TIMEOUT_SECONDS", "30"))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "1000"))
@@ -0,0 +1,118 @@
+import re
+import numpy as np
+from langchain_core.documents import Document
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Same sentence boundary as langchain_experimental's SemanticChunker
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.?!])\s+")
+
+def _normalized(matrix: np.ndarray) -> np.ndarray:
+	norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+	return matrix / np.where(norms == 0, 1, norms)
+
+class SemanticTokenChunker:
+	"""
+	Single-pass replacement for SemanticChunker followed by RecursiveCharacterTextSplitter.
+
+	Sentences are split once and embedded in one batch for the whole file. Breakpoints fall
+	where the cosine distance between neighbouring sentences (each smoothed with its
+	neighbours, like SemanticChunker's buffer) exceeds the document's breakpoint_percentile.
+	Each semantic section is then packed into chunks of at most chunk_size tokens, carrying
+	whole trailing sentences of up to chunk_overlap tokens into the next chunk. All sentences
+	are tokenized in one batch; sentences longer than chunk_size are cut on token windows.
+
+	split() also returns a vector per chunk, the normalized mean of its sentence vectors, so
+	callers can skip embedding the chunks again (see CHUNK_VECTORS).
+	"""
+	def __init__(self, embeddings, chunk_size: int, chunk_overlap: int, breakpoint_percentile: float = 95.0, encoding: str = "gpt2"):
+		if chunk_overlap >= chunk_size:
+			raise ValueError(f"Chunk overlap ({chunk_overlap}) must be smaller than the chunk size ({chunk_size}).")
+		from src.tokenizer import load_encoding
+
+		self.embeddings = embeddings
+		self.chunk_size = chunk_size
+		self.chunk_overlap = chunk_overlap
+		self.breakpoint_percentile = breakpoint_percentile
+		self.encoder = load_encoding(encoding)
+
+	def _breakpoints(self, vectors: np.ndarray) -> list:
+		"""
+		Returns the sentence indices that start a new semantic section
+		"""
+		if len(vectors) < 2:
+			return []
+		smoothed = np.copy(vectors)
+		smoothed[1:] += vectors[:-1]
+		smoothed[:-1] += vectors[1:]
+		smoothed = _normalized(smoothed)
+		distances = 1.0 - np.einsum("ij,ij->i", smoothed[:-1], smoothed[1:])
+		threshold = np.percentile(distances, self.breakpoint_percentile)
+		return (np.nonzero(distances > threshold)[0] + 1).tolist()
+
+	def _pack(self, sentences: list, tokens: list, start: int, end: int):
+		"""
+		Yields (text, sentence indices) chunks for the sentences in [start, end) within the token limits
+		"""
+		current, used = [], 0
+		for index in range(start, end):
+			length = len(tokens[index])
+			if length > self.chunk_size:
+				if current:
+					yield " ".join(sentences[i] for i in current), current
+				stride = self.chunk_size - self.chunk_overlap
+				for offset in range(0, max(1, length - self.chunk_overlap), stride):
+					yield self.encoder.decode(tokens[index][offset:offset + self.chunk_size]), [index]
+				current, used = [], 0
+				continue
+
+			if current and used + length > self.chunk_size:
+				yield " ".join(sentences[i] for i in current), current
+				# Carry whole trailing sentences into the next chunk, up to chunk_overlap tokens
+				carried, carried_tokens = [], 0
+				for previous in reversed(current):
+					if carried_tokens + len(tokens[previous]) > self.chunk_overlap or carried_tokens + len(tokens[previous]) + length > self.chunk_size:
+						break
+					carried.insert(0, previous)
+					carried_tokens += len(tokens[previous])
+				current, used = carried, carried_tokens
+			current.append(index)
+			used += length
+		if current:
+			yield " ".join(sentences[i] for i in current), current
+
+	def split(self, documents: list):
+		"""
+		Splits documents into chunks that keep each document's metadata
+
+		Returns:
+			tuple: (list of chunk Documents, np.ndarray of chunk vectors, one row per chunk)
+		"""
+		sentences, owners = [], []
+		for position, document in enumerate(documents):
+			for sentence in SENTENCE_BOUNDARY.split(document.page_content):
+				if sentence.strip():
+					sentences.append(sentence.strip())
+					owners.append(position)
+		if not sentences:
+			return [], np.zeros((0, 0), dtype=np.float32)
+
+		tokens = self.encoder.encode_ordinary_batch(sentences)
+		vectors = _normalized(np.asarray(self.embeddings.embed_documents(sentences), dtype=np.float32))
+
+		chunks, chunk_vectors, start = [], [], 0
+		while start < len(sentences):
+			owner = owners[start]
+			end = start
+			while end < len(sentences) and owners[end] == owner:
+				end += 1
+			boundaries = [start] + [start + index for index in self._breakpoints(vectors[start:end])] + [end]
+			for section_start, section_end in zip(boundaries, boundaries[1:]):
+				for text, members in self._pack(sentences, tokens, section_start, section_end):
+					chunks.append(Document(page_content=text, metadata=dict(documents[owner].metadata)))
+					chunk_vectors.append(vectors[members].mean(axis=0))
+			start = end
+
+		logger.info(f"Split {len(documents)} documents into {len(chunks)} chunks from {len(sentences)} sentences")
+		return chunks, _normalized(np.asarray(chunk_vectors, dtype=np.float32))
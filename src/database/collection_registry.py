@@ -0,0 +1,235 @@
+import os
+import re
+import sys
+import json
+import shutil
+import argparse
+import threading
+import uuid
+from datetime import datetime
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_COLLECTION = "default"
+
+class CollectionRegistry:
+	"""
+	Persistent registry of named vectorstore collections under a fixed root directory.
+
+	The manifest at <root>/manifest.json records which collection is active and, for each
+	collection, the embedding model, chunk settings and creation time it was built with.
+	A collection is only replaced through an explicit rotate, never because the date changed.
+	"""
+	MANIFEST_NAME = "manifest.json"
+
+	def __init__(self, root: str):
+		self.root = root
+		self.manifest_path = os.path.join(root, self.MANIFEST_NAME)
+		self._lock = threading.RLock()
+		self._manifest = None
+		self._manifest_mtime = None
+
+	def _load(self) -> dict:
+		"""
+		Returns the manifest, re-reading it when another process (e.g. the CLI) changed it
+		"""
+		mtime = os.path.getmtime(self.manifest_path) if os.path.exists(self.manifest_path) else None
+		if self._manifest is None or mtime != self._manifest_mtime:
+			if mtime is None:
+				self._manifest = {"active": None, "collections": {}}
+			else:
+				with open(self.manifest_path, "r", encoding="utf-8") as f:
+					self._manifest = json.load(f)
+			self._manifest_mtime = mtime
+		return self._manifest
+
+	def _save(self, manifest: dict):
+		os.makedirs(self.root, exist_ok=True)
+		temp_path = f"{self.manifest_path}.tmp"
+		with open(temp_path, "w", encoding="utf-8") as f:
+			json.dump(manifest, f, indent=2)
+		os.replace(temp_path, self.manifest_path)
+		self._manifest = manifest
+		self._manifest_mtime = os.path.getmtime(self.manifest_path)
+
+	def list_collections(self) -> list:
+		with self._lock:
+			manifest = self._load()
+			return [dict(entry, active=name == manifest["active"]) for name, entry in manifest["collections"].items()]
+
+	def active_collection(self):
+		with self._lock:
+			manifest = self._load()
+			name = manifest["active"]
+			return dict(manifest["collections"][name]) if name else None
+
+	def create(self, name: str, embedding_model: str, chunk_size: int = None, chunk_overlap: int = None, activate: bool = True) -> dict:
+		"""
+		Registers a new empty collection and optionally makes it the active one
+		"""
+		if not re.fullmatch(r"[A-Za-z0-9][A-Za-z0-9_.-]{2,62}", name):
+			raise ValueError(f"Invalid collection name: {name!r}")
+
+		with self._lock:
+			manifest = self._load()
+			if name in manifest["collections"]:
+				raise ValueError(f"Collection {name!r} already exists")
+
+			entry = {
+				"name": name,
+				"path": os.path.join(self.root, name),
+				"embedding_model": embedding_model,
+				"chunk_size": chunk_size,
+				"chunk_overlap": chunk_overlap,
+				"created_at": datetime.now().isoformat(timespec="seconds"),
+				"uid": uuid.uuid4().hex,
+				"revision": 0,
+			}
+			manifest["collections"][name] = entry
+			if activate:
+				manifest["active"] = name
+			self._save(manifest)
+			logger.info(f"Created collection {name!r} (active: {activate})")
+			return dict(entry)
+
+	def resolve(self, embedding_model: str, chunk_size: int = None, chunk_overlap: int = None) -> dict:
+		"""
+		Returns the active collection, creating the default one on first use.
+		Chunk settings are recorded the first time documents are added and never overwritten,
+		since the stored chunks keep the settings they were made with; different settings are
+		logged as a mismatch (rotate to start a collection with the new ones).
+
+		Raises:
+			ValueError: If the active collection was embedded with a different model
+		"""
+		with self._lock:
+			manifest = self._load()
+			name = manifest["active"]
+			if name is None:
+				return self.create(DEFAULT_COLLECTION if DEFAULT_COLLECTION not in manifest["collections"] else _timestamped_name(), embedding_model, chunk_size, chunk_overlap)
+
+			entry = manifest["collections"][name]
+			if entry["embedding_model"] != embedding_model:
+				raise ValueError(
+					f"Active collection {name!r} was built with {entry['embedding_model']!r}, not {embedding_model!r}. "
+					f"Run `python -m src.database.collection_registry rotate` to start a new collection."
+				)
+
+			if chunk_size is not None and entry["chunk_size"] is None:
+				entry["chunk_size"], entry["chunk_overlap"] = chunk_size, chunk_overlap
+				self._save(manifest)
+			elif chunk_size is not None and (entry["chunk_size"], entry["chunk_overlap"]) != (chunk_size, chunk_overlap):
+				logger.warning(
+					f"Collection {name!r} holds chunks made with size={entry['chunk_size']}, overlap={entry['chunk_overlap']}; "
+					f"new documents use size={chunk_size}, overlap={chunk_overlap}. "
+					f"Run `python -m src.database.collection_registry rotate` to keep collections consistent."
+				)
+			return dict(entry)
+
+	def bump_revision(self) -> int:
+		"""
+		Records that the active collection's contents changed, so caches keyed on its
+		fingerprint stop matching
+
+		Returns:
+			int: The new revision number
+		"""
+		with self._lock:
+			manifest = self._load()
+			entry = manifest["collections"][manifest["active"]]
+			entry["revision"] = entry.get("revision", 0) + 1
+			self._save(manifest)
+			return entry["revision"]
+
+	def fingerprint(self):
+		"""
+		Returns a string identifying the active collection and its current contents, or None
+		"""
+		entry = self.active_collection()
+		if entry is None:
+			return None
+		return f"{entry['name']}:{entry.get('uid', entry['created_at'])}:{entry.get('revision', 0)}"
+
+	def rotate(self, embedding_model: str = None, name: str = None) -> dict:
+		"""
+		Starts a new empty collection and makes it active. The previous collection is kept
+		on disk until compact() is run, so a rotation can be rolled back with activate().
+		"""
+		with self._lock:
+			current = self.active_collection()
+			embedding_model = embedding_model or (current["embedding_model"] if current else None)
+			if embedding_model is None:
+				raise ValueError("An embedding model is required to create the first collection")
+			return self.create(name or _timestamped_name(), embedding_model)
+
+	def activate(self, name: str) -> dict:
+		with self._lock:
+			manifest = self._load()
+			if name not in manifest["collections"]:
+				raise ValueError(f"Unknown collection: {name!r}")
+			manifest["active"] = name
+			self._save(manifest)
+			logger.info(f"Activated collection {name!r}")
+			return dict(manifest["collections"][name])
+
+	def compact(self) -> list:
+		"""
+		Deletes every collection except the active one
+
+		Returns:
+			list: Names of the removed collections
+		"""
+		with self._lock:
+			manifest = self._load()
+			removed = [name for name in manifest["collections"] if name != manifest["active"]]
+			for name in removed:
+				shutil.rmtree(manifest["collections"].pop(name)["path"], ignore_errors=True)
+				logger.info(f"Removed collection {name!r}")
+			self._save(manifest)
+			return removed
+
+	def clear(self) -> bool:
+		"""
+		Deletes the whole root directory, including the manifest
+
+		Returns:
+			bool: Whether anything was removed
+		"""
+		with self._lock:
+			existed = os.path.isdir(self.root)
+			shutil.rmtree(self.root, ignore_errors=True)
+			self._manifest, self._manifest_mtime = None, None
+			return existed
+
+def _timestamped_name() -> str:
+	return f"collection_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+def main(argv=None):
+	from src.config import VECTOR_DB_ROOT
+	from src.database.vector_db import collection_identity
+
+	parser = argparse.ArgumentParser(description="Manage StudyBuddy vectorstore collections")
+	subparsers = parser.add_subparsers(dest="command", required=True)
+	subparsers.add_parser("list", help="List collections")
+	rotate_parser = subparsers.add_parser("rotate", help="Start a new empty active collection")
+	rotate_parser.add_argument("--name", default=None)
+	activate_parser = subparsers.add_parser("activate", help="Switch the active collection")
+	activate_parser.add_argument("name")
+	subparsers.add_parser("compact", help="Delete all inactive collections")
+	args = parser.parse_args(argv)
+
+	registry = CollectionRegistry(VECTOR_DB_ROOT)
+	if args.command == "list":
+		for entry in registry.list_collections():
+			print(json.dumps(entry))
+	elif args.command == "rotate":
+		print(json.dumps(registry.rotate(collection_identity(), name=args.name)))
+	elif args.command == "activate":
+		print(json.dumps(registry.activate(args.name)))
+	elif args.command == "compact":
+		print(json.dumps({"removed": registry.compact()}))
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,120 @@
+import sys
+import threading
+from abc import abstractmethod
+from langchain_core.embeddings import Embeddings
+from src.config import EMBEDDING_MODEL_NAME, EMBEDDING_BATCH_SIZE, EMBEDDING_THREADS, EMBEDDING_ONNX_FILE
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+# ONNX weights shipped in the model repository on the Hugging Face Hub, used when EMBEDDING_ONNX_FILE is unset
+DEFAULT_ONNX_FILES = {"onnx": "onnx/model.onnx", "onnx_int8": "onnx/model_quint8_avx2.onnx"}
+
+class EmbeddingBackend(Embeddings):
+	"""
+	Interface for the embedding models behind the vectorstore, the semantic splitter and the answer cache.
+
+	identity names the model and everything else that changes its vectors (runtime, weights file).
+	It is recorded in the collection manifest and keys the embedding cache, so vectors from
+	different backends are never mixed. Settings that only change speed, like batch size or
+	thread count, are not part of it.
+	"""
+	name = "base"
+
+	@property
+	@abstractmethod
+	def identity(self) -> str:
+		raise NotImplementedError
+
+class SentenceTransformerEmbeddings(EmbeddingBackend):
+	"""
+	sentence-transformers model on CPU, run by PyTorch ("torch") or ONNX Runtime ("onnx").
+
+	The model is loaded on the first embed call. Texts are encoded in batches of batch_size, and
+	threads (0 keeps the library default) caps the intra-op threads of the runtime. For ONNX,
+	onnx_file selects the weights in the model repository, e.g. an int8-quantized export. Like
+	langchain's HuggingFaceEmbeddings, which the PyTorch identity is shared with, newlines in the
+	text are replaced with spaces before encoding.
+	"""
+	def __init__(self, model_name: str, runtime: str = "torch", onnx_file: str = None, batch_size: int = 32, threads: int = 0, name: str = "huggingface"):
+		if runtime not in ("torch", "onnx"):
+			raise ValueError(f"Unknown sentence-transformers runtime: {runtime!r}")
+		self.model_name = model_name
+		self.runtime = runtime
+		self.onnx_file = onnx_file
+		self.batch_size = batch_size
+		self.threads = threads
+		self.name = name
+		self._model = None
+		self._lock = threading.Lock()
+
+	@property
+	def identity(self) -> str:
+		# The PyTorch identity stays the bare model name, so collections built before backends existed still match
+		if self.runtime == "torch":
+			return self.model_name
+		return f"{self.model_name}|{self.name}|{self.onnx_file}"
+
+	def _load(self):
+		with self._lock:
+			if self._model is not None:
+				return self._model
+			from sentence_transformers import SentenceTransformer
+
+			logger.info(f"Loading {self.name} embedding backend: {self.identity}")
+			if self.runtime == "torch":
+				if self.threads > 0:
+					import torch
+					torch.set_num_threads(self.threads)
+				self._model = SentenceTransformer(self.model_name, device="cpu")
+			else:
+				try:
+					import onnxruntime
+				except ImportError as e:
+					raise ValueError(f"The {self.name} embedding backend requires ONNX Runtime (pip install \"sentence-transformers[onnx]\").") from e
+				model_kwargs = {"file_name": self.onnx_file, "provider": "CPUExecutionProvider"}
+				if self.threads > 0:
+					session_options = onnxruntime.SessionOptions()
+					session_options.intra_op_num_threads = self.threads
+					model_kwargs["session_options"] = session_options
+				self._model = SentenceTransformer(self.model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+			_hide_torch_classes_path()
+			return self._model
+
+	def _encode(self, texts: list) -> list:
+		# Newlines become spaces, as HuggingFaceEmbeddings did, so vectors match collections built with it
+		texts = [text.replace("\n", " ") for text in texts]
+		return self._load().encode(texts, batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False).tolist()
+
+	def embed_documents(self, texts: list) -> list:
+		return self._encode(list(texts)) if texts else []
+
+	def embed_query(self, text: str) -> list:
+		return self._encode([text])[0]
+
+def create_embeddings(name: str) -> EmbeddingBackend:
+	"""
+	Builds the uncached embedding backend registered under name, configured from src/config.py
+
+	Args:
+		name: "huggingface" (sentence-transformers on PyTorch), "onnx", "onnx_int8" or "hashing"
+	"""
+	if name == "huggingface":
+		return SentenceTransformerEmbeddings(EMBEDDING_MODEL_NAME, "torch", batch_size=EMBEDDING_BATCH_SIZE, threads=EMBEDDING_THREADS, name=name)
+	if name in DEFAULT_ONNX_FILES:
+		onnx_file = EMBEDDING_ONNX_FILE or DEFAULT_ONNX_FILES[name]
+		return SentenceTransformerEmbeddings(EMBEDDING_MODEL_NAME, "onnx", onnx_file, EMBEDDING_BATCH_SIZE, EMBEDDING_THREADS, name=name)
+	if name == "hashing":
+		from src.database.hashing_embeddings import HashingEmbeddings
+		return HashingEmbeddings()
+	raise ValueError(f"Unknown embedding backend: {name!r}")
+
+def _hide_torch_classes_path():
+	"""
+	Little hack to remove the torch.classes.__path__ runtime error raised when Streamlit's file
+	watcher walks the loaded modules [REF: Issue #1]. Applied once torch is loaded, instead of
+	importing torch at app startup
+	"""
+	torch = sys.modules.get("torch")
+	if torch is not None:
+		torch.classes.__path__ = []
@@ -0,0 +1,265 @@
+import os
+import re
+import json
+import atexit
+import shutil
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+class EmbeddingCache:
+	"""
+	On-disk embedding cache keyed by (model name, text hash).
+
+	Vectors live in a memory-mapped .npy file with a fixed number of slots, one directory per
+	model, and a JSON index maps text hashes to slots in least-recently-used order. When the
+	cache is full the least recently used entry gives up its slot. One instance is shared by
+	every Streamlit session in the process, so all access goes through a lock.
+
+	Puts only append (hash, slot) lines to index.log, so a query's put costs the size of its
+	batch rather than of the cache. Once the log holds more lines than the index has entries,
+	a background thread folds it into index.json; close() does the same at exit.
+	"""
+	def __init__(self, directory: str, model_name: str, capacity: int):
+		self.model_name = model_name
+		self.directory = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+		self.index_path = os.path.join(self.directory, "index.json")
+		self.vectors_path = os.path.join(self.directory, "vectors.npy")
+		self.log_path = os.path.join(self.directory, "index.log")
+		self.capacity = capacity
+		self.hits, self.misses, self.evictions = 0, 0, 0
+		self._lock = threading.Lock()
+		self._index = OrderedDict()
+		self._next_slot = 0
+		self._vectors = None
+		self._log, self._log_entries = None, 0
+		self._compacting = False
+		self._load()
+		atexit.register(self.close)
+
+	def _load(self):
+		if not (os.path.exists(self.index_path) and os.path.exists(self.vectors_path)):
+			return
+		try:
+			with open(self.index_path, "r", encoding="utf-8") as f:
+				index = json.load(f)
+			self._vectors = np.load(self.vectors_path, mmap_mode="r+")
+			self.capacity = self._vectors.shape[0]
+			self._index = OrderedDict(index["entries"])
+			self._next_slot = index["next_slot"]
+			replayed = self._replay(f"{self.log_path}.old") + self._replay(self.log_path)
+			logger.info(f"Loaded embedding cache for {self.model_name} with {len(self._index)} entries")
+		except Exception as e:
+			logger.error(f"Discarding unreadable embedding cache at {self.directory}: {e}")
+			self._vectors, self._index, self._next_slot = None, OrderedDict(), 0
+			return
+		if replayed:
+			self._compact()
+
+	def _replay(self, path: str) -> int:
+		"""
+		Applies the (hash, slot) puts logged in path on top of the loaded index
+		"""
+		if not os.path.exists(path):
+			return 0
+		owners = {slot: key for key, slot in self._index.items()}
+		replayed = 0
+		with open(path, "r", encoding="utf-8") as f:
+			for line in f:
+				try:
+					key, slot = json.loads(line)
+				except ValueError:
+					continue  # A line torn by a crash
+				if slot < 0:
+					# Eviction, logged before its slot was overwritten
+					if owners.get(self._index.get(key)) == key:
+						del owners[self._index[key]]
+					self._index.pop(key, None)
+					replayed += 1
+					continue
+				previous = owners.get(slot)
+				if previous is not None and previous != key:
+					self._index.pop(previous, None)  # The slot was evicted and reused
+				owners[slot] = key
+				self._index[key] = slot
+				self._index.move_to_end(key)
+				self._next_slot = max(self._next_slot, slot + 1)
+				replayed += 1
+		return replayed
+
+	def _open_vectors(self, dim: int):
+		os.makedirs(self.directory, exist_ok=True)
+		self._vectors = np.lib.format.open_memmap(self.vectors_path, mode="w+", dtype=np.float32, shape=(self.capacity, dim))
+		# A fresh vectors file invalidates any earlier index and log
+		self._write_snapshot(list(self._index.items()), self._next_slot)
+		for path in (self.log_path, f"{self.log_path}.old"):
+			if os.path.exists(path):
+				os.remove(path)
+
+	def get_many(self, keys: list) -> list:
+		"""
+		Returns the cached vector for each key, or None on a miss
+		"""
+		with self._lock:
+			results = []
+			for key in keys:
+				slot = self._index.get(key)
+				if slot is None or self._vectors is None:
+					self.misses += 1
+					results.append(None)
+				else:
+					self.hits += 1
+					self._index.move_to_end(key)
+					results.append(np.array(self._vectors[slot]))
+			return results
+
+	def put_many(self, keys: list, vectors: list):
+		"""
+		Stores vectors, evicting least recently used entries when the cache is full
+		"""
+		if self.capacity <= 0 or not keys:
+			return
+		with self._lock:
+			if self._vectors is None:
+				self._open_vectors(len(vectors[0]))
+
+			slots, evicted = [], []
+			for key in keys:
+				slot = self._index.get(key)
+				if slot is None:
+					slot = self._take_slot(evicted)
+				self._index[key] = slot
+				self._index.move_to_end(key)
+				slots.append(slot)
+			# Evictions are logged before their slots are overwritten and puts after their vectors are
+			# written, so after a crash the log never maps a hash to another text's vector
+			self._append([[key, -1] for key in evicted if key not in self._index])
+			for slot, vector in zip(slots, vectors):
+				self._vectors[slot] = vector
+			self._append([[key, slot] for key, slot in zip(keys, slots)])
+			compact = self._log_entries > max(1024, len(self._index)) and not self._compacting
+			if compact:
+				self._compacting = True
+		if compact:
+			threading.Thread(target=self._compact, name="embedding-cache-compact", daemon=True).start()
+
+	def _take_slot(self, evicted: list) -> int:
+		if self._next_slot < self.capacity:
+			self._next_slot += 1
+			return self._next_slot - 1
+		key, slot = self._index.popitem(last=False)
+		evicted.append(key)
+		self.evictions += 1
+		return slot
+
+	def _append(self, entries: list):
+		if not entries:
+			return
+		if self._log is None:
+			self._log = open(self.log_path, "a", encoding="utf-8")
+		self._log.write("".join(json.dumps(entry) + "\n" for entry in entries))
+		self._log.flush()
+		self._log_entries += len(entries)
+
+	def _write_snapshot(self, entries: list, next_slot: int):
+		temp_path = f"{self.index_path}.tmp"
+		with open(temp_path, "w", encoding="utf-8") as f:
+			json.dump({"model_name": self.model_name, "entries": entries, "next_slot": next_slot}, f)
+		os.replace(temp_path, self.index_path)
+
+	def _compact(self):
+		"""
+		Folds index.log into a new index.json. The log is swapped out under the lock and the
+		snapshot written outside it, so lookups and puts carry on meanwhile; until the snapshot is
+		in place, index.log.old keeps the folded puts recoverable.
+		"""
+		with self._lock:
+			if self._vectors is None:
+				self._compacting = False
+				return
+			entries, next_slot = list(self._index.items()), self._next_slot
+			if self._log is not None:
+				self._log.close()
+				self._log = None
+			if os.path.exists(f"{self.log_path}.old") and os.path.exists(self.log_path):
+				# An earlier compaction did not finish; keep its puts ahead of the newer ones
+				with open(f"{self.log_path}.old", "a", encoding="utf-8") as old, open(self.log_path, "r", encoding="utf-8") as log:
+					old.write("\n")  # Terminates a line torn by a crash
+					shutil.copyfileobj(log, old)
+				os.remove(self.log_path)
+			elif os.path.exists(self.log_path):
+				os.replace(self.log_path, f"{self.log_path}.old")
+			self._log_entries = 0
+			vectors = self._vectors
+		try:
+			vectors.flush()
+			self._write_snapshot(entries, next_slot)
+			if os.path.exists(f"{self.log_path}.old"):
+				os.remove(f"{self.log_path}.old")
+		except Exception as e:
+			logger.error(f"Failed to compact the embedding cache index at {self.directory}: {e}")
+		finally:
+			with self._lock:
+				self._compacting = False
+
+	def close(self):
+		"""
+		Writes the index snapshot and flushes the vectors; called at interpreter exit
+		"""
+		with self._lock:
+			if self._compacting or (self._log is None and not self._log_entries):
+				return
+			self._compacting = True
+		self._compact()
+
+	def stats(self) -> dict:
+		with self._lock:
+			lookups = self.hits + self.misses
+			return {
+				"entries": len(self._index),
+				"capacity": self.capacity,
+				"hits": self.hits,
+				"misses": self.misses,
+				"evictions": self.evictions,
+				"hit_rate": self.hits / lookups if lookups else 0.0,
+			}
+
+class CachedEmbeddings(Embeddings):
+	"""
+	Embeddings wrapper that serves repeated texts from an EmbeddingCache and only sends the
+	misses to the underlying model, in a single batch
+	"""
+	def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+		self.embeddings = embeddings
+		self.cache = cache
+
+	@staticmethod
+	def _key(text: str, kind: str) -> str:
+		return hashlib.sha256(f"{kind}\x00{text}".encode("utf-8")).hexdigest()
+
+	def embed_documents(self, texts: list) -> list:
+		keys = [self._key(text, "document") for text in texts]
+		vectors = self.cache.get_many(keys)
+		missing = [index for index, vector in enumerate(vectors) if vector is None]
+
+		if missing:
+			embedded = self.embeddings.embed_documents([texts[index] for index in missing])
+			self.cache.put_many([keys[index] for index in missing], embedded)
+			for index, vector in zip(missing, embedded):
+				vectors[index] = vector
+
+		logger.debug(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+		return [np.asarray(vector, dtype=float).tolist() for vector in vectors]
+
+	def embed_query(self, text: str) -> list:
+		key = self._key(text, "query")
+		vector = self.cache.get_many([key])[0]
+		if vector is None:
+			vector = self.embeddings.embed_query(text)
+			self.cache.put_many([key], [vector])
+		return np.asarray(vector, dtype=float).tolist()
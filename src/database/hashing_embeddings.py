@@ -0,0 +1,36 @@
+import re
+import math
+import hashlib
+from src.database.embedding_backends import EmbeddingBackend
+
+class HashingEmbeddings(EmbeddingBackend):
+	"""
+	Deterministic bag-of-words embeddings built with the hashing trick.
+
+	Needs no model download or network access, so benchmarks and offline test runs can build
+	a real vectorstore on CPU-only machines. Texts sharing words land close together, which
+	is enough for retrieval over small fixture corpora, but it is not a semantic model.
+	"""
+	name = "hashing"
+
+	def __init__(self, dimensions: int = 256):
+		self.dimensions = dimensions
+
+	@property
+	def identity(self) -> str:
+		return f"hashing-{self.dimensions}"
+
+	def _embed(self, text: str) -> list:
+		vector = [0.0] * self.dimensions
+		for token in re.findall(r"[a-z0-9]+", text.lower()):
+			digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+			index = int.from_bytes(digest[:4], "little") % self.dimensions
+			vector[index] += 1.0 if digest[4] & 1 else -1.0
+		norm = math.sqrt(sum(value * value for value in vector))
+		return [value / norm for value in vector] if norm else vector
+
+	def embed_documents(self, texts: list) -> list:
+		return [self._embed(text) for text in texts]
+
+	def embed_query(self, text: str) -> list:
+		return self._embed(text)
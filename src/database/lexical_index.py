@@ -0,0 +1,119 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter, defaultdict
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+def tokenize(text: str) -> list:
+	"""
+	Lowercased word tokens; keeps digits and inner dots/hyphens so course codes
+	(e.g. CS2040, MA1521) and terms like h2o or v1.2 survive as single tokens
+	"""
+	return re.findall(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*", text.lower())
+
+class BM25Index:
+	"""
+	Lexical BM25 inverted index stored next to a Chroma collection.
+
+	Per-chunk term counts are persisted as JSON at <collection>/bm25.json and the postings are
+	rebuilt in memory on load. Chunks are keyed by the same IDs as in the vectorstore, so lexical
+	and dense results can be fused by ID.
+	"""
+	FILE_NAME = "bm25.json"
+
+	def __init__(self, directory: str, k1: float = 1.5, b: float = 0.75):
+		self.path = os.path.join(directory, self.FILE_NAME)
+		self.k1, self.b = k1, b
+		self._lock = threading.RLock()
+		self._documents = {}  # chunk id -> (term counts, length)
+		self._postings = defaultdict(dict)  # term -> {chunk id: term frequency}
+		self._total_length = 0
+		if os.path.exists(self.path):
+			self._load()
+
+	@property
+	def exists(self) -> bool:
+		return os.path.exists(self.path)
+
+	def __len__(self):
+		return len(self._documents)
+
+	def _load(self):
+		with open(self.path, "r", encoding="utf-8") as f:
+			stored = json.load(f)
+		for chunk_id, counts in stored["documents"].items():
+			self._insert(chunk_id, counts)
+		logger.info(f"Loaded BM25 index with {len(self._documents)} chunks from {self.path}")
+
+	def _insert(self, chunk_id: str, counts: dict):
+		length = sum(counts.values())
+		self._documents[chunk_id] = (counts, length)
+		self._total_length += length
+		for term, frequency in counts.items():
+			self._postings[term][chunk_id] = frequency
+
+	def add(self, ids: list, texts: list):
+		with self._lock:
+			for chunk_id, text in zip(ids, texts):
+				if chunk_id in self._documents:
+					continue
+				self._insert(chunk_id, dict(Counter(tokenize(text))))
+
+	def remove(self, ids: list):
+		with self._lock:
+			for chunk_id in ids:
+				entry = self._documents.pop(chunk_id, None)
+				if entry is None:
+					continue
+				counts, length = entry
+				self._total_length -= length
+				for term in counts:
+					postings = self._postings[term]
+					postings.pop(chunk_id, None)
+					if not postings:
+						del self._postings[term]
+
+	def save(self):
+		with self._lock:
+			os.makedirs(os.path.dirname(self.path), exist_ok=True)
+			temp_path = f"{self.path}.tmp"
+			with open(temp_path, "w", encoding="utf-8") as f:
+				json.dump({"documents": {chunk_id: counts for chunk_id, (counts, _) in self._documents.items()}}, f)
+			os.replace(temp_path, self.path)
+
+	def search(self, query: str, k: int) -> list:
+		"""
+		Returns up to k (chunk id, BM25 score) pairs, best first
+		"""
+		with self._lock:
+			if not self._documents:
+				return []
+			count = len(self._documents)
+			average_length = self._total_length / count
+			scores = defaultdict(float)
+			for term in set(tokenize(query)):
+				postings = self._postings.get(term)
+				if not postings:
+					continue
+				idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+				for chunk_id, frequency in postings.items():
+					length = self._documents[chunk_id][1]
+					scores[chunk_id] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * (1 - self.b + self.b * length / average_length))
+			return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+def reciprocal_rank_fusion(rankings: list, weights: list, rrf_k: int) -> list:
+	"""
+	Fuses ranked ID lists: score(id) = sum of weight / (rrf_k + rank) over the lists containing it
+
+	Returns:
+		list: (id, fused score) pairs, best first
+	"""
+	fused = defaultdict(float)
+	for ranking, weight in zip(rankings, weights):
+		for rank, chunk_id in enumerate(ranking, start=1):
+			fused[chunk_id] += weight / (rrf_k + rank)
+	return sorted(fused.items(), key=lambda item: item[1], reverse=True)
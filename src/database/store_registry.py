@@ -0,0 +1,132 @@
+import threading
+from src.config import EMBEDDING_BACKEND, EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_CAPACITY
+from src.database.embedding_backends import create_embeddings
+from src.database.embedding_cache import EmbeddingCache, CachedEmbeddings
+from src.database.lexical_index import BM25Index
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+class VectorStoreRegistry:
+	"""
+	Process-wide registry of warm embedding model, Chroma and retriever handles.
+
+	Streamlit reruns and LangGraph runs re-enter the same Python process, so holding the
+	handles at module level lets every query reuse the loaded sentence-transformer weights
+	and the open Chroma client instead of rebuilding them per call. Chroma, torch and
+	sentence-transformers are only imported when the first handle is requested.
+	"""
+	def __init__(self, embedding_factory=None):
+		self._embedding_factory = embedding_factory or _default_embeddings
+		self._lock = threading.RLock()
+		self._embeddings = None
+		self._vectorstores = {}
+		self._retrievers = {}
+		self._lexical_indexes = {}
+
+	def get_embeddings(self):
+		"""
+		Returns the shared embedding model, loading it on first use
+		"""
+		with self._lock:
+			if self._embeddings is None:
+				logger.info("Loading embedding model")
+				self._embeddings = self._embedding_factory()
+			return self._embeddings
+
+	def get_vectorstore(self, persist_directory: str):
+		"""
+		Returns the open Chroma handle for persist_directory, opening it on first use
+		"""
+		with self._lock:
+			vectorstore = self._vectorstores.get(persist_directory)
+			if vectorstore is None:
+				from langchain_chroma import Chroma
+
+				logger.info(f"Opening vectorstore: {persist_directory}")
+				vectorstore = Chroma(persist_directory=persist_directory, embedding_function=self.get_embeddings())
+				self._vectorstores[persist_directory] = vectorstore
+			return vectorstore
+
+	def get_retriever(self, persist_directory: str, **search_kwargs):
+		"""
+		Returns a cached retriever over the vectorstore at persist_directory
+		"""
+		key = (persist_directory, tuple(sorted(search_kwargs.items())))
+		with self._lock:
+			retriever = self._retrievers.get(key)
+			if retriever is None:
+				vectorstore = self.get_vectorstore(persist_directory)
+				retriever = vectorstore.as_retriever(search_kwargs=search_kwargs) if search_kwargs else vectorstore.as_retriever()
+				self._retrievers[key] = retriever
+			return retriever
+
+	def get_lexical_index(self, persist_directory: str):
+		"""
+		Returns the BM25 index stored next to the collection, backfilling it from the
+		vectorstore for collections created before lexical indexing existed
+		"""
+		with self._lock:
+			lexical_index = self._lexical_indexes.get(persist_directory)
+			if lexical_index is None:
+				lexical_index = BM25Index(persist_directory)
+				if not lexical_index.exists:
+					stored = self.get_vectorstore(persist_directory).get(include=["documents"])
+					if stored["ids"]:
+						logger.info(f"Backfilling BM25 index with {len(stored['ids'])} chunks")
+						lexical_index.add(stored["ids"], stored["documents"])
+						lexical_index.save()
+				self._lexical_indexes[persist_directory] = lexical_index
+			return lexical_index
+
+	def invalidate(self, persist_directory: str = None):
+		"""
+		Drops cached Chroma, retriever and lexical index handles so the next call reopens them from disk.
+		Must run before the vectorstore folders are deleted. The embedding model is kept loaded
+		since it does not depend on the stored data.
+
+		Args:
+			persist_directory: Only drop handles for this directory, or all handles if None
+		"""
+		with self._lock:
+			if persist_directory is None:
+				closing = list(self._vectorstores.values())
+				self._vectorstores.clear()
+				self._retrievers.clear()
+				self._lexical_indexes.clear()
+			else:
+				closing = [self._vectorstores.pop(persist_directory)] if persist_directory in self._vectorstores else []
+				self._retrievers = {key: value for key, value in self._retrievers.items() if key[0] != persist_directory}
+				self._lexical_indexes.pop(persist_directory, None)
+
+			for vectorstore in closing:
+				_release_chroma_client(vectorstore)
+			logger.info(f"Invalidated {len(closing)} vectorstore handle(s)")
+
+def embedding_identity() -> str:
+	"""
+	Identity of the configured embedding backend, recorded in the collection manifest so
+	vectors from different models or runtimes never share a collection
+	"""
+	return create_embeddings(EMBEDDING_BACKEND).identity
+
+def _default_embeddings():
+	"""
+	Configured embedding backend (EMBEDDING_BACKEND), served through the on-disk embedding
+	cache so the semantic splitter and Chroma never embed the same text twice
+	"""
+	embeddings = create_embeddings(EMBEDDING_BACKEND)
+	if EMBEDDING_CACHE_CAPACITY <= 0:
+		return embeddings
+	return CachedEmbeddings(embeddings, EmbeddingCache(EMBEDDING_CACHE_DIR, embeddings.identity, EMBEDDING_CACHE_CAPACITY))
+
+def _release_chroma_client(vectorstore):
+	"""
+	Chroma keeps one shared system per persist path; clear it so a deleted folder is not reused
+	"""
+	try:
+		vectorstore._client.clear_system_cache()
+	except Exception as e:
+		logger.debug(f"Could not clear Chroma system cache: {e}")
+
+VECTOR_STORE_REGISTRY = VectorStoreRegistry()
@@ -1,66 +1,306 @@
-import os
+import hashlib
 from src.logger import get_logger 
-from langchain_experimental.text_splitter import SemanticChunker 
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from datetime import datetime
+from langchain_core.documents import Document
+from src.config import (
+	VECTOR_DB_ROOT, RETRIEVAL_MODE, RETRIEVAL_FETCH_K, RRF_K, DENSE_WEIGHT, LEXICAL_WEIGHT,
+	CHUNKER, CHUNK_BREAKPOINT_PERCENTILE, CHUNK_VECTORS,
+)
+from src.database.store_registry import VECTOR_STORE_REGISTRY, embedding_identity
+from src.database.collection_registry import CollectionRegistry
+from src.database.lexical_index import reciprocal_rank_fusion
 
 logger = get_logger(__name__)
-timestamp = datetime.now().strftime("%Y%m%d")
-VECTOR_DB_PATH = f"vectorstore_{timestamp}"
+COLLECTION_REGISTRY = CollectionRegistry(VECTOR_DB_ROOT)
+
+def collection_identity() -> str:
+	"""
+	This function returns the embedding identity recorded for collections. Chunk vectors averaged
+	from sentence vectors differ from embedded chunk text, so they get collections of their own
+	"""
+	if CHUNKER == "single_pass" and CHUNK_VECTORS == "sentence_mean":
+		return f"{embedding_identity()}|sentence_mean"
+	return embedding_identity()
+
+def active_collection_path(chunk_size: int = None, chunk_overlap: int = None) -> str:
+	"""
+	This function resolves the persist directory of the active collection through the registry
+	"""
+	return COLLECTION_REGISTRY.resolve(collection_identity(), chunk_size, chunk_overlap)["path"]
 
 def retrieve_vector_database():
 	"""
-	This function initializes a vector database or retrieves from vectorstore if exists
-	"""
-	embeddings = HuggingFaceEmbeddings()
-	if os.path.exists(VECTOR_DB_PATH) and os.listdir(VECTOR_DB_PATH):
-		logger.info(f"Existing vectorstore: {VECTOR_DB_PATH} found")			
-		vectorstore = Chroma(persist_directory=VECTOR_DB_PATH, embedding_function=embeddings)
-	else:
-		# Initialize a new vectorstore
-		logger.info("No vectorstore found, initializing new vectorstore")
-		vectorstore = Chroma(
-			embedding_function=embeddings,
-			persist_directory=VECTOR_DB_PATH
-		)
-	retriever = vectorstore.as_retriever()
+	This function retrieves the shared retriever over the vectorstore, initializing it on first use
+	"""
+	retriever = VECTOR_STORE_REGISTRY.get_retriever(active_collection_path())
 	return retriever
 
-def add_documents(documents: list, CHUNK_SIZE: int, CHUNK_OVERLAP: int):
+def _dense_search(vectorstore, question: str, k: int):
+	documents = []
+	for doc, score in vectorstore.similarity_search_with_relevance_scores(question, k=k):
+		doc.metadata["relevance_score"] = score
+		documents.append(doc)
+	return documents
+
+def _hybrid_search(vectorstore, lexical_index, question: str, k: int):
+	"""
+	Fuses dense and BM25 candidates with reciprocal rank fusion. Chunks found only by the lexical
+	index carry no relevance_score, and every BM25 match is flagged metadata["lexical_match"], so
+	the grading pre-filter never rejects an exact-term hit on a weak dense score alone.
 	"""
-	This function converts documents uploaded into embeddings and either
-		(a) Add to existing vectorstore
-		(b) Create vectorestore and add embeddings inside 
+	dense_documents = {}
+	for doc in _dense_search(vectorstore, question, max(k, RETRIEVAL_FETCH_K)):
+		dense_documents[doc.id or chunk_id(doc.metadata.get("source", ""), doc.page_content)] = doc
+	lexical_ids = [key for key, _ in lexical_index.search(question, max(k, RETRIEVAL_FETCH_K))]
+	lexical_matches = set(lexical_ids)
+
+	fused = reciprocal_rank_fusion([list(dense_documents), lexical_ids], [DENSE_WEIGHT, LEXICAL_WEIGHT], RRF_K)[:k]
+	missing_ids = [key for key, _ in fused if key not in dense_documents]
+	lexical_documents = {}
+	if missing_ids:
+		stored = vectorstore.get(ids=missing_ids, include=["documents", "metadatas"])
+		for key, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+			lexical_documents[key] = Document(id=key, page_content=text, metadata=metadata or {})
+
+	documents = []
+	for key, score in fused:
+		doc = dense_documents.get(key) or lexical_documents.get(key)
+		if doc is not None:
+			doc.metadata["rrf_score"] = score
+			doc.metadata["lexical_match"] = key in lexical_matches
+			documents.append(doc)
+	return documents
+
+def retrieve_relevant_documents(question: str, k: int = 4, mode: str = RETRIEVAL_MODE):
+	"""
+	This function retrieves the top k documents, either by dense similarity alone or fused with
+	BM25 lexical matches ("hybrid"). Dense hits keep the relevance score Chroma computes under
+	metadata["relevance_score"] for the grading pre-filter
 
 	Args:
-		documents (list): List of documents to add to the vectorstore
+		question (str): User question
+		k (int): Number of documents to retrieve
+		mode (str): "dense" or "hybrid"
 	"""
-	embeddings = HuggingFaceEmbeddings()
-	
-	# Process the new documents
-	logger.info("Processing documents...")
+	persist_directory = active_collection_path()
+	vectorstore = VECTOR_STORE_REGISTRY.get_vectorstore(persist_directory)
+	if mode == "hybrid":
+		return _hybrid_search(vectorstore, VECTOR_STORE_REGISTRY.get_lexical_index(persist_directory), question, k)
+	return _dense_search(vectorstore, question, k)
+
+def collection_fingerprint():
+	"""
+	This function identifies the active collection and its contents; it changes whenever documents are added or removed
+	"""
+	return COLLECTION_REGISTRY.fingerprint()
+
+def content_hash(data) -> str:
+	"""
+	This function returns the SHA-256 hex digest of text or raw bytes
+	"""
+	if isinstance(data, str):
+		data = data.encode("utf-8")
+	return hashlib.sha256(data).hexdigest()
+
+def chunk_id(source: str, content: str) -> str:
+	"""
+	This function derives a stable chunk ID from its source name and content, so re-ingesting
+	unchanged text maps onto the vectors already stored
+	"""
+	return content_hash(f"{source}\x00{content}")
+
+def count_indexed_chunks(source: str, source_hash: str) -> int:
+	"""
+	This function counts the stored chunks of this exact version of a source file, 0 if it is not indexed
+	"""
+	vectorstore = VECTOR_STORE_REGISTRY.get_vectorstore(active_collection_path())
+	stored = vectorstore.get(where={"$and": [{"source": source}, {"source_hash": source_hash}]}, include=[])
+	return len(stored["ids"])
+
+def split_documents(documents: list, CHUNK_SIZE: int, CHUNK_OVERLAP: int, chunker: str = CHUNKER):
+	"""
+	This function splits documents semantically and enforces the token size and overlap limits,
+	in one pass with SemanticTokenChunker ("single_pass") or with the two LangChain splitters ("two_stage")
+
+	Returns:
+		tuple: (chunks, chunk vectors to store instead of embedding the chunks, or None)
+	"""
+	embeddings = VECTOR_STORE_REGISTRY.get_embeddings()
+	if chunker == "single_pass":
+		from src.database.chunker import SemanticTokenChunker
+
+		chunks, vectors = SemanticTokenChunker(embeddings, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_BREAKPOINT_PERCENTILE).split(documents)
+		return chunks, (vectors.tolist() if CHUNK_VECTORS == "sentence_mean" else None)
+	if chunker != "two_stage":
+		raise ValueError(f"Unknown chunker: {chunker!r}")
+
+	# Imported on first ingestion rather than at app startup
+	from langchain_experimental.text_splitter import SemanticChunker
+	from langchain.text_splitter import RecursiveCharacterTextSplitter
+
 	semantic_text_splitter = SemanticChunker(embeddings)
 	documents = semantic_text_splitter.split_documents(documents)
 	text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
 		chunk_size=CHUNK_SIZE,
 		chunk_overlap=CHUNK_OVERLAP
 	)
-	split_documents = text_splitter.split_documents(documents)
-
-	# Add to existing vectorstore
-	if os.path.exists(VECTOR_DB_PATH) and os.listdir(VECTOR_DB_PATH):	
-		vectorstore = Chroma(persist_directory=VECTOR_DB_PATH, embedding_function=embeddings)
-		vectorstore.add_documents(split_documents)
-		logger.info("Added documents to vectorstore")	
-	else:
-		# Create new vector store if it doesn't exist
-		vectorstore = Chroma.from_documents(
-			split_documents,
-			embeddings,
-			persist_directory=VECTOR_DB_PATH
-		)
-		logger.info("Initialized new vectorstore")	
+	return text_splitter.split_documents(documents), None
+
+class SourceIndexer:
+	"""
+	Writes the chunks of one source file, possibly in several batches, keyed by content-hash IDs:
+		(a) Chunks already stored for the source are skipped
+		(b) New chunks are added, with the given vectors if any instead of embedding them
+		(c) On finish(), stored chunks missing from this version of the source are deleted
+	The collection's BM25 index is kept in step with the vectorstore.
+
+	With streaming=True, batches are tagged with a partial hash until finish(), so an interrupted
+	ingestion is never mistaken for a complete one by count_indexed_chunks. Chunks already written
+	for this version by an interrupted run are picked up, so a resumed run only adds the rest.
+	"""
+	def __init__(self, vectorstore, source: str, source_hash: str, lexical_index=None, streaming: bool = False):
+		self.vectorstore = vectorstore
+		self.source = source
+		self.source_hash = source_hash
+		self.write_hash = f"partial:{source_hash}" if streaming else source_hash
+		self.lexical_index = lexical_index
+		self.streaming = streaming
+		self.seen_ids = set(vectorstore.get(where={"$and": [{"source": source}, {"source_hash": self.write_hash}]}, include=[])["ids"]) if streaming else set()
+		self.stored_ids = set(vectorstore.get(where={"source": source}, include=[])["ids"]).difference(self.seen_ids)
+		self.resumed = len(self.seen_ids)
+		self.added, self.kept, self.duplicates = 0, 0, 0
+		if self.resumed:
+			# The BM25 index is only saved on finish(), so the interrupted run's chunks may be missing from it
+			resumed = vectorstore.get(ids=list(self.seen_ids), include=["documents"])
+			self._lexical().add(resumed["ids"], resumed["documents"])
+			logger.info(f"Resuming {source} with {self.resumed} chunks already written")
+
+	def add(self, chunks: list, vectors: list = None):
+		unique_chunks, unique_vectors = {}, {}
+		for position, chunk in enumerate(chunks):
+			chunk.metadata.update({"source": self.source, "source_hash": self.write_hash, "chunk_hash": content_hash(chunk.page_content)})
+			key = chunk_id(self.source, chunk.page_content)
+			if key in self.seen_ids or key in unique_chunks:
+				self.duplicates += 1
+				continue
+			unique_chunks[key] = chunk
+			if vectors is not None:
+				unique_vectors[key] = vectors[position]
+		self.seen_ids.update(unique_chunks)
+
+		added_ids = [key for key in unique_chunks if key not in self.stored_ids]
+		kept_ids = [key for key in unique_chunks if key in self.stored_ids]
+		if kept_ids:
+			# Tag unchanged chunks with the new file hash so count_indexed_chunks sees this version
+			_chroma_collection(self.vectorstore).update(ids=kept_ids, metadatas=[unique_chunks[key].metadata for key in kept_ids])
+		if added_ids and vectors is not None:
+			_chroma_collection(self.vectorstore).add(
+				ids=added_ids,
+				embeddings=[unique_vectors[key] for key in added_ids],
+				documents=[unique_chunks[key].page_content for key in added_ids],
+				metadatas=[unique_chunks[key].metadata for key in added_ids],
+			)
+		elif added_ids:
+			self.vectorstore.add_documents([unique_chunks[key] for key in added_ids], ids=added_ids)
+		if added_ids:
+			self._lexical().add(added_ids, [unique_chunks[key].page_content for key in added_ids])
+			if self.streaming:
+				# Make the new pages answerable now: caches keyed on the fingerprint stop matching
+				COLLECTION_REGISTRY.bump_revision()
+		self.added += len(added_ids)
+		self.kept += len(kept_ids)
+
+	def _lexical(self):
+		if self.lexical_index is None:
+			self.lexical_index = VECTOR_STORE_REGISTRY.get_lexical_index(active_collection_path())
+		return self.lexical_index
+
+	def finish(self) -> dict:
+		"""
+		Deletes stale chunks, marks the written chunks complete and saves the BM25 index
+
+		Returns:
+			dict: Counts of new, skipped and replaced chunks, and of stale chunks removed
+		"""
+		stale_ids = list(self.stored_ids.difference(self.seen_ids))
+		if stale_ids:
+			self.vectorstore.delete(ids=stale_ids)
+			self._lexical().remove(stale_ids)
+			logger.info(f"Removed {len(stale_ids)} stale chunks of {self.source}")
+		if self.write_hash != self.source_hash:
+			partial = self.vectorstore.get(where={"$and": [{"source": self.source}, {"source_hash": self.write_hash}]}, include=["metadatas"])
+			if partial["ids"]:
+				_chroma_collection(self.vectorstore).update(ids=partial["ids"], metadatas=[dict(metadata, source_hash=self.source_hash) for metadata in partial["metadatas"]])
+		if self.added or self.resumed or stale_ids:
+			self._lexical().save()
+			COLLECTION_REGISTRY.bump_revision()
+
+		is_update = bool(self.stored_ids)
+		added = self.added + self.resumed
+		stats = {
+			"new": 0 if is_update else added,
+			"skipped": self.kept + self.duplicates,
+			"replaced": added if is_update else 0,
+			"removed": len(stale_ids),
+		}
+		logger.info(f"Indexed {self.source}: {stats}")
+		return stats
+
+def _chroma_collection(vectorstore):
+	"""
+	This function returns the Chroma collection behind a langchain_chroma vectorstore. langchain_chroma
+	has no public call that updates metadata, or writes vectors computed elsewhere, without embedding
+	the text again, so SourceIndexer makes those writes here; everything else uses the public API
+	"""
+	return vectorstore._collection
+
+def index_chunks(vectorstore, chunks: list, source: str, source_hash: str, lexical_index=None, vectors: list = None):
+	"""
+	This function writes all chunks of one source file in one batch, see SourceIndexer
+
+	Returns:
+		dict: Counts of new, skipped and replaced chunks, and of stale chunks removed
+	"""
+	indexer = SourceIndexer(vectorstore, source, source_hash, lexical_index)
+	indexer.add(chunks, vectors)
+	return indexer.finish()
+
+def add_documents(documents: list, CHUNK_SIZE: int, CHUNK_OVERLAP: int, source: str = None, source_hash: str = None):
+	"""
+	This function converts documents uploaded into embeddings and adds them to the active
+	collection, skipping chunks that are already stored and replacing chunks that changed
+
+	Args:
+		documents (list): List of documents from one source file to add to the vectorstore
+		source (str): Name of the source file, defaults to the documents' "source" metadata
+		source_hash (str): Hash of the raw source file, defaults to a hash of the document text
+
+	Returns:
+		dict: Counts of new, skipped and replaced chunks, and of stale chunks removed
+	"""
+	source = source or (documents[0].metadata.get("source", "") if documents else "")
+	source_hash = source_hash or content_hash("".join(doc.page_content for doc in documents))
+
+	indexed_chunks = count_indexed_chunks(source, source_hash)
+	if indexed_chunks:
+		logger.info(f"{source} is already indexed, skipping")
+		return {"new": 0, "skipped": indexed_chunks, "replaced": 0, "removed": 0}
+
+	# Process the new documents
+	logger.info("Processing documents...")
+	split_docs, vectors = split_documents(documents, CHUNK_SIZE, CHUNK_OVERLAP)
+
+	# Chroma creates the collection on first write, so the warm handle covers both cases
+	vectorstore = VECTOR_STORE_REGISTRY.get_vectorstore(active_collection_path(CHUNK_SIZE, CHUNK_OVERLAP))
+	stats = index_chunks(vectorstore, split_docs, source, source_hash, vectors=vectors)
 	logger.info("Document processing complete")
-	return vectorstore
\ No newline at end of file
+	return stats
+
+def clear_vector_database():
+	"""
+	This function releases all cached vectorstore handles and removes every stored collection
+
+	Returns:
+		bool: Whether any collection data was removed
+	"""
+	VECTOR_STORE_REGISTRY.invalidate()
+	return COLLECTION_REGISTRY.clear()
@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import threading
+from src.config import INGEST_JOBS_DB, INGEST_SPOOL_DIR, INGEST_JOB_LEASE_SECONDS, INGEST_PAGE_WINDOW
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+FILE_FINAL_STATUSES = {"indexed", "skipped", "failed"}
+
+class SpooledUpload:
+	"""
+	Uploaded file kept in the spool directory, with the same read interface as Streamlit's UploadedFile.
+	path lets the pipeline hand the spooled file to its workers instead of copying it again.
+	"""
+	def __init__(self, name: str, path: str):
+		self.name = name
+		self.path = path
+
+	def getvalue(self) -> bytes:
+		with open(self.path, "rb") as f:
+			return f.read()
+
+	def getbuffer(self) -> memoryview:
+		return memoryview(self.getvalue())
+
+class JobStore:
+	"""
+	Persistent SQLite table of ingestion jobs and their files.
+
+	A job's uploads are spooled to spool_dir when it is submitted. While it runs, every pipeline
+	event is checkpointed: a file's written page windows, then its final status and chunk counts.
+	Workers hold a job through a lease renewed on each checkpoint; a running job whose lease has
+	expired (its process died) is claimed again and resumes after the last written window.
+	"""
+	def __init__(self, path: str, spool_dir: str, lease_seconds: int):
+		self.spool_dir = spool_dir
+		self.lease_seconds = lease_seconds
+		self._lock = threading.Lock()
+		self._connection = sqlite3.connect(path, check_same_thread=False)
+		self._connection.execute(
+			"CREATE TABLE IF NOT EXISTS jobs ("
+			"job_id TEXT PRIMARY KEY, status TEXT, chunk_size INTEGER, chunk_overlap INTEGER, page_window INTEGER, "
+			"created_at REAL, updated_at REAL, lease_until REAL, stats TEXT, error TEXT)"
+		)
+		self._connection.execute(
+			"CREATE TABLE IF NOT EXISTS job_files ("
+			"job_id TEXT, name TEXT, position INTEGER, spool_path TEXT, status TEXT, total_pages INTEGER, "
+			"pages_done INTEGER, windows_done TEXT, stats TEXT, error TEXT, updated_at REAL, "
+			"PRIMARY KEY (job_id, name))"
+		)
+		self._connection.commit()
+
+	def submit(self, uploaded_files: list, chunk_size: int, chunk_overlap: int, page_window: int = INGEST_PAGE_WINDOW) -> str:
+		"""
+		Spools the uploaded files to disk and queues a job for them
+
+		Args:
+			uploaded_files (list): Objects with .name and .getbuffer(), e.g. Streamlit UploadedFile
+
+		Returns:
+			str: The job id
+		"""
+		if not uploaded_files:
+			raise ValueError("An ingestion job needs at least one file.")
+		names = [uploaded_file.name for uploaded_file in uploaded_files]
+		duplicates = sorted({name for name in names if names.count(name) > 1})
+		if duplicates:
+			# Files are tracked, checkpointed and resumed by name within a job
+			raise ValueError(f"An ingestion job cannot contain two files with the same name: {', '.join(duplicates)}")
+		job_id = uuid.uuid4().hex
+		job_dir = os.path.join(self.spool_dir, job_id)
+		os.makedirs(job_dir, exist_ok=True)
+		now, files = time.time(), []
+		for position, uploaded_file in enumerate(uploaded_files):
+			spool_path = os.path.join(job_dir, f"{position}{os.path.splitext(uploaded_file.name)[1]}")
+			with open(spool_path, "wb") as f:
+				f.write(uploaded_file.getbuffer())
+			files.append((job_id, uploaded_file.name, position, spool_path, "queued", None, 0, "[]", None, None, now))
+
+		with self._lock:
+			self._connection.executemany("INSERT INTO job_files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", files)
+			self._connection.execute(
+				"INSERT INTO jobs VALUES (?, 'queued', ?, ?, ?, ?, ?, 0, NULL, NULL)",
+				(job_id, chunk_size, chunk_overlap, page_window, now, now),
+			)
+			self._connection.commit()
+		logger.info(f"Queued ingestion job {job_id} with {len(files)} files")
+		return job_id
+
+	def claim(self):
+		"""
+		Leases the oldest queued job, or a running job whose worker stopped renewing its lease
+
+		Returns:
+			dict: The job, or None when there is nothing to run
+		"""
+		now = time.time()
+		claimable = "(status = 'queued' OR (status = 'running' AND lease_until < ?))"
+		with self._lock:
+			candidates = self._connection.execute(f"SELECT job_id, status FROM jobs WHERE {claimable} ORDER BY created_at", (now,)).fetchall()
+			for row in candidates:
+				# Compare-and-set: another process sharing the database may have claimed the job since the SELECT
+				cursor = self._connection.execute(
+					f"UPDATE jobs SET status = 'running', lease_until = ?, updated_at = ? WHERE job_id = ? AND {claimable}",
+					(now + self.lease_seconds, now, row[0], now),
+				)
+				self._connection.commit()
+				if cursor.rowcount == 1:
+					break
+			else:
+				return None
+		if row[1] == "running":
+			logger.info(f"Resuming interrupted ingestion job {row[0]}")
+		return self.get(row[0])
+
+	def renew(self, job_id: str):
+		now = time.time()
+		with self._lock:
+			self._connection.execute("UPDATE jobs SET lease_until = ?, updated_at = ? WHERE job_id = ?", (now + self.lease_seconds, now, job_id))
+			self._connection.commit()
+
+	def checkpoint(self, job_id: str, event: dict):
+		"""
+		Records one ingestion pipeline event for the job's file and renews the job's lease
+		"""
+		name, now = event.get("file"), time.time()
+		with self._lock:
+			if event["stage"] == "queued":
+				self._connection.execute(
+					"UPDATE job_files SET status = 'running', total_pages = ?, updated_at = ? WHERE job_id = ? AND name = ?",
+					(event.get("total_pages"), now, job_id, name),
+				)
+			elif event["stage"] == "written":
+				row = self._connection.execute("SELECT windows_done FROM job_files WHERE job_id = ? AND name = ?", (job_id, name)).fetchone()
+				windows_done = sorted(set(json.loads(row[0]) if row else []) | {event["window"]})
+				self._connection.execute(
+					"UPDATE job_files SET windows_done = ?, pages_done = ?, updated_at = ? WHERE job_id = ? AND name = ?",
+					(json.dumps(windows_done), event["pages_done"], now, job_id, name),
+				)
+			elif event["stage"] in FILE_FINAL_STATUSES:
+				self._connection.execute(
+					"UPDATE job_files SET status = ?, stats = ?, error = ?, updated_at = ? WHERE job_id = ? AND name = ?",
+					(event["stage"], json.dumps(event.get("stats", {})), event.get("error") or event.get("reason"), now, job_id, name),
+				)
+			self._connection.execute("UPDATE jobs SET lease_until = ?, updated_at = ? WHERE job_id = ?", (now + self.lease_seconds, now, job_id))
+			self._connection.commit()
+
+	def finish(self, job_id: str, error: str = None):
+		"""
+		Marks the job done (or failed, with error), totals its files' chunk counts and deletes its spooled uploads
+		"""
+		totals = {"new": 0, "skipped": 0, "replaced": 0, "removed": 0}
+		with self._lock:
+			for (stats,) in self._connection.execute("SELECT stats FROM job_files WHERE job_id = ? AND stats IS NOT NULL", (job_id,)):
+				for key, value in json.loads(stats).items():
+					totals[key] = totals.get(key, 0) + value
+			self._connection.execute(
+				"UPDATE jobs SET status = ?, stats = ?, error = ?, lease_until = 0, updated_at = ? WHERE job_id = ?",
+				("failed" if error else "done", json.dumps(totals), error, time.time(), job_id),
+			)
+			self._connection.commit()
+		shutil.rmtree(os.path.join(self.spool_dir, job_id), ignore_errors=True)
+
+	def unfinished_job_ids(self) -> list:
+		"""
+		Returns the ids of queued and running jobs, oldest first
+		"""
+		with self._lock:
+			rows = self._connection.execute("SELECT job_id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at").fetchall()
+		return [row[0] for row in rows]
+
+	def get(self, job_id: str):
+		"""
+		Returns the job with its files as a dict, or None for an unknown job id
+		"""
+		with self._lock:
+			row = self._connection.execute(
+				"SELECT job_id, status, chunk_size, chunk_overlap, page_window, created_at, updated_at, stats, error FROM jobs WHERE job_id = ?",
+				(job_id,),
+			).fetchone()
+			if row is None:
+				return None
+			files = self._connection.execute(
+				"SELECT name, spool_path, status, total_pages, pages_done, windows_done, stats, error FROM job_files WHERE job_id = ? ORDER BY position",
+				(job_id,),
+			).fetchall()
+		job = dict(zip(("job_id", "status", "chunk_size", "chunk_overlap", "page_window", "created_at", "updated_at", "stats", "error"), row))
+		job["stats"] = json.loads(job["stats"]) if job["stats"] else None
+		job["files"] = [
+			{"name": name, "spool_path": spool_path, "status": status, "total_pages": total_pages, "pages_done": pages_done,
+			"windows_done": json.loads(windows_done), "stats": json.loads(stats) if stats else None, "error": error}
+			for name, spool_path, status, total_pages, pages_done, windows_done, stats, error in files
+		]
+		return job
+
+class IngestionWorker(threading.Thread):
+	"""
+	Daemon thread running queued ingestion jobs one at a time through the ingestion pipeline.
+
+	Files a previous run already finished are left out, and page windows it already wrote are
+	skipped, so a restarted process resumes jobs where they stopped. Chunks are written window
+	by window, so questions can be answered from what is already indexed while a job runs.
+	"""
+	def __init__(self, store: JobStore, poll_seconds: float = 1.0):
+		super().__init__(name="ingestion-jobs", daemon=True)
+		self.store = store
+		self.poll_seconds = poll_seconds
+		self._wake = threading.Event()
+		self._stopped = threading.Event()
+
+	def notify(self):
+		"""
+		Wakes the worker up so a newly submitted job starts without waiting for the next poll
+		"""
+		self._wake.set()
+
+	def stop(self):
+		self._stopped.set()
+		self._wake.set()
+
+	def run(self):
+		while not self._stopped.is_set():
+			try:
+				job = self.store.claim()
+			except Exception as e:
+				logger.error(f"Failed to claim an ingestion job: {e}")
+				job = None
+			if job is None:
+				self._wake.wait(self.poll_seconds)
+				self._wake.clear()
+				continue
+			self.run_job(job)
+
+	def run_job(self, job: dict):
+		"""
+		Runs one claimed job to completion, checkpointing every pipeline event
+		"""
+		from src.ingestion.pipeline import ingest_files
+
+		job_id = job["job_id"]
+		files = [file for file in job["files"] if file["status"] not in FILE_FINAL_STATUSES]
+		uploads = [SpooledUpload(file["name"], file["spool_path"]) for file in files]
+		skip_windows = {file["name"]: file["windows_done"] for file in files if file["windows_done"]}
+
+		# Parsing a page window can take longer than the lease, so renew it independently of the events
+		heartbeat_stopped = threading.Event()
+		def heartbeat():
+			while not heartbeat_stopped.wait(self.store.lease_seconds / 3):
+				self.store.renew(job_id)
+		threading.Thread(target=heartbeat, name=f"ingestion-lease-{job_id[:8]}", daemon=True).start()
+
+		try:
+			# ingest_files spawns its parser processes (see pipeline._make_executor); forking here, from a
+			# daemon thread while the heartbeat and Streamlit threads run, could deadlock the children
+			for event in ingest_files(uploads, job["chunk_size"], job["chunk_overlap"], page_window=job["page_window"], skip_windows=skip_windows):
+				if event["stage"] != "done":
+					self.store.checkpoint(job_id, event)
+			self.store.finish(job_id)
+			logger.info(f"Ingestion job {job_id} done")
+		except Exception as e:
+			logger.error(f"Ingestion job {job_id} failed: {e}")
+			self.store.finish(job_id, error=str(e))
+		finally:
+			heartbeat_stopped.set()
+
+_store = None
+_worker = None
+_worker_lock = threading.Lock()
+
+def get_job_store() -> JobStore:
+	global _store
+	with _worker_lock:
+		if _store is None:
+			_store = JobStore(INGEST_JOBS_DB, INGEST_SPOOL_DIR, INGEST_JOB_LEASE_SECONDS)
+		return _store
+
+def start_ingestion_worker() -> IngestionWorker:
+	"""
+	Starts the background ingestion worker, which first resumes jobs left unfinished by a previous run.
+	Safe to call on every Streamlit rerun; only the first call starts the worker.
+	"""
+	global _worker
+	store = get_job_store()
+	with _worker_lock:
+		if _worker is None:
+			_worker = IngestionWorker(store)
+			_worker.start()
+			logger.info("Started ingestion worker")
+		return _worker
+
+def submit_ingestion_job(uploaded_files: list, chunk_size: int, chunk_overlap: int) -> str:
+	"""
+	Spools the uploaded files and queues them for the background ingestion worker
+
+	Returns:
+		str: The job id, to poll with get_job_store().get(job_id)
+	"""
+	job_id = get_job_store().submit(uploaded_files, chunk_size, chunk_overlap)
+	start_ingestion_worker().notify()
+	return job_id
@@ -0,0 +1,110 @@
+import io
+import os
+import csv
+import tempfile
+import pdfplumber
+from langchain_core.documents import Document
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+def file_extension(name: str) -> str:
+	return name.split(".")[-1].lower()
+
+def _decode(data) -> str:
+	return str(data, "utf-8", errors="replace")
+
+def load_csv(name: str, data):
+	"""
+	One document per row, formatted like langchain's CSVLoader
+	"""
+	reader = csv.DictReader(io.StringIO(_decode(data)))
+	documents = []
+	for row_index, row in enumerate(reader):
+		content = "\n".join(f"{key.strip() if key else key}: {value.strip() if isinstance(value, str) else value}" for key, value in row.items())
+		documents.append(Document(page_content=content, metadata={"source": name, "row": row_index}))
+	return documents
+
+def load_text(name: str, data):
+	return [Document(page_content=_decode(data), metadata={"source": name})]
+
+def _open_pdf(source, pages: list = None):
+	# source is the file contents, or a path when the contents were spooled to disk for worker processes
+	return pdfplumber.open(source if isinstance(source, str) else io.BytesIO(source), pages=pages)
+
+def count_pdf_pages(source) -> int:
+	with _open_pdf(source) as pdf:
+		return len(pdf.pages)
+
+def lazy_load_pdf(name: str, source, start: int = 0, end: int = None, total_pages: int = None):
+	"""
+	Yields one document per page in [start, end), parsing each page only when it is requested,
+	so callers can process a large PDF a window of pages at a time
+	"""
+	page_numbers = list(range(start + 1, end + 1)) if end is not None else None
+	with _open_pdf(source, page_numbers) as pdf:
+		pdf_metadata = {key: value for key, value in pdf.metadata.items() if isinstance(value, (str, int, float))}
+		total_pages = total_pages or len(pdf.pages)
+		for page in pdf.pages:
+			metadata = dict(pdf_metadata, source=name, file_path=name, page=page.page_number - 1, total_pages=total_pages)
+			document = Document(page_content=page.extract_text() or "", metadata=metadata)
+			page.close()  # Drops pdfplumber's cached layout objects for the page
+			yield document
+
+def load_pdf(name: str, data):
+	"""
+	One document per page, read straight from the byte buffer with pdfplumber
+	"""
+	return list(lazy_load_pdf(name, data))
+
+def load_pdf_pages(name: str, source, start: int, end: int, total_pages: int):
+	"""
+	Parses pages [start, end) of a PDF. Runs inside the ingestion worker pool, one call per page window
+	"""
+	documents = list(lazy_load_pdf(name, source, start, end, total_pages))
+	logger.info(f"Loaded pages {start + 1}-{end} of {total_pages} from {name}")
+	return documents
+
+def load_from_temp_path(name: str, data, loader_cls):
+	"""
+	Fallback for parsers that can only read from a path: writes the buffer to a temporary
+	directory owned by this call, so concurrent sessions never touch each other's files
+	"""
+	with tempfile.TemporaryDirectory(prefix="studybuddy_") as temp_folder:
+		temp_file_path = os.path.join(temp_folder, os.path.basename(name))
+		with open(temp_file_path, "wb") as f:
+			f.write(data)
+		documents = loader_cls(temp_file_path).load()
+	for document in documents:
+		document.metadata["source"] = name
+	return documents
+
+# Byte loaders take (name, data); a langchain loader class may be registered for formats that need a path
+LOADERS = {
+	"csv": load_csv,
+	"txt": load_text,
+	"md": load_text,
+	"pdf": load_pdf,
+}
+SUPPORTED_EXTENSIONS = set(LOADERS)
+
+def load_file(name: str, data):
+	"""
+	Parses one uploaded file into documents from its in-memory contents. Runs inside the
+	ingestion worker pool, so it only depends on the parsers.
+
+	Args:
+		name: Original file name, used to pick the loader and as the documents' source
+		data: Raw file contents as bytes or a memoryview
+
+	Returns:
+		list: Documents with metadata["source"] set to the file name
+	"""
+	loader = LOADERS[file_extension(name)]
+	if isinstance(loader, type):
+		# Path-based langchain loader classes registered in LOADERS
+		documents = load_from_temp_path(name, data, loader)
+	else:
+		documents = loader(name, data)
+	logger.info(f"Loaded {len(documents)} documents from {name}")
+	return documents
@@ -0,0 +1,223 @@
+import os
+import queue
+import multiprocessing
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from src.config import INGEST_WORKERS, INGEST_PAGE_WINDOW
+from src.database.store_registry import VECTOR_STORE_REGISTRY
+from src.database.embedding_cache import CachedEmbeddings
+from src.database.vector_db import SourceIndexer, active_collection_path, content_hash, count_indexed_chunks, split_documents
+from src.ingestion.loaders import SUPPORTED_EXTENSIONS, count_pdf_pages, file_extension, load_file, load_pdf_pages
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+_STOP = object()
+FINAL_STAGES = {"indexed", "skipped", "failed"}
+
+def _writer_loop(vectorstore, write_queue: queue.Queue, events: queue.Queue):
+	"""
+	Single vectorstore writer: Chroma writes are serialized here while parsing and
+	chunking of the next windows carry on in the other stages. Each window is written as
+	it arrives; a file's SourceIndexer is finished once its last window is in.
+	"""
+	indexers, failed = {}, set()
+	while True:
+		item = write_queue.get()
+		if item is _STOP:
+			return
+		name = item["file"]
+		if name in failed:
+			continue
+		if item["action"] == "fail":
+			# Parsing or chunking failed upstream; the partial writes stay tagged as incomplete
+			failed.add(name)
+			indexers.pop(name, None)
+			events.put({"file": name, "stage": "failed", "error": item["error"]})
+			continue
+		try:
+			indexer = indexers.get(name)
+			if indexer is None:
+				indexer = indexers[name] = SourceIndexer(vectorstore, name, item["file_hash"], streaming=item["streaming"])
+			if item["action"] == "write":
+				indexer.add(item["chunks"], item["vectors"])
+				if item["total_pages"]:
+					events.put({"file": name, "stage": "written", "window": item["window"], "pages_done": item["pages_done"], "total_pages": item["total_pages"]})
+			else:
+				events.put({"file": name, "stage": "indexed", "stats": indexers.pop(name).finish()})
+		except Exception as e:
+			logger.error(f"Failed to index {name}: {e}")
+			failed.add(name)
+			indexers.pop(name, None)
+			events.put({"file": name, "stage": "failed", "error": str(e)})
+
+def _make_executor(workers: int):
+	if workers > 0:
+		# Spawned, not forked: this process runs threads (Streamlit, the writer, torch/ONNX pools, the job
+		# worker) whose locks a forked child could inherit in a held state and deadlock on
+		return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+	return ThreadPoolExecutor(max_workers=1)
+
+def _plan_windows(name: str, data, spool_dir: str, page_window: int, path: str = None) -> tuple:
+	"""
+	Returns (loader calls covering the file as (first page, loader, args), total pages or None).
+	PDFs are read in windows of page_window pages; a multi-window PDF bound for worker processes
+	is read from path, or spooled to disk once, so each window ships a path instead of the whole file.
+	"""
+	if file_extension(name) != "pdf":
+		return [(0, load_file, (name, data))], None
+	total_pages = count_pdf_pages(data)
+	if total_pages == 0:
+		return [(0, load_file, (name, data))], None
+	source = data
+	if spool_dir is not None and total_pages > page_window:
+		source = path
+		if source is None:
+			source = os.path.join(spool_dir, content_hash(name) + ".pdf")
+			with open(source, "wb") as f:
+				f.write(data)
+	windows = [(start, load_pdf_pages, (name, source, start, min(start + page_window, total_pages), total_pages)) for start in range(0, total_pages, page_window)]
+	return windows, total_pages
+
+def ingest_files(uploaded_files: list, chunk_size: int, chunk_overlap: int, workers: int = INGEST_WORKERS, page_window: int = INGEST_PAGE_WINDOW, skip_windows: dict = None):
+	"""
+	Ingests uploaded files through a staged, streaming pipeline:
+		(a) A worker pool loads and parses files in parallel, PDFs in windows of page_window pages
+		(b) A batching stage chunks each window and embeds its chunks in one batch
+		(c) A single writer thread adds each window's chunks to the vectorstore as it finishes
+	At most two windows per worker are parsed ahead and two wait for the writer, so peak memory
+	depends on the window size rather than on the size of the documents.
+
+	Args:
+		uploaded_files (list): Objects with .name, .getvalue() and .getbuffer(), e.g. Streamlit UploadedFile
+		workers (int): Parser processes, see INGEST_WORKERS
+		page_window (int): PDF pages per window, see INGEST_PAGE_WINDOW
+		skip_windows (dict): File name -> first pages of windows already written by an interrupted
+			run (see src/ingestion/jobs.py); those windows are not read again
+
+	Yields:
+		dict: Progress events with "file", "stage", "completed" and "total" keys; PDF window events
+		also carry "pages_done" and "total_pages", and "written" events the window's first page.
+		The last event has stage "done" and the total new/skipped/replaced/removed chunk counts under "stats".
+	"""
+	skip_windows = skip_windows or {}
+	total = len(uploaded_files)
+	totals = {"new": 0, "skipped": 0, "replaced": 0, "removed": 0}
+	completed = 0
+
+	def progress(event: dict) -> dict:
+		nonlocal completed
+		if event["stage"] in FINAL_STAGES:
+			completed += 1
+			for key, value in event.get("stats", {}).items():
+				totals[key] += value
+		return dict(event, completed=completed, total=total)
+
+	vectorstore = VECTOR_STORE_REGISTRY.get_vectorstore(active_collection_path(chunk_size, chunk_overlap))
+	embeddings = VECTOR_STORE_REGISTRY.get_embeddings()
+	events = queue.Queue()
+	write_queue = queue.Queue(maxsize=2)  # Backpressure: chunking waits when the writer falls behind
+	writer = threading.Thread(target=_writer_loop, args=(vectorstore, write_queue, events), name="ingestion-writer", daemon=True)
+	writer.start()
+	spool = tempfile.TemporaryDirectory(prefix="studybuddy_ingest_") if workers > 0 else None
+
+	def drain():
+		while True:
+			try:
+				yield progress(events.get_nowait())
+			except queue.Empty:
+				return
+
+	try:
+		files, tasks = {}, []
+		for uploaded_file in uploaded_files:
+			name = uploaded_file.name
+			if file_extension(name) not in SUPPORTED_EXTENSIONS:
+				yield progress({"file": name, "stage": "skipped", "reason": "unsupported file type"})
+				continue
+
+			# Threads can share the upload's buffer without a copy; worker processes need picklable bytes
+			data = uploaded_file.getvalue() if workers > 0 else uploaded_file.getbuffer()
+			file_hash = content_hash(data)
+			indexed_chunks = count_indexed_chunks(name, file_hash)
+			if indexed_chunks:
+				logger.info(f"{name} already indexed, skipping")
+				yield progress({"file": name, "stage": "skipped", "reason": "already indexed", "stats": {"skipped": indexed_chunks}})
+				continue
+
+			try:
+				windows, total_pages = _plan_windows(name, data, spool.name if spool else None, page_window, getattr(uploaded_file, "path", None))
+			except Exception as e:
+				logger.error(f"Failed to open {name}: {e}")
+				yield progress({"file": name, "stage": "failed", "error": str(e)})
+				continue
+			done_windows = set(skip_windows.get(name, ())) if len(windows) > 1 else set()
+			remaining = [window for window in windows if window[0] not in done_windows]
+			pages_done = sum(min(start + page_window, total_pages) - start for start in done_windows) if total_pages else 0
+			files[name] = {"file_hash": file_hash, "remaining": len(remaining), "streaming": len(windows) > 1, "total_pages": total_pages, "pages_done": pages_done, "failed": False}
+			tasks.extend((name, start, loader, args) for start, loader, args in remaining)
+			yield progress({"file": name, "stage": "queued", "total_pages": total_pages, "pages_done": pages_done})
+			if not remaining:
+				# Every window was written before the interruption; only the finishing step is left
+				write_queue.put({"action": "finish", "file": name, "file_hash": file_hash, "streaming": True})
+
+		pending, max_in_flight = iter(tasks), 2 * max(1, workers)
+		with _make_executor(workers) as executor:
+			futures = {}
+
+			def submit_more():
+				while len(futures) < max_in_flight:
+					for name, start, loader, args in pending:
+						if not files[name]["failed"]:
+							futures[executor.submit(loader, *args)] = (name, start)
+							break
+					else:
+						return
+
+			submit_more()
+			while futures:
+				done, _ = wait(futures, return_when=FIRST_COMPLETED)
+				for future in done:
+					name, start = futures.pop(future)
+					state = files[name]
+					if state["failed"]:
+						continue
+					try:
+						documents = future.result()
+						chunks, vectors = split_documents(documents, chunk_size, chunk_overlap)
+						if vectors is None and isinstance(embeddings, CachedEmbeddings):
+							# Embed the whole window in one batch here; the writer's Chroma add then hits the cache
+							embeddings.embed_documents([chunk.page_content for chunk in chunks])
+					except Exception as e:
+						logger.error(f"Failed to process {name}: {e}")
+						state["failed"] = True
+						write_queue.put({"action": "fail", "file": name, "error": str(e)})
+						yield from drain()
+						continue
+
+					state["remaining"] -= 1
+					if state["total_pages"]:
+						state["pages_done"] += len(documents)
+					yield progress({"file": name, "stage": "chunked", "chunks": len(chunks), "pages_done": state["pages_done"], "total_pages": state["total_pages"]})
+					window = {"file": name, "file_hash": state["file_hash"], "streaming": state["streaming"]}
+					write_queue.put(dict(window, action="write", window=start, chunks=chunks, vectors=vectors, pages_done=state["pages_done"], total_pages=state["total_pages"]))
+					if state["remaining"] == 0:
+						write_queue.put(dict(window, action="finish"))
+					del documents, chunks, vectors
+					yield from drain()
+				submit_more()
+	finally:
+		write_queue.put(_STOP)
+		if spool is not None:
+			spool.cleanup()
+
+	while writer.is_alive():
+		try:
+			yield progress(events.get(timeout=0.1))
+		except queue.Empty:
+			pass
+	yield from drain()
+
+	logger.info(f"Ingestion complete: {totals}")
+	yield {"stage": "done", "stats": totals, "completed": completed, "total": total}
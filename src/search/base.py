@@ -0,0 +1,13 @@
+from abc import ABC, abstractmethod
+
+class SearchBackend(ABC):
+	"""
+	Interface for web search providers used by the websearch node.
+
+	search() returns a list of result dicts with "url", "title" and "content" keys, best first.
+	"""
+	name = "base"
+
+	@abstractmethod
+	def search(self, query: str, k: int) -> list:
+		raise NotImplementedError
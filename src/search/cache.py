@@ -0,0 +1,72 @@
+import re
+import json
+import time
+import sqlite3
+import threading
+from src.search.base import SearchBackend
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+def normalize_query(query: str) -> str:
+	"""
+	Lowercases, collapses whitespace and drops trailing punctuation so trivially different
+	phrasings of the same query share a cache entry
+	"""
+	return re.sub(r"\s+", " ", query.lower()).strip().rstrip("?!. ")
+
+class SearchResultCache:
+	"""
+	Persistent SQLite cache of search results keyed by (backend, normalized query, k) with a TTL
+	"""
+	def __init__(self, path: str, ttl_seconds: int):
+		self.ttl_seconds = ttl_seconds
+		self.hits, self.misses = 0, 0
+		self._lock = threading.Lock()
+		self._connection = sqlite3.connect(path, check_same_thread=False)
+		self._connection.execute(
+			"CREATE TABLE IF NOT EXISTS search_results ("
+			"backend TEXT, query TEXT, k INTEGER, results TEXT, created_at REAL, "
+			"PRIMARY KEY (backend, query, k))"
+		)
+		self._connection.commit()
+
+	def get(self, backend: str, query: str, k: int):
+		with self._lock:
+			row = self._connection.execute(
+				"SELECT results, created_at FROM search_results WHERE backend = ? AND query = ? AND k = ?",
+				(backend, normalize_query(query), k),
+			).fetchone()
+			if row is None or time.time() - row[1] >= self.ttl_seconds:
+				self.misses += 1
+				return None
+			self.hits += 1
+			return json.loads(row[0])
+
+	def put(self, backend: str, query: str, k: int, results: list):
+		with self._lock:
+			self._connection.execute(
+				"INSERT OR REPLACE INTO search_results VALUES (?, ?, ?, ?, ?)",
+				(backend, normalize_query(query), k, json.dumps(results), time.time()),
+			)
+			self._connection.execute("DELETE FROM search_results WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+			self._connection.commit()
+
+class CachedSearchBackend(SearchBackend):
+	"""
+	Wraps a backend so repeated queries within the TTL are served from the cache
+	"""
+	def __init__(self, backend: SearchBackend, cache: SearchResultCache):
+		self.backend = backend
+		self.cache = cache
+		self.name = backend.name
+
+	def search(self, query: str, k: int) -> list:
+		results = self.cache.get(self.backend.name, query, k)
+		if results is not None:
+			logger.info(f"Search cache hit for: {query}")
+			return results
+		results = self.backend.search(query, k)
+		if results:
+			self.cache.put(self.backend.name, query, k, results)
+		return results
@@ -0,0 +1,35 @@
+import threading
+from src.config import SEARCH_BACKEND, LOCAL_SEARCH_CORPUS, SEARCH_CACHE_PATH, SEARCH_CACHE_TTL_SECONDS, TAVILY_API_KEY
+from src.search.cache import CachedSearchBackend, SearchResultCache
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+_lock = threading.Lock()
+_backend = None
+
+def create_search_backend(name: str):
+	"""
+	Builds the uncached search backend registered under name
+	"""
+	if name == "tavily":
+		if not TAVILY_API_KEY:
+			raise ValueError("TAVILY_API_KEY not found in environment variables.")
+		from src.search.tavily_backend import TavilySearchBackend
+		return TavilySearchBackend(TAVILY_API_KEY)
+	if name == "local":
+		from src.search.local_backend import LocalSearchBackend
+		return LocalSearchBackend(LOCAL_SEARCH_CORPUS)
+	raise ValueError(f"Unknown search backend: {name!r}")
+
+def get_search_backend():
+	"""
+	Returns the process-wide search backend selected by SEARCH_BACKEND, wrapped in the result cache
+	"""
+	global _backend
+	with _lock:
+		if _backend is None:
+			backend = create_search_backend(SEARCH_BACKEND)
+			_backend = CachedSearchBackend(backend, SearchResultCache(SEARCH_CACHE_PATH, SEARCH_CACHE_TTL_SECONDS)) if SEARCH_CACHE_TTL_SECONDS > 0 else backend
+			logger.info(f"Using {SEARCH_BACKEND} search backend")
+		return _backend
@@ -0,0 +1,38 @@
+import re
+import json
+import math
+from collections import Counter
+from src.search.base import SearchBackend
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+def _tokenize(text: str) -> list:
+	return re.findall(r"[a-z0-9]+", text.lower())
+
+class LocalSearchBackend(SearchBackend):
+	"""
+	Offline stand-in for web search that serves a fixture corpus from a JSON file, so the graph
+	can be benchmarked and tested without network access. Results are ranked by TF-IDF overlap.
+
+	The corpus is a JSON list of {"url", "title", "content"} objects.
+	"""
+	name = "local"
+
+	def __init__(self, corpus_path: str):
+		with open(corpus_path, "r", encoding="utf-8") as f:
+			self.corpus = json.load(f)
+		self._term_counts = [Counter(_tokenize(f"{entry.get('title', '')} {entry['content']}")) for entry in self.corpus]
+		document_frequency = Counter(term for counts in self._term_counts for term in counts)
+		self._idf = {term: math.log(1 + len(self.corpus) / frequency) for term, frequency in document_frequency.items()}
+		logger.info(f"Loaded {len(self.corpus)} local search documents from {corpus_path}")
+
+	def search(self, query: str, k: int) -> list:
+		terms = set(_tokenize(query))
+		scored = []
+		for entry, counts in zip(self.corpus, self._term_counts):
+			score = sum((1 + math.log(counts[term])) * self._idf[term] for term in terms if counts[term])
+			if score > 0:
+				scored.append((score, entry))
+		scored.sort(key=lambda item: item[0], reverse=True)
+		return [{"url": entry.get("url", ""), "title": entry.get("title", ""), "content": entry["content"]} for _, entry in scored[:k]]
@@ -0,0 +1,28 @@
+from langchain_community.tools.tavily_search import TavilySearchResults
+from src.search.base import SearchBackend
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+class TavilySearchBackend(SearchBackend):
+	"""
+	Tavily web search, reusing one client per result count
+	"""
+	name = "tavily"
+
+	def __init__(self, api_key: str):
+		self.api_key = api_key
+		self._clients = {}
+
+	def _client(self, k: int):
+		if k not in self._clients:
+			self._clients[k] = TavilySearchResults(max_results=k, tavily_api_key=self.api_key)
+		return self._clients[k]
+
+	def search(self, query: str, k: int) -> list:
+		results = self._client(k).invoke({"query": query})
+		if isinstance(results, str):
+			# The tool reports API errors as a string instead of raising
+			logger.error(f"Tavily search failed: {results}")
+			return []
+		return [{"url": result.get("url", ""), "title": result.get("title", ""), "content": result.get("content", "")} for result in results]
@@ -0,0 +1,48 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+class QueueFull(RuntimeError):
+	"""
+	Raised when a request cannot be admitted; the API answers it with 503 and Retry-After
+	"""
+
+class AdmissionQueue:
+	"""
+	Admits at most max_running graph runs at once and lets up to max_queued more wait, each for
+	at most timeout seconds. Anything beyond that is rejected immediately instead of piling up
+	behind a model that is already saturated.
+	"""
+	def __init__(self, max_running: int, max_queued: int, timeout: float):
+		self.max_running = max_running
+		self.max_queued = max_queued
+		self.timeout = timeout
+		self.queued, self.running, self.rejected = 0, 0, 0
+		self._semaphore = asyncio.Semaphore(max_running)
+
+	@asynccontextmanager
+	async def slot(self):
+		if not self._semaphore.locked():
+			# A free slot is taken without suspending, so it never counts as queued
+			await self._semaphore.acquire()
+		elif self.queued >= self.max_queued:
+			self.rejected += 1
+			raise QueueFull(f"{self.queued} requests already queued")
+		else:
+			self.queued += 1
+			try:
+				await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+			except asyncio.TimeoutError:
+				self.rejected += 1
+				raise QueueFull(f"No run slot freed up within {self.timeout:g}s")
+			finally:
+				self.queued -= 1
+
+		self.running += 1
+		try:
+			yield
+		finally:
+			self.running -= 1
+			self._semaphore.release()
+
+	def stats(self) -> dict:
+		return {"running": self.running, "queued": self.queued, "rejected": self.rejected, "max_running": self.max_running, "max_queued": self.max_queued}
@@ -0,0 +1,287 @@
+"""
+Async HTTP API serving the RAG agent to many clients at once.
+
+	python -m src.server.api --port 8000
+
+	POST   /sessions             -> {"session_id": ...}
+	GET    /sessions/<id>        -> conversation history
+	DELETE /sessions/<id>
+	POST   /chat                 {"message": ..., "session_id": ..., "rag": true, "max_search_queries": 5}
+	                             -> NDJSON stream of reasoning/answer tokens, then a "final" event
+	POST   /ingest               multipart "files" (+ chunk_size, chunk_overlap) -> NDJSON progress
+	GET    /health, GET /metrics
+
+Graph runs go through RAG_AGENT.astream, so the async node variants run on the event loop and
+blocking work (Chroma, web search) runs in worker threads. Runs are admitted through an
+AdmissionQueue (503 once it is full) and every chat model call goes through the LLM GATEWAY.
+"""
+import io
+import json
+import asyncio
+import argparse
+import tornado.web
+from tornado.iostream import StreamClosedError
+from src.config import (
+	API_MAX_CONCURRENT_RUNS, API_MAX_QUEUED, API_QUEUE_TIMEOUT_SECONDS,
+	SESSION_TTL_SECONDS, SESSION_MAX,
+)
+from src.server.admission import AdmissionQueue, QueueFull
+from src.server.sessions import SessionStore
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP = 1000, 200
+
+class BaseHandler(tornado.web.RequestHandler):
+	@property
+	def sessions(self) -> SessionStore:
+		return self.application.settings["sessions"]
+
+	@property
+	def admission(self) -> AdmissionQueue:
+		return self.application.settings["admission"]
+
+	def json_body(self) -> dict:
+		try:
+			body = json.loads(self.request.body or b"{}")
+		except ValueError:
+			raise tornado.web.HTTPError(400, reason="Request body must be JSON")
+		if not isinstance(body, dict):
+			raise tornado.web.HTTPError(400, reason="Request body must be a JSON object")
+		return body
+
+	def write_error(self, status_code, **kwargs):
+		self.finish({"error": self._reason})
+
+	def start_stream(self):
+		self.set_header("Content-Type", "application/x-ndjson")
+		self.set_header("Cache-Control", "no-cache")
+
+	async def send_event(self, event: dict):
+		"""
+		Writes one NDJSON line and flushes it; raises StreamClosedError once the client is gone
+		"""
+		self.write(json.dumps(event) + "\n")
+		await self.flush()
+
+	def reject(self, error: QueueFull):
+		self.set_status(503)
+		self.set_header("Retry-After", str(max(1, int(self.admission.timeout))))
+		self.finish({"error": str(error)})
+
+class HealthHandler(BaseHandler):
+	def get(self):
+		from src.agent.llm import GATEWAY
+
+		self.finish({"status": "ok", "admission": self.admission.stats(), "llm": GATEWAY.stats(), "sessions": len(self.sessions)})
+
+class MetricsHandler(BaseHandler):
+	def get(self):
+		from src.agent.metrics import METRICS
+
+		self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+		self.finish(METRICS.render())
+
+class SessionsHandler(BaseHandler):
+	def post(self):
+		self.finish({"session_id": self.sessions.create().session_id})
+
+class SessionHandler(BaseHandler):
+	def get(self, session_id):
+		session = self.sessions.get(session_id)
+		if session is None:
+			raise tornado.web.HTTPError(404, reason="Unknown session")
+		self.finish({"session_id": session_id, "messages": session.messages})
+
+	def delete(self, session_id):
+		if not self.sessions.delete(session_id):
+			raise tornado.web.HTTPError(404, reason="Unknown session")
+		self.set_status(204)
+		self.finish()
+
+class ChatHandler(BaseHandler):
+	async def post(self):
+		body = self.json_body()
+		message = body.get("message")
+		if not isinstance(message, str) or not message.strip():
+			raise tornado.web.HTTPError(400, reason="'message' is required")
+		session = self.sessions.get_or_create(body.get("session_id"))
+
+		async with session.lock:
+			streaming = False
+			try:
+				async with self.admission.slot():
+					self.start_stream()
+					streaming = True
+					await self.send_event({"type": "session", "session_id": session.session_id})
+					if body.get("rag", True):
+						answer = await self._run_rag(message, int(body.get("max_search_queries", 5)), session)
+					else:
+						answer = await self._run_direct(message, session)
+			except QueueFull as e:
+				logger.info(f"Rejected chat request: {e}")
+				self.reject(e)
+				return
+			except StreamClosedError:
+				logger.info(f"Client of session {session.session_id} disconnected mid-answer")
+				return
+			except Exception as e:
+				logger.error(f"Exception in chat request: {e}")
+				if not streaming:
+					self.send_error(500, reason="Internal server error")
+					return
+				# The stream has started, so the failure is reported in-stream
+				try:
+					await self.send_event({"type": "error", "error": str(e)})
+					self.finish()
+				except StreamClosedError:
+					logger.info(f"Client of session {session.session_id} disconnected before the error was reported")
+				return
+
+		session.add_turn(message, answer)
+		self.finish()
+
+	async def _stream_parts(self, splitter, token: str):
+		for part, text in splitter.feed(token):
+			await self.send_event({"type": part, "text": text})
+
+	async def _run_rag(self, question: str, max_search_queries: int, session) -> str:
+		from src.config import RAG_USE_HISTORY
+		from src.agent.answer_cache import ANSWER_CACHE
+		from src.agent.history import ConversationHistory
+		from src.agent.instrumentation import RunTrace
+		from src.database.store_registry import VECTOR_STORE_REGISTRY
+		from src.database.vector_db import collection_fingerprint
+		from src.utils import ThinkStreamSplitter, astream_rag_agent, extract_response_components
+
+		inputs = {"question": question, "max_search_queries": max_search_queries}
+		if RAG_USE_HISTORY:
+			inputs["history"] = ConversationHistory.as_text(await session.history.acontext_messages(session.messages))
+		# Answers that depend on earlier turns are neither served from nor stored in the cache
+		use_cache = not inputs.get("history")
+
+		question_vector = await asyncio.to_thread(VECTOR_STORE_REGISTRY.get_embeddings().embed_query, question)
+		fingerprint = await asyncio.to_thread(collection_fingerprint)
+		cached = ANSWER_CACHE.lookup(question_vector, fingerprint) if use_cache else None
+		if cached is not None:
+			await self.send_event({"type": "final", "answer": cached["answer"], "reasoning": cached["reasoning"], "cached": True, "run_summary": None})
+			return cached["answer"]
+
+		trace, splitter, final_generation = RunTrace(question), ThinkStreamSplitter(), None
+		stream = astream_rag_agent(inputs, trace)
+		try:
+			async for kind, payload in stream:
+				if kind == "attempt":
+					splitter = ThinkStreamSplitter()
+					await self.send_event({"type": "attempt"})
+				elif kind == "token":
+					await self._stream_parts(splitter, payload)
+				else:
+					final_generation = payload
+		finally:
+			await stream.aclose()
+			run_summary = trace.finish()
+
+		if final_generation is None:
+			think_block, final_answer = "", "Agent couldn't find an answer."
+		else:
+			think_block, final_answer = extract_response_components(final_generation)
+			if use_cache:
+				ANSWER_CACHE.store(question, question_vector, fingerprint, final_answer, think_block, run_summary["wall_time"])
+		await self.send_event({"type": "final", "answer": final_answer, "reasoning": think_block, "cached": False, "run_summary": run_summary})
+		return final_answer
+
+	async def _run_direct(self, message: str, session) -> str:
+		from src.agent.llm import get_chat_model
+		from src.utils import ThinkStreamSplitter, build_ollama_messages, extract_response_components
+
+		splitter, collected = ThinkStreamSplitter(), []
+		history = await session.history.acontext_messages(session.messages)
+		async for chunk in get_chat_model(streaming=True).astream(build_ollama_messages(message, history)):
+			collected.append(chunk.content)
+			await self._stream_parts(splitter, chunk.content)
+		for part, text in splitter.flush():
+			await self.send_event({"type": part, "text": text})
+
+		think_block, final_answer = extract_response_components("".join(collected))
+		await self.send_event({"type": "final", "answer": final_answer, "reasoning": think_block, "cached": False, "run_summary": None})
+		return final_answer
+
+class IngestHandler(BaseHandler):
+	async def post(self):
+		from src.ingestion.pipeline import ingest_files
+
+		uploads = []
+		for upload in self.request.files.get("files", []):
+			data = io.BytesIO(upload["body"])
+			data.name = upload["filename"]
+			uploads.append(data)
+		if not uploads:
+			raise tornado.web.HTTPError(400, reason="Upload at least one file in the 'files' field")
+		chunk_size = int(self.get_body_argument("chunk_size", DEFAULT_CHUNK_SIZE))
+		chunk_overlap = int(self.get_body_argument("chunk_overlap", DEFAULT_CHUNK_OVERLAP))
+
+		# One ingestion at a time: the pipeline already parallelizes parsing and has a single writer
+		async with self.application.settings["ingest_lock"]:
+			loop, events = asyncio.get_running_loop(), asyncio.Queue()
+
+			def run_pipeline():
+				try:
+					for event in ingest_files(uploads, chunk_size, chunk_overlap):
+						loop.call_soon_threadsafe(events.put_nowait, event)
+				except Exception as e:
+					logger.error(f"Ingestion failed: {e}")
+					loop.call_soon_threadsafe(events.put_nowait, {"stage": "done", "error": str(e), "stats": None})
+
+			self.start_stream()
+			worker = loop.run_in_executor(None, run_pipeline)
+			client_connected = True
+			while True:
+				event = await events.get()
+				if client_connected:
+					try:
+						await self.send_event(event)
+					except StreamClosedError:
+						# Keep draining: the files are still indexed even if nobody is watching
+						client_connected = False
+				if event["stage"] == "done":
+					break
+			await worker
+		if client_connected:
+			self.finish()
+
+def make_app(**settings) -> tornado.web.Application:
+	return tornado.web.Application([
+		(r"/health", HealthHandler),
+		(r"/metrics", MetricsHandler),
+		(r"/sessions", SessionsHandler),
+		(r"/sessions/([0-9a-f]+)", SessionHandler),
+		(r"/chat", ChatHandler),
+		(r"/ingest", IngestHandler),
+	],
+		sessions=settings.pop("sessions", None) or SessionStore(SESSION_TTL_SECONDS, SESSION_MAX),
+		admission=settings.pop("admission", None) or AdmissionQueue(API_MAX_CONCURRENT_RUNS, API_MAX_QUEUED, API_QUEUE_TIMEOUT_SECONDS),
+		ingest_lock=asyncio.Lock(),
+		**settings,
+	)
+
+async def serve(host: str, port: int):
+	# Compile the graph and load its models before accepting traffic
+	from src.agent.workflow import get_rag_agent
+	get_rag_agent()
+
+	app = make_app()
+	app.listen(port, address=host)
+	logger.info(f"StudyBuddy API listening on http://{host}:{port}")
+	await asyncio.Event().wait()
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Serve the StudyBuddy RAG agent over HTTP")
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=8000)
+	args = parser.parse_args(argv)
+	asyncio.run(serve(args.host, args.port))
+
+if __name__ == "__main__":
+	main()
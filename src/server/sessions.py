@@ -0,0 +1,80 @@
+import time
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict
+from src.agent.history import ConversationHistory
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+class Session:
+	"""
+	Conversation state of one API client. The lock serializes the client's requests so turns
+	are appended in order.
+	"""
+	def __init__(self, session_id: str):
+		self.session_id = session_id
+		self.messages = []
+		self.history = ConversationHistory()
+		self.created_at = time.time()
+		self.last_seen = self.created_at
+		self.lock = asyncio.Lock()
+
+	def add_turn(self, question: str, answer: str):
+		self.messages.append({"role": "user", "content": question})
+		self.messages.append({"role": "assistant", "content": answer})
+
+class SessionStore:
+	"""
+	In-memory sessions keyed by id. Sessions idle for longer than ttl_seconds expire, and the
+	least recently used session is evicted once max_sessions is reached.
+	"""
+	def __init__(self, ttl_seconds: int, max_sessions: int):
+		self.ttl_seconds = ttl_seconds
+		self.max_sessions = max_sessions
+		self._lock = threading.Lock()
+		self._sessions = OrderedDict()
+
+	def _expire(self, now: float):
+		while self._sessions:
+			session = next(iter(self._sessions.values()))
+			if now - session.last_seen <= self.ttl_seconds:
+				return
+			self._sessions.popitem(last=False)
+			logger.info(f"Session {session.session_id} expired")
+
+	def create(self) -> Session:
+		with self._lock:
+			self._expire(time.time())
+			while len(self._sessions) >= self.max_sessions:
+				_, evicted = self._sessions.popitem(last=False)
+				logger.info(f"Session {evicted.session_id} evicted")
+			session = Session(uuid.uuid4().hex)
+			self._sessions[session.session_id] = session
+			return session
+
+	def get(self, session_id: str):
+		"""
+		Returns the live session with this id, or None
+		"""
+		with self._lock:
+			now = time.time()
+			self._expire(now)
+			session = self._sessions.get(session_id)
+			if session is not None:
+				session.last_seen = now
+				self._sessions.move_to_end(session_id)
+			return session
+
+	def get_or_create(self, session_id: str = None) -> Session:
+		session = self.get(session_id) if session_id else None
+		return session if session is not None else self.create()
+
+	def delete(self, session_id: str) -> bool:
+		with self._lock:
+			return self._sessions.pop(session_id, None) is not None
+
+	def __len__(self):
+		with self._lock:
+			return len(self._sessions)
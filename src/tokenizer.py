@@ -0,0 +1,59 @@
+import re
+from functools import lru_cache
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+# GPT-2's pre-tokenization pattern, as used by tiktoken's gpt2 encoding
+GPT2_PATTERN = re.compile(r"""'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d+| ?[^\s\w]+|\s+(?!\S)|\s+""")
+# Longest piece counted as one token, so long words, numbers or encoded blobs are not undercounted
+MAX_PIECE_CHARS = 8
+
+class RegexEncoding:
+	"""
+	Offline stand-in for a tiktoken encoding, used when tiktoken cannot load its BPE files.
+
+	Text is split with GPT-2's pre-tokenization pattern and every piece of up to MAX_PIECE_CHARS
+	characters is one token, without the BPE merges. Counts are close to tiktoken's for prose, so
+	token budgets and chunk sizes keep working, but they are not exact.
+
+	Tokens are the text pieces themselves rather than ids, so no vocabulary grows with the text
+	seen; callers only count, slice and decode() them, which joins slices back exactly.
+	"""
+	def __init__(self, name: str):
+		self.name = f"{name}-regex"
+
+	def encode_ordinary(self, text: str) -> list:
+		return [
+			match.group()[start:start + MAX_PIECE_CHARS]
+			for match in GPT2_PATTERN.finditer(text)
+			for start in range(0, len(match.group()), MAX_PIECE_CHARS)
+		]
+
+	def encode(self, text: str, disallowed_special=()) -> list:
+		return self.encode_ordinary(text)
+
+	def encode_ordinary_batch(self, texts: list) -> list:
+		return [self.encode_ordinary(text) for text in texts]
+
+	def decode(self, tokens: list) -> str:
+		return "".join(tokens)
+
+@lru_cache(maxsize=None)
+def load_encoding(name: str = "gpt2"):
+	"""
+	Returns the tiktoken encoding called name. tiktoken downloads its BPE files on first use
+	(cached under TIKTOKEN_CACHE_DIR); when that fails, e.g. offline, this falls back to RegexEncoding
+
+	Args:
+		name: tiktoken encoding name
+
+	Returns:
+		Encoding: tiktoken.Encoding, or RegexEncoding with name "<name>-regex"
+	"""
+	try:
+		import tiktoken
+		return tiktoken.get_encoding(name)
+	except Exception as e:
+		logger.error(f"Could not load the {name} tiktoken encoding ({e}); counting tokens with the offline regex tokenizer. Pre-seed TIKTOKEN_CACHE_DIR for exact counts.")
+		return RegexEncoding(name)
@@ -1,65 +1,152 @@
 import re
-import os
-import shutil
+import time
 import types
-from ollama import chat
-from langchain_community.document_loaders import CSVLoader, TextLoader, PDFPlumberLoader
-from src.database.vector_db import add_documents
+from typing import TYPE_CHECKING
+from src.agent.history import ConversationHistory
+from src.config import RAG_USE_HISTORY
 from src.logger import get_logger
-from src.agent.workflow import RAG_AGENT
+
+# The ingestion pipeline, vector store, LLM clients and the compiled graph are imported where they
+# are first used, so the first Streamlit page renders without loading torch, Chroma or LangGraph
+if TYPE_CHECKING:
+	from src.agent.instrumentation import RunTrace
 
 
 logger = get_logger(__name__)
 
-def process_uploaded_files(uploaded_files: list, chunk_size: int, chunk_overlap: int):
+def process_uploaded_files(uploaded_files: list, chunk_size: int, chunk_overlap: int, on_progress=None):
 	"""
 	Processes files uploaded by user and add it to vectorstore
-	"""
-	temp_folder = "temp_files"
-	os.makedirs(temp_folder, exist_ok=True)
-	logger.info("Creating temp folders")
-
-	try:
-		for uploaded_file in uploaded_files:
-			file_extension = uploaded_file.name.split(".")[-1].lower()
-			temp_file_path = os.path.join(temp_folder, uploaded_file.name)
-
-			# Save file temporarily
-			with open(temp_file_path, "wb") as f:
-				f.write(uploaded_file.getvalue())
-
-			# Choose the appropriate loader
-			if file_extension == "csv":
-				loader = CSVLoader(temp_file_path)
-			elif file_extension in ["txt", "md"]:
-				loader = TextLoader(temp_file_path)
-			elif file_extension == "pdf":
-				loader = PDFPlumberLoader(temp_file_path)
-			else:
-				continue
 
-			# Load and append documents
-			logger.info("Documents loaded")
-			docs = loader.load()
-			add_documents(docs, chunk_size, chunk_overlap)
+	Args:
+		on_progress (callable): Optional callback receiving each ingestion progress event
+
+	Returns:
+		dict: Total counts of new, skipped and replaced chunks, and of stale chunks removed
+	"""
+	from src.ingestion.pipeline import ingest_files
 
-		return True
-	finally:
-		shutil.rmtree(temp_folder, ignore_errors=True)
-		logger.info("Temp folders dumped")
+	for event in ingest_files(uploaded_files, chunk_size, chunk_overlap):
+		if on_progress is not None:
+			on_progress(event)
+		if event["stage"] == "done":
+			return event["stats"]
 
-def invoke_ollama(user_prompt, model="deepseek-r1:1.5b", history=None):
+def build_ollama_messages(user_prompt, history=None):
 	messages = [{"role": "system", "content": "You are a helpful study assistant that answers clearly and concisely."}]
 	if history:
-		messages.extend(history)
+		messages.extend({"role": message["role"], "content": message["content"]} for message in history)
 	messages.append({"role": "user", "content": user_prompt})
+	return messages
+
+def invoke_ollama(user_prompt, model="deepseek-r1:1.5b", history=None):
+	from src.agent.llm import get_chat_model
+
+	return get_chat_model(model=model).invoke(build_ollama_messages(user_prompt, history)).content
+
+def stream_ollama(user_prompt, model="deepseek-r1:1.5b", history=None):
+	"""
+	Yields the response text of a direct LLM call token by token, through the shared LLM gateway
+	"""
+	from src.agent.llm import get_chat_model
+
+	for chunk in get_chat_model(streaming=True, model=model).stream(build_ollama_messages(user_prompt, history)):
+		yield chunk.content
+
+class _RagStreamFilter:
+	"""
+	Maps RAG_AGENT "messages"/"updates" stream items to stream_rag_agent events
+	"""
+	def __init__(self):
+		self.current_step = None
+		self.final_generation = None
+
+	def events(self, mode: str, payload) -> list:
+		if mode == "messages":
+			chunk, metadata = payload
+			if metadata.get("langgraph_node") != "generate_response" or not chunk.content:
+				return []
+			events = []
+			if metadata.get("langgraph_step") != self.current_step:
+				self.current_step = metadata.get("langgraph_step")
+				events.append(("attempt", None))
+			events.append(("token", chunk.content))
+			return events
+
+		for value in payload.values():
+			if value and "generation" in value:
+				self.final_generation = value["generation"]
+		return []
+
+def stream_rag_agent(inputs: dict, trace: "RunTrace" = None):
+	"""
+	Runs the RAG workflow, recording node and edge spans into trace if given, and yields (kind, payload) events:
+		("attempt", None) when a new answer generation starts (hallucination retries restart the answer)
+		("token", str) for each answer token
+		("final", str) once with the final generation, or None if no answer was produced
+	"""
+	from src.agent.workflow import get_rag_agent
+
+	config = trace.config() if trace is not None else None
+	stream_filter = _RagStreamFilter()
+	for mode, payload in get_rag_agent().stream(inputs, stream_mode=["messages", "updates"], config=config):
+		yield from stream_filter.events(mode, payload)
+	yield "final", stream_filter.final_generation
+
+async def astream_rag_agent(inputs: dict, trace: "RunTrace" = None):
+	"""
+	Async variant of stream_rag_agent, running the graph's async nodes through RAG_AGENT.astream
+	"""
+	from src.agent.workflow import get_rag_agent
+
+	config = trace.config() if trace is not None else None
+	stream_filter = _RagStreamFilter()
+	async for mode, payload in get_rag_agent().astream(inputs, stream_mode=["messages", "updates"], config=config):
+		for event in stream_filter.events(mode, payload):
+			yield event
+	yield "final", stream_filter.final_generation
 
-	chat_response = chat(
-		model=model, 
-		messages=messages,
-	)
+class ThinkStreamSplitter:
+	"""
+	Incrementally splits streamed text into <think> reasoning and answer parts, holding back
+	any suffix that could be the start of a tag split across tokens
+	"""
+	OPEN_TAG, CLOSE_TAG = "<think>", "</think>"
+
+	def __init__(self):
+		self._buffer = ""
+		self._in_think = False
+
+	def _kind(self):
+		return "reasoning" if self._in_think else "answer"
+
+	def feed(self, text: str) -> list:
+		"""
+		Returns a list of ("reasoning" | "answer", text) parts that are safe to display
+		"""
+		self._buffer += text
+		parts = []
+		while True:
+			tag = self.CLOSE_TAG if self._in_think else self.OPEN_TAG
+			index = self._buffer.find(tag)
+			if index >= 0:
+				if index:
+					parts.append((self._kind(), self._buffer[:index]))
+				self._buffer = self._buffer[index + len(tag):]
+				self._in_think = not self._in_think
+				continue
 
-	return chat_response['message']['content']
+			held = next((size for size in range(min(len(tag) - 1, len(self._buffer)), 0, -1) if tag.startswith(self._buffer[-size:])), 0)
+			ready = self._buffer[:len(self._buffer) - held]
+			if ready:
+				parts.append((self._kind(), ready))
+			self._buffer = self._buffer[len(ready):]
+			return parts
+
+	def flush(self) -> list:
+		parts = [(self._kind(), self._buffer)] if self._buffer else []
+		self._buffer = ""
+		return parts
 
 def extract_response_components(generation: str):
 	"""
@@ -77,48 +164,121 @@ def extract_response_components(generation: str):
 	logger.debug("Extracted think_block and final_answer from generation.")
 	return think_block, final_answer
 
+def _render_rag_stream(inputs: dict, reasoning_placeholder, answer_placeholder, trace: "RunTrace" = None):
+	"""
+	Streams RAG answer tokens into placeholders, which are reset when the graph retries generation
+	"""
+	splitter, reasoning, answer, final_generation = ThinkStreamSplitter(), "", "", None
+	for kind, payload in stream_rag_agent(inputs, trace):
+		if kind == "attempt":
+			splitter, reasoning, answer = ThinkStreamSplitter(), "", ""
+			reasoning_placeholder.markdown("")
+			answer_placeholder.markdown("")
+		elif kind == "token":
+			for part, text in splitter.feed(payload):
+				if part == "reasoning":
+					reasoning += text
+					reasoning_placeholder.markdown(reasoning)
+				else:
+					answer += text
+					answer_placeholder.markdown(answer)
+		else:
+			final_generation = payload
+	return final_generation
+
+def _answer_tokens(token_stream, reasoning_placeholder, collected: list):
+	"""
+	Yields only answer text for st.write_stream while filling the reasoning expander as a side effect
+	"""
+	splitter, reasoning = ThinkStreamSplitter(), ""
+	for token in token_stream:
+		collected.append(token)
+		for part, text in splitter.feed(token):
+			if part == "reasoning":
+				reasoning += text
+				reasoning_placeholder.markdown(reasoning)
+			else:
+				yield text
+	for part, text in splitter.flush():
+		if part == "answer":
+			yield text
+
 def generate_response(user_input: str, st: types.ModuleType):
 	"""
 	Generate a response based on the user input using the agent, with optional web search capability.
+	Tokens are streamed into the current container as they arrive, so call this inside st.chat_message.
 	Args:
 		user_input (str): User prompt
 		st (Module): Streamlit session state 
 	Returns:
-		dict: The generated response and reasoning.
+		dict: The generated response, reasoning and, for RAG runs, the run summary from RunTrace.
 	"""
 	langgraph_status = st.status("**Agent running...**", state="running")  # Sets status to running
+	reasoning_placeholder = st.expander("🧠 See agent's reasoning").empty()
+	answer_placeholder = st.empty()
 	logger.info(f"Received user input: {user_input}")
 	inputs = {"question": user_input, "max_search_queries": st.session_state.max_search_queries}
-	final_generation, think_block = None, None
+	final_generation, think_block, run_summary = None, None, None
+	# The current question is already the last message; only earlier turns are history
+	earlier_turns = st.session_state.messages[:-1]
 
 	if st.session_state.enable_rag:
+		from src.agent.answer_cache import ANSWER_CACHE
+		from src.agent.instrumentation import RunTrace
+		from src.database.store_registry import VECTOR_STORE_REGISTRY
+		from src.database.vector_db import collection_fingerprint
+
 		logger.info("Routing user input to RAG workflow.")
+		trace = RunTrace(user_input)
 		try:
-			for output in RAG_AGENT.stream(inputs):
-				for key, value in output.items():
-					if "generation" in value:
-						final_generation = value["generation"]
+			if RAG_USE_HISTORY:
+				inputs["history"] = ConversationHistory.as_text(st.session_state.history.context_messages(earlier_turns))
+			question_vector = VECTOR_STORE_REGISTRY.get_embeddings().embed_query(user_input)
+			fingerprint = collection_fingerprint()
+			# Answers that depend on earlier turns are neither served from nor stored in the cache
+			use_cache = not inputs.get("history")
+			cached = ANSWER_CACHE.lookup(question_vector, fingerprint) if use_cache else None
+
+			if cached is not None:
+				think_block, final_answer = cached["reasoning"], cached["answer"]
+				langgraph_status.update(state="complete", label="**Answered from cache**")
+			else:
+				started = time.perf_counter()
+				final_generation = _render_rag_stream(inputs, reasoning_placeholder, answer_placeholder, trace)
+				run_summary = trace.finish()
 
-			if final_generation is None:
-				final_generation = "Agent couldn't find an answer."
+				if final_generation is None:
+					final_generation = "Agent couldn't find an answer."
+					think_block, final_answer = extract_response_components(final_generation)
+				else:
+					think_block, final_answer = extract_response_components(final_generation)
+					if use_cache:
+						ANSWER_CACHE.store(user_input, question_vector, fingerprint, final_answer, think_block, time.perf_counter() - started)
 
-			think_block, final_answer = extract_response_components(final_generation)
+				langgraph_status.update(state="complete", label="**Using LangGraph** (Tasks completed)")
 			
-			langgraph_status.update(state="complete", label="**Using LangGraph** (Tasks completed)")
-			logger.info("RAG workflow completed successfully.")
+			logger.info(f"RAG workflow completed successfully. Answer cache: {ANSWER_CACHE.stats()}")
 
 		except Exception as e:
 			final_answer = f"An error occurred: {str(e)}"
 			think_block = ""
 			langgraph_status.update(state="error", label="Something went wrong.")
 			logger.error(f"Exception in RAG workflow: {e}")
+			run_summary = trace.finish()
 	else:
 		logger.info("Routing user input to direct LLM generation.")
-		final_generation = invoke_ollama(user_input, history=st.session_state.messages)
+		collected = []
+		with answer_placeholder.container():
+			history = st.session_state.history.context_messages(earlier_turns)
+			st.write_stream(_answer_tokens(stream_ollama(user_input, history=history), reasoning_placeholder, collected))
+		final_generation = "".join(collected)
 		think_block, final_answer = extract_response_components(final_generation)
+		langgraph_status.update(state="complete", label="**Using Deepseek R1 model**")
 		logger.info("Direct LLM generation completed.")
 	
+	# Replace the streamed draft with the cleaned final answer
+	reasoning_placeholder.markdown(think_block)
+	answer_placeholder.markdown(final_answer)
 	logger.debug("Generated response and parsing to frontend.")
-	langgraph_status.update(state="complete", label="**Using Deepseek R1 model**")
 	print("Output retrieved, parsing to frontend")
-	return {"final_answer": final_answer, "reasoning": think_block}
\ No newline at end of file
+	return {"final_answer": final_answer, "reasoning": think_block, "run_summary": run_summary}
\ No newline at end of file
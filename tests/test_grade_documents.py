@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import asyncio
+import threading
+
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("SEARCH_BACKEND", "local")
+
+import pytest
+from typing import Any
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from src.agent.nodes import grade_documents
+
+class CallRecorder:
+	"""
+	Counts the model calls in flight and remembers the peak
+	"""
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.calls, self.in_flight, self.peak = 0, 0, 0
+
+	def enter(self):
+		with self._lock:
+			self.calls += 1
+			self.in_flight += 1
+			self.peak = max(self.peak, self.in_flight)
+
+	def exit(self):
+		with self._lock:
+			self.in_flight -= 1
+
+class InFlightChatModel(BaseChatModel):
+	"""
+	Fake grader model: a document is relevant when it mentions "relevant". Each call holds its
+	slot for `latency` seconds so concurrent calls overlap. batch_scores overrides the reply to
+	the single-prompt grader.
+	"""
+	recorder: Any
+	latency: float = 0.02
+	batch_scores: Any = None
+
+	@property
+	def _llm_type(self) -> str:
+		return "in_flight_fake"
+
+	def _reply(self, prompt: str) -> str:
+		if "relevance of several retrieved documents" in prompt:
+			if self.batch_scores is not None:
+				return json.dumps({"scores": self.batch_scores})
+			documents = prompt.split("Here are the retrieved documents:", 1)[1].split("Here is the user question:", 1)[0]
+			return json.dumps({"scores": ["yes" if "relevant" in document else "no" for document in documents.split("Document ")[1:]]})
+		document = prompt.split("Here is the retrieved document:", 1)[1].split("Here is the user question:", 1)[0]
+		return json.dumps({"score": "yes" if "relevant" in document else "no"})
+
+	def _result(self, messages) -> ChatResult:
+		return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages[-1].content)))])
+
+	def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+		self.recorder.enter()
+		try:
+			time.sleep(self.latency)
+			return self._result(messages)
+		finally:
+			self.recorder.exit()
+
+	async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+		self.recorder.enter()
+		try:
+			await asyncio.sleep(self.latency)
+			return self._result(messages)
+		finally:
+			self.recorder.exit()
+
+DOCUMENTS = [Document(page_content=text, metadata={"source": f"doc{index}"}) for index, text in enumerate([
+	"A mutex is relevant here.",
+	"Unrelated notes on poetry.",
+	"Another relevant passage on locks.",
+	"Cooking recipes.",
+	"Semaphores are relevant too.",
+	"Weather report.",
+	"Deadlocks are relevant as well.",
+	"Football results.",
+])]
+EXPECTED = [DOCUMENTS[index] for index in (0, 2, 4, 6)]
+
+@pytest.fixture
+def recorder(monkeypatch):
+	recorder = CallRecorder()
+	monkeypatch.setattr(grade_documents, "LLM", InFlightChatModel(recorder=recorder))
+	monkeypatch.setattr(grade_documents, "GRADING_CONCURRENCY", 3)
+	return recorder
+
+def _grade(mode: str, monkeypatch, use_async: bool) -> dict:
+	monkeypatch.setattr(grade_documents, "GRADING_MODE", mode)
+	state = {"question": "What is a mutex?", "documents": list(DOCUMENTS)}
+	if use_async:
+		return asyncio.run(grade_documents.aretrieval_grader(state))
+	return grade_documents.retrieval_grader(state)
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_concurrent_stays_within_grading_concurrency(recorder, monkeypatch, use_async):
+	result = _grade("concurrent", monkeypatch, use_async)
+	assert recorder.calls == len(DOCUMENTS)
+	assert 1 < recorder.peak <= grade_documents.GRADING_CONCURRENCY
+	assert result["documents"] == EXPECTED
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_sequential_makes_one_call_at_a_time(recorder, monkeypatch, use_async):
+	result = _grade("sequential", monkeypatch, use_async)
+	assert recorder.calls == len(DOCUMENTS)
+	assert recorder.peak == 1
+	assert result["documents"] == EXPECTED
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_single_prompt_makes_exactly_one_call(recorder, monkeypatch, use_async):
+	result = _grade("single_prompt", monkeypatch, use_async)
+	assert recorder.calls == 1
+	assert result["documents"] == EXPECTED
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_single_prompt_with_wrong_length_falls_back_to_per_document(recorder, monkeypatch, use_async):
+	grade_documents.LLM.batch_scores = ["yes", "no"]
+	result = _grade("single_prompt", monkeypatch, use_async)
+	assert recorder.calls == 1 + len(DOCUMENTS)
+	assert recorder.peak <= grade_documents.GRADING_CONCURRENCY
+	assert result["documents"] == EXPECTED
+
+@pytest.mark.parametrize("mode", ["sequential", "concurrent", "single_prompt"])
+@pytest.mark.parametrize("use_async", [False, True])
+def test_modes_keep_order_and_web_search_flag(recorder, monkeypatch, mode, use_async):
+	result = _grade(mode, monkeypatch, use_async)
+	assert [doc.metadata["source"] for doc in result["documents"]] == ["doc0", "doc2", "doc4", "doc6"]
+	assert result["web_search"] == "Yes"
+
+	monkeypatch.setattr(grade_documents, "GRADING_MODE", mode)
+	relevant_only = {"question": "What is a mutex?", "documents": EXPECTED}
+	result = asyncio.run(grade_documents.aretrieval_grader(relevant_only)) if use_async else grade_documents.retrieval_grader(relevant_only)
+	assert result["documents"] == EXPECTED
+	assert result["web_search"] == "No"
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_unknown_mode_fails_loudly(recorder, monkeypatch, use_async):
+	with pytest.raises(ValueError, match="GRADING_MODE"):
+		_grade("parallel", monkeypatch, use_async)
+	assert recorder.calls == 0
@@ -0,0 +1,66 @@
+import os
+
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("SEARCH_BACKEND", "local")
+
+import pytest
+from langchain_core.documents import Document
+from src.agent.nodes import grade_documents
+from src.database import vector_db
+from tests.test_grade_documents import CallRecorder, InFlightChatModel
+
+class FakeVectorstore:
+	"""
+	Dense side of hybrid retrieval: returns the given (document, relevance score) pairs in order
+	"""
+	def __init__(self, scored: list):
+		self.scored = scored
+
+	def similarity_search_with_relevance_scores(self, question: str, k: int):
+		return [(Document(id=doc.id, page_content=doc.page_content, metadata=dict(doc.metadata)), score) for doc, score in self.scored[:k]]
+
+	def get(self, ids: list, include: list):
+		stored = {doc.id: doc for doc, _ in self.scored}
+		return {"ids": ids, "documents": [stored[key].page_content for key in ids], "metadatas": [dict(stored[key].metadata) for key in ids]}
+
+class FakeLexicalIndex:
+	def __init__(self, ranked: list):
+		self.ranked = ranked
+
+	def search(self, question: str, k: int):
+		return self.ranked[:k]
+
+def _doc(key: str, text: str) -> Document:
+	return Document(id=key, page_content=text, metadata={"source": f"{key}.pdf"})
+
+@pytest.fixture
+def recorder(monkeypatch):
+	recorder = CallRecorder()
+	monkeypatch.setattr(grade_documents, "LLM", InFlightChatModel(recorder=recorder))
+	monkeypatch.setattr(grade_documents, "GRADING_MODE", "concurrent")
+	monkeypatch.setattr(grade_documents, "RELEVANCE_ACCEPT_THRESHOLD", 0.8)
+	monkeypatch.setattr(grade_documents, "RELEVANCE_REJECT_THRESHOLD", 0.2)
+	return recorder
+
+def test_bm25_first_chunk_with_low_dense_score_survives_grading(recorder):
+	semantic = _doc("semantic", "Mutual exclusion keeps threads apart, relevant background.")
+	exact = _doc("exact", "pthread_mutex_lock blocks until the mutex is free, the relevant call.")
+	noise = _doc("noise", "A recipe for bread.")
+	vectorstore = FakeVectorstore([(semantic, 0.9), (noise, 0.1), (exact, 0.05)])
+	lexical_index = FakeLexicalIndex([("exact", 9.0)])
+
+	documents = vector_db._hybrid_search(vectorstore, lexical_index, "What does pthread_mutex_lock do?", 3)
+	assert documents[0].id == "exact"
+	assert documents[0].metadata["relevance_score"] == 0.05
+	assert documents[0].metadata["lexical_match"]
+
+	result = grade_documents.retrieval_grader({"question": "What does pthread_mutex_lock do?", "documents": documents})
+	assert [doc.id for doc in result["documents"]] == ["exact", "semantic"]
+	# Only the BM25 match went to the LLM: the dense-only chunks were decided by their scores
+	assert recorder.calls == 1
+
+def test_low_dense_score_without_bm25_match_is_still_rejected(recorder):
+	noise = Document(page_content="A relevant-sounding recipe for bread.", metadata={"source": "noise.pdf", "relevance_score": 0.05, "lexical_match": False})
+	result = grade_documents.retrieval_grader({"question": "What is a mutex?", "documents": [noise]})
+	assert result["documents"] == []
+	assert recorder.calls == 0
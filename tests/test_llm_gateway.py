@@ -0,0 +1,274 @@
+import os
+import re
+import json
+import time
+import asyncio
+import threading
+
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("SEARCH_BACKEND", "local")
+
+import pytest
+from typing import Any
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from src.agent.llm import ConcurrencyLimiter, LLMGateway
+from tests.test_grade_documents import CallRecorder
+
+class EchoChatModel(BaseChatModel):
+	"""
+	Fake model answering "Echo: <word>" with {"echo": "<word>"}, and a BATCH_PROMPT with one such
+	answer per task. Each call holds its slot for `latency` seconds and reports `usage` tokens.
+	split_batches=False answers batches with JSON that cannot be split. When `gate` is set, calls
+	signal `started` and block until the gate opens, then raise `interrupt` if it is set.
+	"""
+	recorder: Any
+	latency: float = 0.02
+	split_batches: bool = True
+	usage: Any = None
+	gate: Any = None
+	started: Any = None
+	interrupt: Any = None
+
+	@property
+	def _llm_type(self) -> str:
+		return "echo_fake"
+
+	def _reply(self, prompt: str) -> dict:
+		if "independent tasks" in prompt:
+			if not self.split_batches:
+				return {"answer": "all tasks done"}
+			return {"results": [self._reply(task.strip()) for task in re.split(r"^### Task \d+$", prompt, flags=re.MULTILINE)[1:]]}
+		return {"echo": prompt.split("Echo:", 1)[1].strip()}
+
+	def _result(self, messages) -> ChatResult:
+		message = AIMessage(content=json.dumps(self._reply(messages[-1].content)), usage_metadata=self.usage)
+		return ChatResult(generations=[ChatGeneration(message=message)])
+
+	def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+		self.recorder.enter()
+		try:
+			if self.gate is not None:
+				self.started.set()
+				self.gate.wait()
+				if self.interrupt is not None:
+					raise self.interrupt
+			time.sleep(self.latency)
+			return self._result(messages)
+		finally:
+			self.recorder.exit()
+
+	async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+		self.recorder.enter()
+		try:
+			await asyncio.sleep(self.latency)
+			return self._result(messages)
+		finally:
+			self.recorder.exit()
+
+def _prompt(word: str) -> list:
+	return [HumanMessage(content=f"Echo: {word}")]
+
+def _answer(result: ChatResult) -> dict:
+	return json.loads(result.generations[0].message.content)
+
+def _in_threads(call, arguments: list) -> list:
+	results = [None] * len(arguments)
+
+	def run(index):
+		try:
+			results[index] = call(arguments[index])
+		except BaseException as e:
+			results[index] = e
+
+	threads = [threading.Thread(target=run, args=(index,)) for index in range(len(arguments))]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	return results
+
+@pytest.fixture
+def recorder():
+	return CallRecorder()
+
+# Concurrency cap
+
+def test_limiter_caps_calls_from_threads_and_event_loops(recorder):
+	gateway = LLMGateway(2, single_flight=False, batch_window=0, batch_max_size=1, batch_max_prompt_tokens=512)
+	model = EchoChatModel(recorder=recorder)
+	words = [f"word{index}" for index in range(6)]
+
+	results = _in_threads(lambda word: gateway.generate(model, _prompt(word)), words)
+	assert [_answer(result) for result in results] == [{"echo": word} for word in words]
+	assert 1 < recorder.peak <= 2
+
+	async def run_all():
+		return await asyncio.gather(*(gateway.agenerate(model, _prompt(word)) for word in words))
+
+	results = asyncio.run(run_all())
+	assert [_answer(result) for result in results] == [{"echo": word} for word in words]
+	assert recorder.peak <= 2
+	assert gateway.limiter.stats() == {"limit": 2, "active": 0, "waiting": 0}
+
+def test_cancelled_waiter_does_not_leak_or_take_a_slot():
+	limiter = ConcurrencyLimiter(1)
+
+	async def scenario():
+		await limiter.aacquire()
+		cancelled = asyncio.create_task(limiter.aacquire())
+		admitted = asyncio.create_task(limiter.aacquire())
+		await asyncio.sleep(0)
+		assert limiter.stats()["waiting"] == 2
+
+		cancelled.cancel()
+		await asyncio.sleep(0)
+		assert limiter.stats()["waiting"] == 1
+
+		limiter.release()
+		await asyncio.wait_for(admitted, 1)
+		assert limiter.stats() == {"limit": 1, "active": 1, "waiting": 0}
+		limiter.release()
+
+	asyncio.run(scenario())
+	assert limiter.stats() == {"limit": 1, "active": 0, "waiting": 0}
+
+@pytest.mark.parametrize("handed_over", [False, True])
+def test_waiter_cancelled_while_a_slot_is_handed_to_it_passes_the_slot_on(handed_over):
+	limiter = ConcurrencyLimiter(1)
+
+	async def scenario():
+		await limiter.aacquire()
+		cancelled = asyncio.create_task(limiter.aacquire())
+		admitted = asyncio.create_task(limiter.aacquire())
+		await asyncio.sleep(0)
+
+		limiter.release()
+		if handed_over:
+			# Let the hand-over resolve the waiter's future before its task runs again
+			await asyncio.sleep(0)
+		cancelled.cancel()
+		with pytest.raises(asyncio.CancelledError):
+			await cancelled
+		await asyncio.wait_for(admitted, 1)
+		assert limiter.stats() == {"limit": 1, "active": 1, "waiting": 0}
+		limiter.release()
+
+	asyncio.run(scenario())
+	assert limiter.stats() == {"limit": 1, "active": 0, "waiting": 0}
+
+# Single-flight
+
+def _start(call) -> tuple:
+	outcome = {}
+
+	def run():
+		try:
+			outcome["result"] = call()
+		except BaseException as e:
+			outcome["error"] = e
+
+	thread = threading.Thread(target=run)
+	thread.start()
+	return thread, outcome
+
+def _coalesce(gateway, model, prompt: list, followers: int) -> tuple:
+	"""
+	Starts a leader call that blocks inside the model, then followers for the same prompt, and
+	returns once all followers have joined the leader's flight
+	"""
+	leader = _start(lambda: gateway.generate(model, prompt))
+	assert model.started.wait(1)
+	joined = [_start(lambda: gateway.generate(model, prompt)) for _ in range(followers)]
+	deadline = time.monotonic() + 1
+	while gateway.stats()["coalesced"] < followers and time.monotonic() < deadline:
+		time.sleep(0.001)
+	assert gateway.stats()["coalesced"] == followers
+	return leader, joined
+
+def _single_flight_model(recorder, **kwargs) -> EchoChatModel:
+	return EchoChatModel(recorder=recorder, gate=threading.Event(), started=threading.Event(), usage={"input_tokens": 12, "output_tokens": 3, "total_tokens": 15}, **kwargs)
+
+def test_followers_get_the_leaders_result(recorder):
+	gateway = LLMGateway(4, single_flight=True, batch_window=0, batch_max_size=1, batch_max_prompt_tokens=512)
+	model = _single_flight_model(recorder)
+	leader, followers = _coalesce(gateway, model, _prompt("mutex"), 3)
+	model.gate.set()
+	for thread, _ in [leader, *followers]:
+		thread.join()
+
+	assert recorder.calls == 1
+	assert _answer(leader[1]["result"]) == {"echo": "mutex"}
+	assert leader[1]["result"].generations[0].message.usage_metadata["total_tokens"] == 15
+	for _, outcome in followers:
+		message = outcome["result"].generations[0].message
+		assert _answer(outcome["result"]) == {"echo": "mutex"}
+		# The tokens were spent once, on the leader's behalf
+		assert message.usage_metadata["total_tokens"] == 0
+		assert message.response_metadata["gateway"]["coalesced"]
+
+def test_followers_get_a_runtime_error_when_the_leader_is_interrupted(recorder):
+	gateway = LLMGateway(4, single_flight=True, batch_window=0, batch_max_size=1, batch_max_prompt_tokens=512)
+	model = _single_flight_model(recorder, interrupt=KeyboardInterrupt())
+	leader, followers = _coalesce(gateway, model, _prompt("mutex"), 2)
+	model.gate.set()
+	for thread, _ in [leader, *followers]:
+		thread.join()
+
+	# The interrupt stays with the leader; the followers get an ordinary error they can handle
+	assert isinstance(leader[1]["error"], KeyboardInterrupt)
+	for _, outcome in followers:
+		assert isinstance(outcome["error"], RuntimeError)
+		assert "KeyboardInterrupt" in str(outcome["error"])
+
+	# The flight was released, so the next call reaches the model again
+	model.interrupt = None
+	assert _answer(gateway.generate(model, _prompt("mutex"))) == {"echo": "mutex"}
+	assert recorder.calls == 2
+
+# Micro-batching
+
+def _batching_gateway(size: int) -> LLMGateway:
+	# The window is only an upper bound: a batch is sent as soon as `size` prompts are queued
+	return LLMGateway(4, single_flight=False, batch_window=2.0, batch_max_size=size, batch_max_prompt_tokens=512)
+
+def test_batched_results_and_usage_reach_the_right_caller(recorder):
+	gateway = _batching_gateway(3)
+	model = EchoChatModel(recorder=recorder, usage={"input_tokens": 30, "output_tokens": 9, "total_tokens": 39})
+	words = ["alpha", "beta", "gamma"]
+	results = _in_threads(lambda word: gateway.generate(model, _prompt(word), batchable=True), words)
+
+	assert recorder.calls == 1
+	assert [_answer(result) for result in results] == [{"echo": word} for word in words]
+	for result in results:
+		message = result.generations[0].message
+		assert message.usage_metadata == {"input_tokens": 10, "output_tokens": 3, "total_tokens": 13}
+		assert message.response_metadata["gateway"]["batched"] == 3
+	stats = gateway.stats()
+	assert (stats["batched_calls"], stats["batched_prompts"], stats["batch_fallbacks"]) == (1, 3, 0)
+
+def test_batch_that_cannot_be_split_falls_back_to_one_call_per_prompt(recorder):
+	gateway = _batching_gateway(3)
+	model = EchoChatModel(recorder=recorder, split_batches=False)
+	words = ["alpha", "beta", "gamma"]
+	results = _in_threads(lambda word: gateway.generate(model, _prompt(word), batchable=True), words)
+
+	assert recorder.calls == 1 + len(words)
+	assert [_answer(result) for result in results] == [{"echo": word} for word in words]
+	stats = gateway.stats()
+	assert (stats["batched_calls"], stats["batch_fallbacks"]) == (0, 1)
+
+def test_async_callers_share_a_batch_without_usage(recorder):
+	gateway = _batching_gateway(3)
+	# No usage_metadata on the combined answer, as some backends report none
+	model = EchoChatModel(recorder=recorder)
+	words = ["alpha", "beta", "gamma"]
+
+	async def run_all():
+		return await asyncio.gather(*(gateway.agenerate(model, _prompt(word), batchable=True) for word in words))
+
+	results = asyncio.run(run_all())
+	assert recorder.calls == 1
+	assert [_answer(result) for result in results] == [{"echo": word} for word in words]
+	assert all(result.generations[0].message.usage_metadata is None for result in results)